@@ -0,0 +1,170 @@
+# cli.py
+import argparse
+import os
+import sys
+
+import matplotlib
+matplotlib.use("Agg")  # No display needed for batch runs
+
+from mod.batch import MODALITIES, SUPPORTED_EXTENSIONS, run_cohort, run_durations, run_session, run_warehouse, \
+    session_directories
+from mod import plots
+from mod.cache import CACHE_DIR, CACHE_MAX_BYTES, TableCache
+from mod.loader import parse_table
+from mod.report_writers import DURATION_DIR, REPORTS_DIR
+from mod.warehouse import SAMPLE_MODALITIES, WAREHOUSE_PATH, SessionWarehouse
+
+
+def analyze_command(args):
+    failures = 0
+    for session_dir in session_directories(args.path):
+        results = run_session(session_dir, args.output, args.modality)
+        for modality, outputs in results.items():
+            if isinstance(outputs, Exception):
+                failures += 1
+                continue
+            for output in outputs:
+                print(f"{modality}: {output}")
+    return 1 if failures else 0
+
+
+def durations_command(args):
+    csv_filename, durations = run_durations(session_directories(args.path), args.output)
+    failed = durations['Error'].notna().sum() if 'Error' in durations.columns else 0
+    print(f"{len(durations) - failed} session durations written to {csv_filename}, {failed} sessions failed")
+    return 1 if failed else 0
+
+
+def cohort_command(args):
+    csv_filenames, comparisons = run_cohort(session_directories(args.path), args.output)
+    for modality, comparison in comparisons.items():
+        print(f"{modality}: {len(comparison.participants)} participants, {len(comparison.metrics)} metrics")
+    for csv_filename in csv_filenames:
+        print(csv_filename)
+    return 0
+
+
+def warehouse_command(args):
+    if args.action == "ingest":
+        warehouse, stored = run_warehouse(session_directories(args.path), args.database)
+        for (participant, test, modality), rows in stored.items():
+            print(f"{participant} test {test} {modality}: {rows} rows")
+        print(f"{len(stored)} sessions stored in {args.database}, {len(warehouse.sessions())} in total")
+        return 0
+
+    warehouse = SessionWarehouse(args.database)
+    if args.action == "during":
+        table = warehouse.mean_during(args.modality, args.columns, args.strategy, args.category)
+    elif args.action == "window":
+        window = warehouse.signals(args.participant, args.test, args.modality).window(args.start, args.end,
+                                                                                     args.channel)
+        if args.plot:
+            plots.signal_window_graph(window, f"{args.participant} test {args.test}", args.modality).savefig(args.plot)
+            print(f"{len(window)} samples plotted to {args.plot}")
+            return 0
+        table = window.describe().T
+    elif args.action == "utterances":
+        table = warehouse.utterance_means(args.participant, args.test, args.modality, args.channel)
+    elif args.action == "summary":
+        table = warehouse.summary(args.modality, args.statistic)
+    else:
+        table = warehouse.query(args.sql)
+    print(table.to_string())
+    return 0
+
+
+def data_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files += [os.path.join(root, name) for name in sorted(names) if name.endswith(SUPPORTED_EXTENSIONS)]
+        else:
+            files.append(path)
+    return files
+
+
+def cache_command(args):
+    cache = TableCache(args.cache_dir, args.max_size * 1024 ** 2)
+    if args.action == "purge":
+        print(f"Removed {cache.purge()} files from {args.cache_dir}")
+        return 0
+
+    # Modality frames read lowercased columns, the survey and individual analyzers the raw headers
+    files = data_files(args.paths)
+    cache.warm(files, lambda path: parse_table(path, normalize_columns=True), variant="lower")
+    cache.warm(files, parse_table)
+    cache.evict()
+    print(f"{len(files)} files cached, {cache.size() / 1024 ** 2:.1f} MB in {args.cache_dir}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Aguida Multimodal Analyzer - headless batch analysis")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    analyze_parser = subparsers.add_parser("analyze", help="Run every modality on a session directory")
+    analyze_parser.add_argument("path", help="Session directory, or a directory of session directories")
+    analyze_parser.add_argument("-o", "--output", default=REPORTS_DIR, help="Reports directory")
+    analyze_parser.add_argument("-m", "--modality", action="append", choices=MODALITIES,
+                                help="Only run this modality (repeatable)")
+    analyze_parser.set_defaults(func=analyze_command)
+
+    durations_parser = subparsers.add_parser("durations", help="Experiment durations of every session, in one table")
+    durations_parser.add_argument("path", help="Session directory, or a directory of session directories")
+    durations_parser.add_argument("-o", "--output", default=DURATION_DIR, help="Output directory")
+    durations_parser.set_defaults(func=durations_command)
+
+    cohort_parser = subparsers.add_parser("cohort", help="Test 1 against Test 2 of every participant, in one table")
+    cohort_parser.add_argument("path", help="Directory of participant session directories")
+    cohort_parser.add_argument("-o", "--output", default=REPORTS_DIR, help="Reports directory")
+    cohort_parser.set_defaults(func=cohort_command)
+
+    warehouse_parser = subparsers.add_parser("warehouse", help="Store sessions in, and query, the local warehouse")
+    warehouse_parser.add_argument("--database", default=WAREHOUSE_PATH, help="Warehouse file")
+    warehouse_parser.set_defaults(func=warehouse_command)
+    actions = warehouse_parser.add_subparsers(dest="action", required=True)
+    ingest_parser = actions.add_parser("ingest", help="Store new and changed sessions")
+    ingest_parser.add_argument("path", help="Session directory, or a directory of session directories")
+    during_parser = actions.add_parser("during", help="Mean readings during a DialogFlow strategy or category")
+    during_parser.add_argument("modality", choices=SAMPLE_MODALITIES)
+    during_parser.add_argument("columns", nargs="+", help="Lowercase column names, e.g. left_pupil_diameter")
+    during_parser.add_argument("--strategy")
+    during_parser.add_argument("--category")
+    window_parser = actions.add_parser("window", help="Statistics or a plot of a time window of a stored session")
+    window_parser.add_argument("participant")
+    window_parser.add_argument("test", type=int)
+    window_parser.add_argument("modality", choices=SAMPLE_MODALITIES)
+    window_parser.add_argument("--start", type=int, help="Epoch ms, inclusive; the session's start by default")
+    window_parser.add_argument("--end", type=int, help="Epoch ms, exclusive; the session's end by default")
+    window_parser.add_argument("--channel", action="append", help="Only this channel (repeatable)")
+    window_parser.add_argument("--plot", help="Save a plot of the window to this image file instead")
+    utterances_parser = actions.add_parser("utterances", help="Mean readings during each utterance of a session")
+    utterances_parser.add_argument("participant")
+    utterances_parser.add_argument("test", type=int)
+    utterances_parser.add_argument("modality", choices=SAMPLE_MODALITIES)
+    utterances_parser.add_argument("--channel", action="append", help="Only this channel (repeatable)")
+    summary_parser = actions.add_parser("summary", help="A statistic of every column, per participant and test")
+    summary_parser.add_argument("modality", choices=SAMPLE_MODALITIES + ["dialogflow"])
+    summary_parser.add_argument("--statistic", default="mean")
+    sql_parser = actions.add_parser("sql", help="Any SQL query")
+    sql_parser.add_argument("sql")
+
+    cache_parser = subparsers.add_parser("cache", help="Warm or purge the binary cache of parsed data files")
+    cache_parser.add_argument("action", choices=["warm", "purge"])
+    cache_parser.add_argument("paths", nargs="*", default=[], help="Data files or directories to warm")
+    cache_parser.add_argument("--cache-dir", default=CACHE_DIR, help="Cache directory")
+    cache_parser.add_argument("--max-size", type=int, default=CACHE_MAX_BYTES // 1024 ** 2,
+                              help="Cache size limit in MB, least recently used files are evicted first")
+    cache_parser.set_defaults(func=cache_command)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
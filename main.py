@@ -21,6 +21,7 @@ from mod.systemchoice import SystemChoiceFrame
 from mod.ind_analyzer_window import IndividualAnalyzerWindow
 from mod.determination_time import DurationCalculator
 from mod.duration_calculator import DurationCalculatorFunction
+from mod.report_writers import format_value
 from fpdf import FPDF
 
 
@@ -236,13 +237,17 @@ class AguidaMultimodalAnalyzer(QMainWindow):
                 ("System Choice", self.system_choice_frame)
             ]
 
+            # Each frame contributes a bounded summary, never its raw data
             for title, frame in frames:
-                if frame and frame.get_data():
-                    data = frame.get_data()
+                summary = frame.report_summary() if frame else None
+                if summary:
                     pdf.set_font("Arial", size=10)
                     pdf.cell(0, 10, txt=f"{title} Data:", ln=True)
-                    for key, value in data.items():
-                        pdf.cell(0, 10, txt=f"{key.capitalize()}: {value}", ln=True)
+                    for label, value in summary.items():
+                        lines = format_value(value).splitlines() or [""]
+                        pdf.cell(0, 10, txt=f"{label}: {lines[0]}", ln=True)
+                        for line in lines[1:]:
+                            pdf.cell(0, 6, txt=f"    {line}", ln=True)
                     pdf.ln(10)
 
             # Save the PDF
@@ -0,0 +1,397 @@
+# mod/batch.py
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict
+
+import pandas as pd
+
+from mod import plots, report_writers
+from mod.cache import TableCache
+from mod.engine.alignment import CLOCK_COLUMNS, SessionAligner, utterance_summary
+from mod.engine.dialogflow import DialogFlowAnalyzer
+from mod.engine.duration import DURATION_MODALITIES, duration_columns, file_span, session_duration
+from mod.engine.face_emotion import FaceEmotionAnalyzer
+from mod.engine.heartrate import HeartRateAnalyzer
+from mod.engine.individual import CohortComparison, compare_cohort, test_metrics
+from mod.engine.systemchoice import SystemChoiceAnalyzer
+from mod.engine.tobii import TobiiAnalyzer
+from mod.loader import (iter_column_chunks, iter_table_chunks, load_files, needs_streaming, read_columns,
+                        read_selected_columns, read_table, worth_parallel)
+from mod.report_writers import DURATION_DIR, REPORTS_DIR
+from mod.warehouse import WAREHOUSE_MODALITIES, WAREHOUSE_PATH, SessionWarehouse
+
+MODALITIES = ["heart_rate", "tobii", "face_emotion", "dialogflow", "system_choice"]
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx')
+# Modalities the Individual Analyzer compares between Test 1 and Test 2
+COHORT_MODALITIES = ["heart_rate", "tobii", "face_emotion"]
+TEST_PATTERN = re.compile(r"test[\s_-]*([12])", re.IGNORECASE)
+
+
+def detect_modality(file_path):
+    # Identify the kind of export from its header row only
+    columns = read_table(file_path, nrows=0).columns.str.strip().str.lower()
+    if 'left_eye_x' in columns:
+        return "tobii"
+    if 'face_id' in columns and any(col.startswith('au') and col.endswith('_r') for col in columns):
+        return "face_emotion"
+    if 'hr' in columns:
+        return "heart_rate"
+    if {'utterance', 'category', 'strategy', 'confidence'}.issubset(columns):
+        return "dialogflow"
+    if 'prefered system' in columns:
+        return "system_choice"
+    return None
+
+
+def discover_session_files(session_dir):
+    session_files = {modality: [] for modality in MODALITIES}
+    for name in sorted(os.listdir(session_dir)):
+        file_path = os.path.join(session_dir, name)
+        if not os.path.isfile(file_path) or not name.endswith(SUPPORTED_EXTENSIONS):
+            continue
+        modality = detect_modality(file_path)
+        if modality:
+            session_files[modality].append(file_path)
+        else:
+            print(f"Skipping unrecognised file: {file_path}")
+    return session_files
+
+
+def is_data_file(file_path):
+    # An export of a known modality; stray files (.DS_Store, READMEs, exported reports) are not
+    if not os.path.isfile(file_path) or not file_path.endswith(SUPPORTED_EXTENSIONS):
+        return False
+    try:
+        return detect_modality(file_path) is not None
+    except Exception:
+        return False
+
+
+def session_directories(path):
+    # A directory holding data files is one session, otherwise each sub-directory is
+    entries = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    if any(is_data_file(entry) for entry in entries):
+        return [path]
+    return [entry for entry in entries if os.path.isdir(entry)]
+
+
+# Columns each sensor analysis reads, loaded projected and downcast
+SCHEMAS = {
+    "heart_rate": HeartRateAnalyzer.schema,
+    "tobii": TobiiAnalyzer.schema,
+    "face_emotion": FaceEmotionAnalyzer.schema,
+}
+
+
+def load_combined(files, normalize_columns=True, schema=None):
+    return load_files(files, normalize_columns, schema=schema).combined()
+
+
+def run_heart_rate(files, output_dir):
+    analyzer = HeartRateAnalyzer()
+    if needs_streaming(files):
+        chunks = iter_column_chunks(files, analyzer.heart_rate_column, schema=analyzer.schema)
+        accumulator = analyzer.analyze_chunks(chunks, len(files))
+        result = accumulator.result()
+        graph = plots.heart_rate_graph(accumulator.preview_series())
+        histogram = plots.heart_rate_histogram(*accumulator.histogram())
+    else:
+        combined_data = load_files(files, schema=analyzer.schema).tagged(analyzer.participant_column)
+        result = analyzer.analyze(combined_data, file_count=len(files))
+        heart_rate_data = analyzer.heart_rate_series(combined_data)
+        graph = plots.heart_rate_graph(heart_rate_data)
+        histogram = plots.heart_rate_histogram(heart_rate_data)
+
+    output_files = [report_writers.write_heart_rate_pdf(result.summary(), [graph, histogram], output_dir)]
+    if result.group_statistics is not None:
+        output_files.append(
+            report_writers.write_group_statistics_csv(result.group_statistics, "heart_rate", output_dir))
+    return output_files
+
+
+def run_tobii(files, output_dir):
+    analyzer = TobiiAnalyzer()
+    combined_data = load_files(files, schema=analyzer.schema).tagged(analyzer.label_column)
+    result = analyzer.analyze(combined_data, file_count=len(files))
+
+    return [
+        report_writers.write_tobii_pdf(result.summary(), result.ancova_results, result.svm_report,
+                                       plots.tobii_graphs(combined_data), output_dir),
+        report_writers.write_group_statistics_csv(result.group_statistics, "tobii", output_dir)
+    ]
+
+
+def run_face_emotion(files, output_dir):
+    analyzer = FaceEmotionAnalyzer()
+    if needs_streaming(files):
+        result = analyzer.analyze_streaming(lambda columns: iter_table_chunks(files, columns, schema=analyzer.schema),
+                                            read_columns(files[-1]), file_count=len(files))
+        figures = []
+    else:
+        combined_data = load_files(files, schema=analyzer.schema).tagged()
+        result = analyzer.analyze(combined_data, file_count=len(files))
+
+        figures = plots.face_emotion_graphs(combined_data)
+        figures += [plots.au_histogram(combined_data, au) for au in result.au_columns]
+        figures += [plots.au_boxplot(combined_data, au) for au in result.au_columns]
+
+    return [
+        report_writers.write_face_emotion_pdf(result.au_results, result.svm_report, figures, output_dir),
+        report_writers.write_face_emotion_csv(result.au_results, result.svm_report, output_dir)
+    ]
+
+
+def run_dialogflow(files, output_dir):
+    combined_data = load_combined(files, normalize_columns=False)
+    result = DialogFlowAnalyzer().analyze(combined_data, file_count=len(files))
+
+    fig = plots.dialogflow_graphs(result.utterance_counts, result.category_counts, result.strategy_counts,
+                                  result.confidence_stats)
+
+    return [
+        report_writers.write_dialogflow_pdf(result.utterance_counts, result.category_counts, result.strategy_counts,
+                                            result.confidence_stats, [fig], output_dir),
+        report_writers.write_dialogflow_csv(result.utterance_counts, result.category_counts, result.strategy_counts,
+                                            result.confidence_stats, output_dir)
+    ]
+
+
+def run_system_choice(files, output_dir):
+    output_files = []
+    for file in files:
+        system_choice_data = read_table(file)
+        result = SystemChoiceAnalyzer().analyze(system_choice_data)
+        figures = [plots.strategy_durations_graph(result.first_strategy_stats, result.second_strategy_stats),
+                   plots.preferred_system_graph(result.preferred_system_counts)]
+
+        output_files.append(report_writers.write_system_choice_pdf(
+            result.first_strategy_stats, result.second_strategy_stats, system_choice_data, figures, output_dir))
+        output_files.append(report_writers.write_system_choice_csv(
+            result.first_strategy_stats, result.second_strategy_stats, system_choice_data, output_dir))
+    return output_files
+
+
+def aligned_session_table(session_files, aligner=None, cache=None):
+    # The session's streams on one clock, built once and served from the table cache while the files are unchanged
+    aligner = aligner or SessionAligner()
+    cache = cache or TableCache()
+    session_files = {modality: files for modality, files in session_files.items() if modality in CLOCK_COLUMNS and files}
+    all_files = [file for modality in sorted(session_files) for file in session_files[modality]]
+    schemas = [SCHEMAS[modality].cache_key() for modality in sorted(session_files) if modality in SCHEMAS]
+
+    def build():
+        return aligner.align({modality: load_combined(files, schema=SCHEMAS.get(modality))
+                              for modality, files in session_files.items()})
+    return cache.read_derived(all_files, build, variant="-".join([aligner.cache_key()] + schemas))
+
+
+def run_multimodal(session_files, output_dir):
+    # Sensor readings during each DialogFlow utterance, read off the aligned session table
+    aligned = aligned_session_table(session_files)
+    return [report_writers.write_multimodal_csv(utterance_summary(aligned), output_dir)]
+
+
+def can_align(session_files):
+    sensors = [modality for modality in CLOCK_COLUMNS if modality != 'dialogflow' and session_files[modality]]
+    return bool(session_files['dialogflow'] and sensors)
+
+
+RUNNERS = {
+    "heart_rate": run_heart_rate,
+    "tobii": run_tobii,
+    "face_emotion": run_face_emotion,
+    "dialogflow": run_dialogflow,
+    "system_choice": run_system_choice,
+}
+
+
+def run_session(session_dir, reports_dir=REPORTS_DIR, modalities=None):
+    # Reports of a session go to a sub-folder named after the session directory
+    output_dir = os.path.join(reports_dir, os.path.basename(os.path.normpath(session_dir)))
+    session_files = discover_session_files(session_dir)
+    results = {}
+    for modality in modalities or MODALITIES:
+        files = session_files[modality]
+        if not files:
+            continue
+        print(f"Processing {modality} ({len(files)} files) in {session_dir}")
+        try:
+            results[modality] = RUNNERS[modality](files, output_dir)
+        except Exception as e:
+            print(f"Failed to process {modality} in {session_dir}: {e}")
+            results[modality] = e
+
+    if modalities is None and can_align(session_files):
+        print(f"Aligning the session's streams in {session_dir}")
+        try:
+            results["multimodal"] = run_multimodal(session_files, output_dir)
+        except Exception as e:
+            print(f"Failed to align the streams in {session_dir}: {e}")
+            results["multimodal"] = e
+    return results
+
+
+def read_file_span(file_path, modality):
+    return file_span(file_path, modality, read_selected_columns(file_path, duration_columns(modality)))
+
+
+def read_file_spans(jobs, max_workers=None, progress=None):
+    # jobs are (file, modality) pairs, read concurrently in worker processes like load_files;
+    # progress(done, total, file) is called as each one lands. A file that cannot be read gives its exception in
+    # place of its span, so one bad file does not stop the batch.
+    spans = [None] * len(jobs)
+
+    def collect(index, span):
+        spans[index] = span
+        if progress:
+            progress(sum(span is not None for span in spans), len(jobs), jobs[index][0])
+
+    if not worth_parallel([file for file, _ in jobs]):
+        for index, job in enumerate(jobs):
+            try:
+                span = read_file_span(*job)
+            except Exception as e:
+                span = e
+            collect(index, span)
+        return spans
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        futures = {executor.submit(read_file_span, *job): index for index, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            try:
+                span = future.result()
+            except Exception as e:
+                span = e
+            collect(futures[future], span)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return spans
+
+
+def session_durations(session_dirs, max_workers=None, progress=None):
+    # One row per session directory holding heart rate, Tobii, DialogFlow and OpenFace files. The files of every
+    # session are read in a single pool, only their timestamp and ID columns. A session whose files cannot be read
+    # gets a row with only its name and the Error column.
+    jobs, owners = [], []
+    for session_dir in session_dirs:
+        session_files = discover_session_files(session_dir)
+        missing = [modality for modality in DURATION_MODALITIES if not session_files[modality]]
+        if missing:
+            print(f"Skipping {session_dir}: no {', '.join(missing)} files")
+            continue
+        for modality in DURATION_MODALITIES:
+            for file in session_files[modality]:
+                jobs.append((file, modality))
+                owners.append(session_dir)
+
+    spans = read_file_spans(jobs, max_workers, progress)
+    rows = []
+    for session_dir in dict.fromkeys(owners):
+        session = os.path.basename(os.path.normpath(session_dir))
+        session_spans = [(job[0], span) for job, span, owner in zip(jobs, spans, owners) if owner == session_dir]
+        errors = [str(span) if os.path.basename(file) in str(span) else f"{os.path.basename(file)}: {span}"
+                  for file, span in session_spans if isinstance(span, Exception)]
+        try:
+            if errors:
+                raise ValueError("; ".join(errors))
+            rows.append(session_duration(session, [span for _, span in session_spans]).to_row())
+        except Exception as e:
+            print(f"Failed to time {session_dir}: {e}")
+            rows.append({'Session': session, 'Error': str(e)})
+    return pd.DataFrame(rows)
+
+
+def run_durations(session_dirs, output_dir=DURATION_DIR, progress=None):
+    durations = session_durations(session_dirs, progress=progress)
+    if durations.empty:
+        raise ValueError("No session directory holds heart rate, Tobii, DialogFlow and OpenFace files.")
+    return report_writers.write_duration_csv(durations, output_dir), durations
+
+
+def test_number(file_path):
+    # 1 or 2 from "test1", "Test 2" or "test_2" in the file name, None for other files
+    match = TEST_PATTERN.search(os.path.basename(file_path))
+    return int(match.group(1)) if match else None
+
+
+def cohort_test_files(session_dirs):
+    # {modality: {participant: {test: files}}}, each session directory being one participant
+    test_files = {modality: {} for modality in COHORT_MODALITIES}
+    for session_dir in session_dirs:
+        participant = os.path.basename(os.path.normpath(session_dir))
+        session_files = discover_session_files(session_dir)
+        for modality in COHORT_MODALITIES:
+            for file in session_files[modality]:
+                test = test_number(file)
+                if test is None:
+                    print(f"Skipping {file}: no test number in its name")
+                    continue
+                test_files[modality].setdefault(participant, {}).setdefault(test, []).append(file)
+    return test_files
+
+
+def cohort_comparisons(session_dirs, progress=None) -> Dict[str, CohortComparison]:
+    # Test 1 and Test 2 of every participant, per modality. The files of all modalities are read in a single pool,
+    # with the raw headers the Individual Analyzer's blocks read; a test split over several files is analysed
+    # as one.
+    test_files = cohort_test_files(session_dirs)
+    files = [file for participants in test_files.values() for tests in participants.values()
+             for test_group in tests.values() for file in test_group]
+    if not files:
+        return {}
+    loaded = load_files(files, progress=progress)
+    frames = {file: frame.rename(columns=str.strip) for file, frame in zip(files, loaded.frames)}
+
+    comparisons = {}
+    for modality, participants in test_files.items():
+        if participants:
+            comparisons[modality] = compare_cohort(modality, {
+                participant: {test: test_metrics(modality, pd.concat([frames[file] for file in test_group]))
+                              for test, test_group in sorted(tests.items())}
+                for participant, tests in participants.items()})
+    return comparisons
+
+
+def run_cohort(session_dirs, output_dir=REPORTS_DIR, progress=None):
+    comparisons = cohort_comparisons(session_dirs, progress)
+    if not comparisons:
+        raise ValueError("No session directory holds Test 1 or Test 2 heart rate, Tobii or OpenFace files.")
+    output_files = [csv_filename for comparison in comparisons.values()
+                    for csv_filename in report_writers.write_cohort_csv(comparison, output_dir)]
+    return output_files, comparisons
+
+
+def warehouse_sessions(session_dirs):
+    # {(participant, test, modality): files}, participants being session directories as in cohort_test_files;
+    # files without a test number are test 0
+    sessions = {}
+    for session_dir in session_dirs:
+        participant = os.path.basename(os.path.normpath(session_dir))
+        session_files = discover_session_files(session_dir)
+        for modality in WAREHOUSE_MODALITIES:
+            for file in session_files[modality]:
+                sessions.setdefault((participant, test_number(file) or 0, modality), []).append(file)
+    return sessions
+
+
+def run_warehouse(session_dirs, path=WAREHOUSE_PATH, progress=None):
+    # Stores the sessions whose files changed since they were last stored; the files of each modality are read
+    # in one pool, projected to the columns its analysis reads
+    warehouse = SessionWarehouse(path)
+    sessions = {key: files for key, files in warehouse_sessions(session_dirs).items()
+                if not warehouse.is_current(*key, files)}
+    stored = {}
+    for modality in WAREHOUSE_MODALITIES:
+        keys = [key for key in sessions if key[2] == modality]
+        files = [file for key in keys for file in sessions[key]]
+        if not files:
+            continue
+        loaded = load_files(files, normalize_columns=True, schema=SCHEMAS.get(modality), progress=progress)
+        frames = dict(zip(files, loaded.frames))
+        for key in keys:
+            stored[key] = warehouse.store(*key, sessions[key], pd.concat([frames[file] for file in sessions[key]]))
+    return warehouse, stored
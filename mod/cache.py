@@ -0,0 +1,197 @@
+# mod/cache.py
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+try:
+    from pyarrow import feather
+except ImportError:  # Installed from requirements.txt; without it the cache falls back to pandas pickles
+    feather = None
+
+# In the application folder, next to generated_reports, whichever directory the app is started from
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "table_cache")
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+CACHE_EXTENSION = ".feather" if feather is not None else ".pkl"
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_atomic(path, write):
+    # Loader worker processes may store the same entry concurrently
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def entry_hash(cache_path):
+    # Content hash a source copy is named by, "<hash>[-variant]<extension>"
+    return os.path.basename(cache_path).split('-')[0].split('.')[0]
+
+
+class TableCache:
+    # Binary copies of parsed source files, keyed by content hash. The hash of a source is remembered against
+    # its path, size and mtime so unchanged files are not re-hashed. Least recently used copies are evicted
+    # once the cache grows past max_bytes; every hit refreshes the copy's mtime.
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.sources_dir = os.path.join(cache_dir, "sources")
+
+    def content_hash(self, file_path):
+        stat = os.stat(file_path)
+        source_key = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()
+        source_path = os.path.join(self.sources_dir, f"{source_key}.json")
+        try:
+            with open(source_path) as f:
+                source = json.load(f)
+            if source['size'] == stat.st_size and source['mtime_ns'] == stat.st_mtime_ns:
+                return source['hash']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        content_hash = file_digest(file_path)
+        os.makedirs(self.sources_dir, exist_ok=True)
+        source = {'file': os.path.abspath(file_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                  'hash': content_hash}
+
+        def write(path):
+            with open(path, 'w') as f:
+                json.dump(source, f)
+        write_atomic(source_path, write)
+        return content_hash
+
+    def cache_path(self, file_path, variant=None):
+        suffix = f"-{variant}" if variant else ""
+        return os.path.join(self.cache_dir, f"{self.content_hash(file_path)}{suffix}{CACHE_EXTENSION}")
+
+    def derived_path(self, file_paths, variant):
+        # Tables built from several sources are keyed by the hashes of all of them
+        digest = hashlib.blake2b(variant.encode(), digest_size=20)
+        for file_path in file_paths:
+            digest.update(self.content_hash(file_path).encode())
+        return os.path.join(self.cache_dir, f"{digest.hexdigest()}-{variant}{CACHE_EXTENSION}")
+
+    def read(self, file_path, parse, variant=None):
+        # Returns the cached copy of file_path, parsing it with parse(file_path) on a miss. Copies parsed
+        # differently from the same source (e.g. with normalized column names) are told apart by variant.
+        return self.read_entry(self.cache_path(file_path, variant), lambda: parse(file_path))
+
+    def read_derived(self, file_paths, build, variant):
+        # Same for a table built by build() from file_paths, e.g. a session aligned across modalities.
+        # variant must name the table and every setting it was built with.
+        return self.read_entry(self.derived_path(file_paths, variant), build)
+
+    def read_entry(self, cache_path, build):
+        if os.path.exists(cache_path):
+            try:
+                data = self.load(cache_path)
+                os.utime(cache_path)
+                return data
+            except Exception as e:
+                print(f"Ignoring unreadable cache entry {cache_path}: {e}")
+
+        data = build()
+        self.store(cache_path, data)
+        return data
+
+    def load(self, cache_path):
+        if CACHE_EXTENSION == ".feather":
+            # Uncompressed Feather files are memory-mapped rather than read
+            return feather.read_feather(cache_path, memory_map=True)
+        return pd.read_pickle(cache_path)
+
+    def store(self, cache_path, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        try:
+            if CACHE_EXTENSION == ".feather":
+                write_atomic(cache_path, lambda path: feather.write_feather(data, path, compression='uncompressed'))
+            else:
+                write_atomic(cache_path, lambda path: data.to_pickle(path))
+        except Exception as e:
+            # Mixed-type or non-string columns cannot always be stored, such files are simply parsed every time
+            print(f"Could not cache {cache_path}: {e}")
+            return
+        self.evict()
+
+    def entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(CACHE_EXTENSION):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:  # Evicted by another process meanwhile
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        evicted = []
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted.append(path)
+
+        # Hashes no copy is left for; derived tables are keyed by a digest and never match
+        remaining = {entry_hash(path) for _, _, path in entries if path not in evicted}
+        self.sweep_sources({entry_hash(path) for path in evicted} - remaining)
+        return evicted
+
+    def sweep_sources(self, evicted_hashes=()):
+        # Drops the source records of files that were moved or deleted, and of hashes whose copies were evicted
+        if not os.path.isdir(self.sources_dir):
+            return 0
+        removed = 0
+        for name in os.listdir(self.sources_dir):
+            if not name.endswith(".json"):  # Records being written
+                continue
+            record_path = os.path.join(self.sources_dir, name)
+            try:
+                with open(record_path) as f:
+                    source = json.load(f)
+                stale = not os.path.exists(source['file']) or source['hash'] in evicted_hashes
+            except (OSError, ValueError, KeyError):
+                stale = True
+            if stale:
+                try:
+                    os.remove(record_path)
+                    removed += 1
+                except OSError:
+                    continue
+        return removed
+
+    def warm(self, files, parse, variant=None):
+        for file_path in files:
+            start = time.perf_counter()
+            self.read(file_path, parse, variant)
+            print(f"Cached {file_path} in {time.perf_counter() - start:.2f}s")
+
+    def purge(self):
+        removed = 0
+        if os.path.isdir(self.cache_dir):
+            for root, _, names in os.walk(self.cache_dir):
+                for name in names:
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+        return removed
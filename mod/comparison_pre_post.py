@@ -1,17 +1,28 @@
 # mod/comparison_pre_post.py
 import os
-import pandas as pd
 import matplotlib.pyplot as plt
 from PyQt5.QtWidgets import QVBoxLayout, QLabel, QFrame, QHBoxLayout, QPushButton, QMessageBox
-from PyQt5.QtGui import QPixmap
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from PyQt5.QtCore import Qt
 from datetime import datetime
-from scipy.stats import ttest_rel, wilcoxon
-from sklearn import svm
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, accuracy_score
-from sklearn.impute import SimpleImputer
 from matplotlib.backends.backend_pdf import PdfPages
+from mod import plots
+from mod.engine.comparison import CATEGORY_LABELS, ComparisonAnalyzer
+from mod.workers import TaskProgress, analysis_progress
+
+
+def resampling_text(results, confidence_level):
+    # Extra lines for the bootstrap intervals and permutation p-values, when they were computed
+    if results.get('cohen_d_ci') is None:
+        return ""
+    level = f"{confidence_level * 100:.0f}%"
+    d_low, d_high = results['cohen_d_ci']
+    change_low, change_high = results['percentage_change_ci']
+    return (
+        f"\nCohen's d {level} CI: [{d_low:.2f}, {d_high:.2f}], permutation p={results['cohen_d_permutation_p']:.4f}\n"
+        f"Percentage Change {level} CI: [{change_low:.2f}%, {change_high:.2f}%], "
+        f"permutation p={results['percentage_change_permutation_p']:.4f}"
+    )
 
 
 class ComparisonPrePostTestFrame(QFrame):
@@ -38,6 +49,9 @@ class ComparisonPrePostTestFrame(QFrame):
 
         self.layout.addLayout(button_layout)
 
+        self.task_progress = TaskProgress()
+        self.layout.addWidget(self.task_progress)
+
         self.results_layout = QHBoxLayout()
         self.layout.addLayout(self.results_layout)
 
@@ -66,8 +80,17 @@ class ComparisonPrePostTestFrame(QFrame):
     def compare_test_results(self):
         pre_test_data = self.pre_test_frame.get_test_data()
         post_test_data = self.post_test_frame.get_test_data()
-        self.process_comparison(pre_test_data, post_test_data)
-        self.export_button.setEnabled(True)  # Enable the export button
+        self.export_button.setEnabled(False)
+        self.task_progress.start(self.analyze_tests, pre_test_data, post_test_data,
+                                 on_result=self.process_comparison, on_error=self.display_error)
+
+    @staticmethod
+    def analyze_tests(worker, pre_test_data, post_test_data):
+        # Runs on a worker thread: scoring, bootstrap and permutation resamples, and the SVM
+        return ComparisonAnalyzer().analyze(pre_test_data, post_test_data, progress=analysis_progress(worker, 0, 100))
+
+    def display_error(self, message):
+        QMessageBox.critical(self, "Error", f"Failed to compare the test results:\n{message}")
 
     def export_comparison_to_pdf(self):
         try:
@@ -96,6 +119,7 @@ class ComparisonPrePostTestFrame(QFrame):
                             f"Cohen's d: {cohen_d:.2f}\n"
                             f"Wilcoxon: W={wilcoxon_result.statistic:.2f}, p={wilcoxon_result.pvalue:.4f}\n"
                             f"Paired t-test: t={ttest_result.statistic:.2f}, p={ttest_result.pvalue:.4f}"
+                            f"{resampling_text(results, self.result.confidence_level)}"
                         )
                         pdf.savefig(self.text_to_fig(text))
 
@@ -111,13 +135,7 @@ class ComparisonPrePostTestFrame(QFrame):
 
                 # Add comparison graph to PDF
                 if 'graph' in self.comparison_results:
-                    graph_filename = self.comparison_results['graph']
-                    fig, ax = plt.subplots(figsize=(5, 3))
-                    img = plt.imread(graph_filename)
-                    ax.imshow(img)
-                    ax.axis('off')
-                    pdf.savefig(fig)
-                    plt.close(fig)
+                    pdf.savefig(self.comparison_results['graph'])
 
             # Show a success message
             QMessageBox.information(self, "Report Generated", f"PDF report generated successfully:\n{pdf_filename}")
@@ -125,187 +143,37 @@ class ComparisonPrePostTestFrame(QFrame):
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to generate PDF report:\n{str(e)}")
 
-    def process_comparison(self, pre_test_data, post_test_data):
-        # Extract relevant columns for confidence, nervousness, and WtC
-        pre_confidence_columns = [col for col in pre_test_data.columns if '自信' in col]
-        pre_nervousness_columns = [col for col in pre_test_data.columns if '緊張' in col]
-        pre_wtc_columns = [col for col in pre_test_data.columns if 'やる気' in col]
-
-        post_confidence_columns = [col for col in post_test_data.columns if '自信' in col]
-        post_nervousness_columns = [col for col in post_test_data.columns if '緊張' in col]
-        post_wtc_columns = [col for col in post_test_data.columns if 'やる気' in col]
-
-        # Extracting relevant columns
-        pre_confidence_data = pre_test_data[pre_confidence_columns]
-        pre_nervousness_data = pre_test_data[pre_nervousness_columns]
-        pre_wtc_data = pre_test_data[pre_wtc_columns]
-
-        post_confidence_data = post_test_data[post_confidence_columns]
-        post_nervousness_data = post_test_data[post_nervousness_columns]
-        post_wtc_data = post_test_data[post_wtc_columns]
-
-        # Apply the updated mapping function to convert pre-test and post-test WtC ratings to scores
-        pre_confidence_scores = pre_confidence_data.applymap(
-            lambda x: self.revised_map_ratings_to_scores(x, 'confidence'))
-        pre_nervousness_scores = pre_nervousness_data.applymap(
-            lambda x: self.revised_map_ratings_to_scores(x, 'nervousness'))
-        pre_wtc_scores = pre_wtc_data.applymap(lambda x: self.revised_map_ratings_to_scores(x, 'wtc'))
-
-        post_confidence_scores = post_confidence_data.applymap(
-            lambda x: self.revised_map_ratings_to_scores(x, 'confidence'))
-        post_nervousness_scores = post_nervousness_data.applymap(
-            lambda x: self.revised_map_ratings_to_scores(x, 'nervousness'))
-        post_wtc_scores = post_wtc_data.applymap(lambda x: self.revised_map_ratings_to_scores(x, 'wtc'))
-
-        # Calculate average scores for each category in the pre-test and post-test
-        average_pre_confidence_score = pre_confidence_scores.mean(axis=1).mean()
-        average_pre_nervousness_score = pre_nervousness_scores.mean(axis=1).mean()
-        average_pre_wtc_score = pre_wtc_scores.mean(axis=1).mean()
-
-        average_post_confidence_score = post_confidence_scores.mean(axis=1).mean()
-        average_post_nervousness_score = post_nervousness_scores.mean(axis=1).mean()
-        average_post_wtc_score = post_wtc_scores.mean(axis=1).mean()
-
-        # Calculate percentage change for each category
-        percentage_change_confidence = ((average_post_confidence_score - average_pre_confidence_score) / average_pre_confidence_score) * 100
-        percentage_change_nervousness = ((average_post_nervousness_score - average_pre_nervousness_score) / average_pre_nervousness_score) * 100
-        percentage_change_wtc = ((average_post_wtc_score - average_pre_wtc_score) / average_pre_wtc_score) * 100
-
-        # Calculate Cohen's d for each category
-        cohen_d_confidence = self.calculate_cohens_d(pre_confidence_scores.mean(axis=1),
-                                                     post_confidence_scores.mean(axis=1))
-        cohen_d_nervousness = self.calculate_cohens_d(pre_nervousness_scores.mean(axis=1),
-                                                      post_nervousness_scores.mean(axis=1))
-        cohen_d_wtc = self.calculate_cohens_d(pre_wtc_scores.mean(axis=1), post_wtc_scores.mean(axis=1))
-
-        # Perform Wilcoxon Signed-Rank Test for each category
-        wilcoxon_confidence = wilcoxon(pre_confidence_scores.mean(axis=1), post_confidence_scores.mean(axis=1))
-        wilcoxon_nervousness = wilcoxon(pre_nervousness_scores.mean(axis=1), post_nervousness_scores.mean(axis=1))
-        wilcoxon_wtc = wilcoxon(pre_wtc_scores.mean(axis=1), post_wtc_scores.mean(axis=1))
-
-        # Perform Paired t-test for each category
-        ttest_confidence = ttest_rel(pre_confidence_scores.mean(axis=1), post_confidence_scores.mean(axis=1))
-        ttest_nervousness = ttest_rel(pre_nervousness_scores.mean(axis=1), post_nervousness_scores.mean(axis=1))
-        ttest_wtc = ttest_rel(pre_wtc_scores.mean(axis=1), post_wtc_scores.mean(axis=1))
+    def process_comparison(self, result):
+        self.result = result
 
         # Store results for exporting
-        self.comparison_results['Confidence'] = {
-            'pre_score': average_pre_confidence_score,
-            'post_score': average_post_confidence_score,
-            'percentage_change': percentage_change_confidence,
-            'cohen_d': cohen_d_confidence,
-            'wilcoxon': wilcoxon_confidence,
-            'ttest': ttest_confidence
-        }
-        self.comparison_results['Nervousness'] = {
-            'pre_score': average_pre_nervousness_score,
-            'post_score': average_post_nervousness_score,
-            'percentage_change': percentage_change_nervousness,
-            'cohen_d': cohen_d_nervousness,
-            'wilcoxon': wilcoxon_nervousness,
-            'ttest': ttest_nervousness
-        }
-        self.comparison_results['WtC'] = {
-            'pre_score': average_pre_wtc_score,
-            'post_score': average_post_wtc_score,
-            'percentage_change': percentage_change_wtc,
-            'cohen_d': cohen_d_wtc,
-            'wilcoxon': wilcoxon_wtc,
-            'ttest': ttest_wtc
-        }
+        for category, comparison in self.result.categories.items():
+            self.comparison_results[CATEGORY_LABELS[category]] = comparison.to_dict()
 
         # Store data for access
-        self.data = {
-            'confidence': {
-                'pre_score': average_pre_confidence_score,
-                'post_score': average_post_confidence_score,
-                'percentage_change': percentage_change_confidence,
-                'cohen_d': cohen_d_confidence,
-                'wilcoxon': wilcoxon_confidence,
-                'ttest': ttest_confidence
-            },
-            'nervousness': {
-                'pre_score': average_pre_nervousness_score,
-                'post_score': average_post_nervousness_score,
-                'percentage_change': percentage_change_nervousness,
-                'cohen_d': cohen_d_nervousness,
-                'wilcoxon': wilcoxon_nervousness,
-                'ttest': ttest_nervousness
-            },
-            'wtc': {
-                'pre_score': average_pre_wtc_score,
-                'post_score': average_post_wtc_score,
-                'percentage_change': percentage_change_wtc,
-                'cohen_d': cohen_d_wtc,
-                'wilcoxon': wilcoxon_wtc,
-                'ttest': ttest_wtc
-            }
-        }
+        self.data = self.result.to_dict()
 
         # Display the comparison scores
-        self.display_comparison_scores(self.confidence_layout, average_pre_confidence_score,
-                                       average_post_confidence_score, cohen_d_confidence, wilcoxon_confidence,
-                                       ttest_confidence, 'Confidence', percentage_change_confidence)
-        self.display_comparison_scores(self.nervousness_layout, average_pre_nervousness_score,
-                                       average_post_nervousness_score, cohen_d_nervousness, wilcoxon_nervousness,
-                                       ttest_nervousness, 'Nervousness', percentage_change_nervousness)
-        self.display_comparison_scores(self.wtc_layout, average_pre_wtc_score, average_post_wtc_score, cohen_d_wtc,
-                                       wilcoxon_wtc, ttest_wtc, 'WtC', percentage_change_wtc)
+        category_layouts = {
+            'confidence': self.confidence_layout,
+            'nervousness': self.nervousness_layout,
+            'wtc': self.wtc_layout,
+        }
+        for category, comparison in self.result.categories.items():
+            self.display_comparison_scores(category_layouts[category], comparison.pre_score, comparison.post_score,
+                                           comparison.cohen_d, comparison.wilcoxon, comparison.ttest,
+                                           CATEGORY_LABELS[category], comparison.percentage_change,
+                                           resampling_text(comparison.to_dict(), self.result.confidence_level))
 
         # Display the comparison graph
-        self.display_comparison_graph(average_pre_confidence_score, average_post_confidence_score,
-                                      average_pre_nervousness_score, average_post_nervousness_score,
-                                      average_pre_wtc_score, average_post_wtc_score)
-
-        # Perform SVM classification and display results
-        self.perform_svm_classification(pre_confidence_scores, pre_nervousness_scores, pre_wtc_scores,
-                                        post_confidence_scores, post_nervousness_scores, post_wtc_scores)
-
-    def revised_map_ratings_to_scores(self, rating, category):
-        if isinstance(rating, str):
-            rating = rating.strip()
-            if category == 'confidence':
-                if '絶対できない' in rating:
-                    return 0
-                elif 'あまりできない' in rating:
-                    return 1
-                elif '場合によりけり' in rating:
-                    return 2
-                elif '多分できる' in rating:
-                    return 3
-                elif '機会があればやってみたい' in rating:
-                    return 4
-                elif '簡単にできる' in rating:
-                    return 5
-            elif category == 'nervousness':
-                if 'すごく緊張する' in rating:
-                    return 0
-                elif 'できれば避けたい' in rating:
-                    return 1
-                elif 'かなり緊張する' in rating:
-                    return 2
-                elif 'すこしは緊張する' in rating:
-                    return 3
-                elif '緊張しない' in rating:
-                    return 4
-            elif category == 'wtc':
-                if 'できれば避けたい' in rating:
-                    return 0
-                elif '機会があればやってみたい' in rating:
-                    return 1
-                elif '多分できる' in rating:
-                    return 2
-                elif '簡単にできる' in rating:
-                    return 3
-        return None
-
-    def calculate_cohens_d(self, pre_scores, post_scores):
-        diff = post_scores - pre_scores
-        cohen_d = diff.mean() / diff.std(ddof=1)
-        return cohen_d
+        self.display_comparison_graph()
+
+        # Display SVM results
+        self.display_svm_results(self.result.svm_accuracy, self.result.svm_report)
+        self.export_button.setEnabled(True)  # Enable the export button
 
     def display_comparison_scores(self, layout, pre_score, post_score, cohen_d, wilcoxon_result, ttest_result,
-                                  category, percentage_change):
+                                  category, percentage_change, resampling=""):
         scores_text = (
             f"{category} Comparison:\n"
             f"Pre-Test: {pre_score:.2f}\n"
@@ -314,82 +182,23 @@ class ComparisonPrePostTestFrame(QFrame):
             f"Cohen's d: {cohen_d:.2f}\n"
             f"Wilcoxon: W={wilcoxon_result.statistic:.2f}, p={wilcoxon_result.pvalue:.4f}\n"
             f"Paired t-test: t={ttest_result.statistic:.2f}, p={ttest_result.pvalue:.4f}"
+            f"{resampling}"
         )
         scores_label = QLabel(scores_text)
         layout.addWidget(scores_label)
 
-    def display_comparison_graph(self, pre_confidence, post_confidence, pre_nervousness, post_nervousness, pre_wtc,
-                                 post_wtc):
-        categories = ['Confidence', 'Nervousness', 'WtC']
-        pre_scores = [pre_confidence, pre_nervousness, pre_wtc]
-        post_scores = [post_confidence, post_nervousness, post_wtc]
-
-        x = range(len(categories))
-
-        plt.figure(figsize=(5, 3))
-        plt.bar(x, pre_scores, width=0.4, label='Pre-Test', align='center')
-        plt.bar(x, post_scores, width=0.4, label='Post-Test', align='edge')
-        plt.xticks(x, categories)
-        plt.xlabel('Categories')
-        plt.ylabel('Scores')
-        plt.title('Comparison of Pre-Test and Post-Test Scores')
-        plt.legend()
-
-        # Ensure the Output directory exists
-        output_dir = "generate_graphs"
-        os.makedirs(output_dir, exist_ok=True)
-
-        # Create a unique filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        filename = os.path.join(output_dir, f"comparison_scores_{timestamp}.png")
-        plt.savefig(filename)
-        plt.close()
-
-        # Display the graph in the frame
-        pixmap = QPixmap(filename)
-        graph_label = QLabel()
-        graph_label.setPixmap(pixmap)
-        graph_label.setAlignment(Qt.AlignCenter)
-        self.layout.addWidget(graph_label)
-
-        # Save the graph filename for PDF export
-        self.comparison_results['graph'] = filename
-
-    def perform_svm_classification(self, pre_confidence_scores, pre_nervousness_scores, pre_wtc_scores,
-                                   post_confidence_scores, post_nervousness_scores, post_wtc_scores):
-        # Combine pre-test and post-test data with labels
-        pre_scores = pd.concat(
-            [pre_confidence_scores.mean(axis=1), pre_nervousness_scores.mean(axis=1), pre_wtc_scores.mean(axis=1)],
-            axis=1)
-        pre_scores['label'] = 'pre'
-
-        post_scores = pd.concat(
-            [post_confidence_scores.mean(axis=1), post_nervousness_scores.mean(axis=1), post_wtc_scores.mean(axis=1)],
-            axis=1)
-        post_scores['label'] = 'post'
-
-        combined_data = pd.concat([pre_scores, post_scores], axis=0)
-        combined_data.columns = ['confidence', 'nervousness', 'wtc', 'label']
-
-        # Handle missing values
-        imputer = SimpleImputer(strategy='mean')
-        X = imputer.fit_transform(combined_data[['confidence', 'nervousness', 'wtc']])
-        y = combined_data['label']
-
-        # Split the data
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
-
-        # Train the SVM model
-        model = svm.SVC(kernel='linear')
-        model.fit(X_train, y_train)
-
-        # Predict and evaluate
-        y_pred = model.predict(X_test)
-        accuracy = accuracy_score(y_test, y_pred)
-        report = classification_report(y_test, y_pred)
+    def display_comparison_graph(self):
+        pre_scores = [comparison.pre_score for comparison in self.result.categories.values()]
+        post_scores = [comparison.post_score for comparison in self.result.categories.values()]
+        fig = plots.comparison_graph(pre_scores, post_scores, list(CATEGORY_LABELS.values()))
 
-        # Display SVM results
-        self.display_svm_results(accuracy, report)
+        # Display the graph in the frame at its natural size
+        canvas = FigureCanvas(fig)
+        canvas.setFixedSize(*canvas.get_width_height())
+        self.layout.addWidget(canvas, alignment=Qt.AlignCenter)
+
+        # Keep the figure for PDF export
+        self.comparison_results['graph'] = fig
 
     def display_svm_results(self, accuracy, report):
         accuracy_label = QLabel(f"SVM Accuracy: {accuracy:.2f}")
@@ -408,4 +217,8 @@ class ComparisonPrePostTestFrame(QFrame):
         return fig
 
     def get_data(self):
-        return self.data
\ No newline at end of file
+        return self.data
+
+    def report_summary(self):
+        # Bounded summary for the combined report, None until files are analysed
+        return self.result.report_summary() if self.data else None
\ No newline at end of file
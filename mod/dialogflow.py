@@ -1,14 +1,12 @@
 # mod/dialogflow.py
 
-import os
-import pandas as pd
 from PyQt5.QtWidgets import QVBoxLayout, QLabel, QFileDialog, QFrame, QPushButton, QMessageBox, QScrollArea, QWidget, QHBoxLayout
-from PyQt5.QtGui import QPixmap
-from PyQt5.QtCore import Qt
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from datetime import datetime
-from matplotlib.backends.backend_pdf import PdfPages
+from PyQt5.QtCore import Qt
+from mod import plots, report_writers
+from mod.engine.dialogflow import DialogFlowAnalyzer
+from mod.loader import load_files
+from mod.workers import TaskProgress, loading_progress
 
 
 class DialogFlowFrame(QFrame):
@@ -37,6 +35,9 @@ class DialogFlowFrame(QFrame):
 
         self.layout.addLayout(button_layout)
 
+        self.task_progress = TaskProgress()
+        self.layout.addWidget(self.task_progress)
+
         # Add a scroll area for results
         self.scroll_area = QScrollArea()
         self.scroll_area_widget = QWidget()
@@ -53,39 +54,44 @@ class DialogFlowFrame(QFrame):
         if files:
             self.dialogflow_files = files
             self.process_files()
-            self.report_button.setEnabled(True)  # Enable the report button after files are uploaded
-            self.csv_report_button.setEnabled(True)  # Enable the CSV report button after files are uploaded
 
     def process_files(self):
-        all_data = []
-        for file in self.dialogflow_files:
-            data = pd.read_csv(file)
-            print(f"Processing file: {file}")  # Debugging statement
-            print(f"Columns: {data.columns}")  # Debugging statement
-            all_data.append(data)
-
-        combined_data = pd.concat(all_data)
+        self.clear_layout(self.scroll_area_layout)  # Clear previous results
+        self.report_button.setEnabled(False)
+        self.csv_report_button.setEnabled(False)
+        self.scroll_area_layout.addWidget(QLabel("Processing files..."))
+        self.task_progress.start(self.analyze_files, list(self.dialogflow_files),
+                                 on_result=self.show_results, on_error=self.display_error)
+
+    @staticmethod
+    def analyze_files(worker, files):
+        # Runs on a worker thread: loading, counts and figure rendering
+        worker.report_progress(0, "Loading files")
+        combined_data = load_files(files, progress=loading_progress(worker, 60)).combined()
 
         # Perform analysis
-        self.analyze_data(combined_data)
+        worker.report_progress(60, "Counting utterances")
+        result = DialogFlowAnalyzer().analyze(combined_data, file_count=len(files))
 
-    def analyze_data(self, combined_data):
-        # Analyze the data based on 'Utterance', 'Category', 'Confidence', and 'Strategy'
-        self.utterance_counts = combined_data['Utterance'].value_counts()
-        self.category_counts = combined_data['Category'].value_counts()
-        self.strategy_counts = combined_data['Strategy'].value_counts()
-        self.confidence_stats = combined_data['Confidence'].describe()
+        worker.report_progress(80, "Rendering graphs")
+        fig = plots.dialogflow_graphs(result.utterance_counts, result.category_counts, result.strategy_counts,
+                                      result.confidence_stats)
+        return {'result': result, 'figure': fig}
+
+    def show_results(self, outcome):
+        self.result = outcome['result']
+        self.utterance_counts = self.result.utterance_counts
+        self.category_counts = self.result.category_counts
+        self.strategy_counts = self.result.strategy_counts
+        self.confidence_stats = self.result.confidence_stats
 
         self.display_results(self.utterance_counts, self.category_counts, self.strategy_counts, self.confidence_stats)
-        self.plot_graphs(self.utterance_counts, self.category_counts, self.strategy_counts, self.confidence_stats)
+        self.plot_graphs(outcome['figure'])
 
         # Store data for access
-        self.data = {
-            'utterance_counts': self.utterance_counts.to_dict(),
-            'category_counts': self.category_counts.to_dict(),
-            'strategy_counts': self.strategy_counts.to_dict(),
-            'confidence_stats': self.confidence_stats.to_dict()
-        }
+        self.data = self.result.to_dict()
+        self.report_button.setEnabled(True)  # Enable the report buttons once results are in
+        self.csv_report_button.setEnabled(True)
 
     def display_results(self, utterance_counts, category_counts, strategy_counts, confidence_stats):
         self.clear_layout(self.scroll_area_layout)
@@ -112,76 +118,18 @@ class DialogFlowFrame(QFrame):
             if child.widget():
                 child.widget().deleteLater()
 
-    def plot_graphs(self, utterance_counts, category_counts, strategy_counts, confidence_stats):
-        # Plot graphs for the different analyses
-
-        fig, axs = plt.subplots(2, 2, figsize=(10, 10))
-
-        utterance_counts.plot(kind='bar', ax=axs[0, 0], color='skyblue')
-        axs[0, 0].set_title('Utterance Counts')
-        axs[0, 0].set_xlabel('Utterance')
-        axs[0, 0].set_ylabel('Count')
-
-        category_counts.plot(kind='bar', ax=axs[0, 1], color='lightgreen')
-        axs[0, 1].set_title('Category Counts')
-        axs[0, 1].set_xlabel('Category')
-        axs[0, 1].set_ylabel('Count')
-
-        strategy_counts.plot(kind='bar', ax=axs[1, 0], color='salmon')
-        axs[1, 0].set_title('Strategy Counts')
-        axs[1, 0].set_xlabel('Strategy')
-        axs[1, 0].set_ylabel('Count')
-
-        confidence_stats.plot(kind='box', ax=axs[1, 1])
-        axs[1, 1].set_title('Confidence Statistics')
-        axs[1, 1].set_ylabel('Confidence')
-
-        plt.tight_layout()
-
-        # Save and display the plots
-        output_dir = "Output"
-        os.makedirs(output_dir, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        self.plot_filename = os.path.join(output_dir, f"dialogflow_analysis_{timestamp}.png")
-        plt.savefig(self.plot_filename)
-        plt.close()
-
-        pixmap = QPixmap(self.plot_filename)
-        graph_label = QLabel()
-        graph_label.setPixmap(pixmap)
-        graph_label.setAlignment(Qt.AlignCenter)
-        self.scroll_area_layout.addWidget(graph_label)
+    def plot_graphs(self, fig):
+        # Display the plots at their natural size
+        self.figure = fig
+        canvas = FigureCanvas(fig)
+        canvas.setFixedSize(*canvas.get_width_height())
+        self.scroll_area_layout.addWidget(canvas, alignment=Qt.AlignCenter)
 
     def generate_report(self):
         try:
-            output_dir = "generated_reports"
-            os.makedirs(output_dir, exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            pdf_filename = os.path.join(output_dir, f"dialogflow_report_{timestamp}.pdf")
-
-            with PdfPages(pdf_filename) as pdf:
-                # Add results to PDF
-                fig, ax = plt.subplots(figsize=(8, 6))
-                ax.axis('off')
-                table_data = [
-                    ["Type", "Count"]
-                ]
-                table_data += [["Utterance: " + str(k), v] for k, v in self.utterance_counts.items()]
-                table_data += [["Category: " + str(k), v] for k, v in self.category_counts.items()]
-                table_data += [["Strategy: " + str(k), v] for k, v in self.strategy_counts.items()]
-                table_data += [["Confidence", str(self.confidence_stats)]]
-                ax.table(cellText=table_data, cellLoc='center', loc='center')
-                pdf.savefig(fig)
-                plt.close(fig)
-
-                # Add plots to PDF
-                if hasattr(self, 'plot_filename'):
-                    fig, ax = plt.subplots(figsize=(8, 6))
-                    img = plt.imread(self.plot_filename)
-                    ax.imshow(img)
-                    ax.axis('off')
-                    pdf.savefig(fig)
-                    plt.close(fig)
+            figures = [self.figure] if hasattr(self, 'figure') else []
+            pdf_filename = report_writers.write_dialogflow_pdf(self.utterance_counts, self.category_counts,
+                                                               self.strategy_counts, self.confidence_stats, figures)
 
             QMessageBox.information(self, "Report Generated", f"PDF report generated successfully:\n{pdf_filename}")
 
@@ -190,26 +138,8 @@ class DialogFlowFrame(QFrame):
 
     def generate_csv_report(self):
         try:
-            output_dir = "generated_reports"
-            os.makedirs(output_dir, exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            csv_filename = os.path.join(output_dir, f"dialogflow_report_{timestamp}.csv")
-
-            # Collect results data
-            results_data = {
-                "Type": ["Utterance"] * len(self.utterance_counts) + ["Category"] * len(self.category_counts) + ["Strategy"] * len(self.strategy_counts),
-                "Value": list(self.utterance_counts.index) + list(self.category_counts.index) + list(self.strategy_counts.index),
-                "Count": list(self.utterance_counts.values) + list(self.category_counts.values) + list(self.strategy_counts.values)
-            }
-            results_df = pd.DataFrame(results_data)
-
-            # Save results to CSV
-            results_df.to_csv(csv_filename, index=False)
-
-            # Save confidence stats to CSV
-            confidence_stats_data = self.confidence_stats.to_dict()
-            confidence_stats_df = pd.DataFrame(list(confidence_stats_data.items()), columns=['Metric', 'Value'])
-            confidence_stats_df.to_csv(csv_filename, mode='a', index=False)
+            csv_filename = report_writers.write_dialogflow_csv(self.utterance_counts, self.category_counts,
+                                                               self.strategy_counts, self.confidence_stats)
 
             QMessageBox.information(self, "Report Generated", f"CSV report generated successfully:\n{csv_filename}")
 
@@ -217,4 +147,8 @@ class DialogFlowFrame(QFrame):
             QMessageBox.critical(self, "Error", f"Failed to generate CSV report:\n{str(e)}")
 
     def get_data(self):
-        return self.data
\ No newline at end of file
+        return self.data
+
+    def report_summary(self):
+        # Bounded summary for the combined report, None until files are analysed
+        return self.result.report_summary() if self.data else None
\ No newline at end of file
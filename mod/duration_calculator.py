@@ -3,6 +3,9 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from PyQt5.QtWidgets import QDialog, QFormLayout, QLineEdit, QPushButton, QFileDialog, QMessageBox, QHBoxLayout, QWidget
 
+from mod.batch import run_durations, session_directories
+from mod.workers import TaskProgress, streaming_progress
+
 def DurationCalculatorFunction(parent=None):
     class DurationCalculator(QDialog):
         def __init__(self, parent=None):
@@ -42,6 +45,14 @@ def DurationCalculatorFunction(parent=None):
             layout.addRow(calculate_button)
             calculate_button.clicked.connect(self.calculate_experiment_duration)
 
+            # Batch button: every session directory under a folder, into one table
+            batch_button = QPushButton("Calculate for a Session Directory")
+            layout.addRow(batch_button)
+            batch_button.clicked.connect(self.calculate_batch_durations)
+
+            self.task_progress = TaskProgress()
+            layout.addRow(self.task_progress)
+
             self.setLayout(layout)
 
         def browse_file(self, line_edit):
@@ -56,6 +67,35 @@ def DurationCalculatorFunction(parent=None):
             hbox.addWidget(button)
             layout.addRow(label_text, container)
 
+        def calculate_batch_durations(self):
+            directory = QFileDialog.getExistingDirectory(self, "Select Session Directory")
+            if directory:
+                self.task_progress.start(self.batch_durations, directory,
+                                         on_result=self.show_batch_durations, on_error=self.show_batch_error)
+
+        @staticmethod
+        def batch_durations(worker, directory):
+            # Runs on a worker thread
+            return run_durations(session_directories(directory), progress=streaming_progress(worker, 100))
+
+        def show_batch_durations(self, outcome):
+            csv_filename, durations = outcome
+            failed = durations['Error'].notna().sum() if 'Error' in durations.columns else 0
+            negative = (durations['Duration in Epoch (ms)'] < 0).sum() if len(durations) > failed else 0
+            message = f"Durations of {len(durations) - failed} sessions saved to {csv_filename}"
+            warnings = []
+            if negative:
+                warnings.append(f"Warning: {negative} calculated durations are negative.")
+            if failed:
+                warnings.append(f"Warning: {failed} sessions could not be read, see the Error column.")
+            if warnings:
+                QMessageBox.warning(self, "Experiment Durations", "\n\n".join([message] + warnings))
+            else:
+                QMessageBox.information(self, "Experiment Durations", message)
+
+        def show_batch_error(self, message):
+            QMessageBox.critical(self, "Error", f"An error occurred while calculating durations: {message}")
+
         def calculate_experiment_duration(self):
             try:
                 heartrate_df = pd.read_csv(self.heartrate_file_input.text())
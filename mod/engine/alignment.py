@@ -0,0 +1,124 @@
+# mod/engine/alignment.py
+import hashlib
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from mod.engine.duration import CLOCK_COLUMNS, CLOCK_OFFSETS_MS
+
+# Sensor samples are matched to the nearest grid tick within these tolerances (ms); a DialogFlow utterance lasts
+# until the next one
+TOLERANCES_MS = {
+    'heart_rate': 1500,
+    'tobii': 50,
+    'face_emotion': 100,
+}
+DIALOGFLOW_COLUMNS = ['utterance', 'category', 'strategy', 'confidence']
+# Clocks, IDs and tracking bookkeeping of the sensor exports, numeric but not readings: never averaged or stored
+# as sensor values
+NON_READING_COLUMNS = {
+    'etimestamp', 'timestamp', 'frame', 'face_id', 'confidence', 'success',
+    'student id', 'participant_name', 'participant input',
+}
+UTTERANCE_INDEX = 'dialogflow.utterance_index'
+
+
+def reading_columns(data: pd.DataFrame):
+    # Numeric columns of a sensor export (lowercase names) that are readings
+    return [column for column in data.select_dtypes('number').columns if column not in NON_READING_COLUMNS]
+
+
+def readings_key():
+    # Changes with NON_READING_COLUMNS and the default clock offsets, so readings stored before a change are not served
+    settings = [sorted(NON_READING_COLUMNS), sorted(CLOCK_OFFSETS_MS.items())]
+    return hashlib.blake2b(repr(settings).encode(), digest_size=4).hexdigest()
+
+
+class SessionAligner:
+    # Resamples the streams of one session onto a common clock: a grid of period_ms ticks over the window all
+    # streams cover (latest start, earliest end), with each stream joined by merge_asof. Columns are prefixed with
+    # their modality ("heart_rate.hr", "tobii.left_eye_x", ...). clock_offsets_ms is added to a modality's
+    # timestamps first, for exports written on a different clock or time zone; by default OpenFace's local time is
+    # moved onto the epoch clock as the Duration Calculator reads it (CLOCK_OFFSETS_MS).
+    def __init__(self, period_ms=100, tolerances_ms=None, clock_offsets_ms=None):
+        self.period_ms = period_ms
+        self.tolerances_ms = {**TOLERANCES_MS, **(tolerances_ms or {})}
+        self.clock_offsets_ms = {**CLOCK_OFFSETS_MS, **(clock_offsets_ms or {})}
+
+    def cache_key(self):
+        # Names the aligned table and every setting it depends on, for TableCache.read_derived
+        settings = [f"{self.period_ms}ms"]
+        settings += [f"{modality}{tolerance}" for modality, tolerance in sorted(self.tolerances_ms.items())]
+        settings += [f"{modality}{offset:+d}" for modality, offset in sorted(self.clock_offsets_ms.items())]
+        settings.append(readings_key())
+        return "aligned-" + "-".join(settings)
+
+    def clock(self, modality, data: pd.DataFrame) -> pd.Series:
+        column = CLOCK_COLUMNS[modality]
+        if column not in data.columns:
+            raise ValueError(f"The {modality} data is missing the '{column}' column.")
+        return pd.to_numeric(data[column], errors='coerce') + self.clock_offsets_ms.get(modality, 0)
+
+    def stream(self, modality, data: pd.DataFrame) -> pd.DataFrame:
+        # One row per distinct timestamp, sorted, with prefixed value columns
+        times = self.clock(modality, data)
+        if modality == 'dialogflow':
+            values = data[[column for column in DIALOGFLOW_COLUMNS if column in data.columns]]
+            stream = values.assign(time_ms=times).dropna(subset=['time_ms']).sort_values('time_ms', kind='stable')
+            stream = stream.drop_duplicates('time_ms', keep='last')
+            stream['utterance_index'] = np.arange(len(stream))
+        else:
+            # Numeric readings only; several rows on one timestamp (e.g. two faces) are averaged
+            values = data[reading_columns(data)]
+            stream = values.assign(time_ms=times).dropna(subset=['time_ms']).groupby('time_ms').mean().reset_index()
+        stream['time_ms'] = stream['time_ms'].astype('int64')
+        return stream.rename(columns={column: f"{modality}.{column}" for column in stream.columns if column != 'time_ms'})
+
+    def window(self, streams: Dict[str, pd.DataFrame]):
+        start = max(stream['time_ms'].iloc[0] for stream in streams.values())
+        end = min(stream['time_ms'].iloc[-1] for stream in streams.values())
+        if end < start:
+            raise ValueError("The uploaded streams do not overlap in time.")
+        return start, end
+
+    def align(self, frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        # frames maps modality names (CLOCK_COLUMNS keys) to their combined data, with lowercase column names
+        streams = {modality: self.stream(modality, data) for modality, data in frames.items()}
+        streams = {modality: stream for modality, stream in streams.items() if len(stream)}
+        if not streams:
+            raise ValueError("None of the uploaded streams has valid timestamps.")
+
+        start, end = self.window(streams)
+        aligned = pd.DataFrame({'time_ms': np.arange(start, end + 1, self.period_ms, dtype='int64')})
+        for modality, stream in streams.items():
+            if modality == 'dialogflow':
+                aligned = pd.merge_asof(aligned, stream, on='time_ms', direction='backward')
+            else:
+                aligned = pd.merge_asof(aligned, stream, on='time_ms', direction='nearest',
+                                        tolerance=self.tolerances_ms.get(modality, self.period_ms))
+        aligned.insert(1, 'time', pd.to_datetime(aligned['time_ms'], unit='ms'))
+        return aligned
+
+
+def sensor_columns(aligned: pd.DataFrame):
+    return [column for column in aligned.columns
+            if '.' in column and not column.startswith('dialogflow.') and pd.api.types.is_numeric_dtype(aligned[column])]
+
+
+def utterance_summary(aligned: pd.DataFrame, columns: Optional[list] = None) -> pd.DataFrame:
+    # One row per DialogFlow utterance: its text, when it started and ended on the grid, and the mean of every
+    # sensor reading (heart rate, gaze, AUs, ...) while it lasted
+    if UTTERANCE_INDEX not in aligned.columns:
+        raise ValueError("The aligned session has no DialogFlow utterances.")
+    columns = columns or sensor_columns(aligned)
+    grouped = aligned.dropna(subset=[UTTERANCE_INDEX]).groupby(UTTERANCE_INDEX)
+
+    text_columns = [f"dialogflow.{column}" for column in DIALOGFLOW_COLUMNS if f"dialogflow.{column}" in aligned.columns]
+    summary = grouped[text_columns].first()
+    summary['start'] = grouped['time'].min()
+    summary['end'] = grouped['time'].max()
+    summary['samples'] = grouped.size()
+    summary = summary.join(grouped[columns].mean())
+    summary.index = summary.index.astype('int64')
+    return summary
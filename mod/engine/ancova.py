@@ -0,0 +1,62 @@
+# mod/engine/ancova.py
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+def ancova_table(group_ss, covariate_ss, residual_ss, group_df, residual_df, group_label, covariate):
+    # Laid out like statsmodels' anova_lm(..., typ=2)
+    sum_sq = np.array([group_ss, covariate_ss, residual_ss])
+    df = np.array([group_df, 1.0, residual_df])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f_values = (sum_sq[:2] / df[:2]) / (residual_ss / residual_df)
+    return pd.DataFrame({
+        'sum_sq': sum_sq,
+        'df': df,
+        'F': np.append(f_values, np.nan),
+        'PR(>F)': np.append(stats.f.sf(f_values, df[:2], residual_df), np.nan)
+    }, index=[group_label, covariate, 'Residual'])
+
+
+def ancova(data: pd.DataFrame, dependents: List[str], group: str, covariate: str) -> Dict[str, pd.DataFrame]:
+    # Type II sums of squares of `dependent ~ C(group) + covariate` for every dependent at once, without a design
+    # matrix: the group fixed effect is absorbed by demeaning within groups, so the cost does not grow with the
+    # number of groups. Rows missing the dependent, the group or the covariate are dropped per dependent, as
+    # patsy would.
+    groups = data[group]
+    covariate_values = data[covariate].astype('float64')
+    columns = {}
+    for dependent in dependents:
+        valid = data[dependent].notna() & covariate_values.notna() & groups.notna()
+        columns[('y', dependent)] = data[dependent].astype('float64').where(valid)
+        columns[('x', dependent)] = covariate_values.where(valid)
+    values = pd.DataFrame(columns)
+
+    # One groupby over every masked column gives all the group means
+    codes = pd.factorize(groups)[0]
+    within = values - values.groupby(codes).transform('mean')
+    total = values - values.mean()
+    group_counts = values.notna().groupby(codes).sum()
+
+    tables = {}
+    for dependent in dependents:
+        y, x = ('y', dependent), ('x', dependent)
+        n = values[y].count()
+        group_count = int((group_counts.loc[group_counts.index >= 0, y] > 0).sum())
+
+        # Within-group (full model) and pooled (covariate only) regressions on the covariate
+        sxy_within = (within[x] * within[y]).sum()
+        sxx_within = (within[x] ** 2).sum()
+        syy_within = (within[y] ** 2).sum()
+        sxy_total = (total[x] * total[y]).sum()
+        sxx_total = (total[x] ** 2).sum()
+        syy_total = (total[y] ** 2).sum()
+
+        covariate_ss = sxy_within ** 2 / sxx_within
+        residual_ss = syy_within - covariate_ss
+        group_ss = (syy_total - sxy_total ** 2 / sxx_total) - residual_ss
+        tables[dependent] = ancova_table(group_ss, covariate_ss, residual_ss, group_count - 1, n - group_count - 1,
+                                         f"C({group})", covariate)
+    return tables
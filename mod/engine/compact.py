@@ -0,0 +1,73 @@
+# mod/engine/compact.py
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def compact_frame(data: pd.DataFrame, time_column: str, label_column: Optional[str] = None) -> pd.DataFrame:
+    # float32 readings, the smallest integer type for counts, categorical labels and text, rows indexed and sorted
+    # by time_column; the index is int64 when the clock holds whole milliseconds, as the exports' epoch clocks do,
+    # and stays float otherwise
+    compact = {}
+    for column, values in data.items():
+        if column == time_column:
+            continue
+        if column != label_column and pd.api.types.is_float_dtype(values):
+            compact[column] = values.to_numpy(dtype='float32')
+        elif column != label_column and pd.api.types.is_integer_dtype(values):
+            compact[column] = pd.to_numeric(values, downcast='integer').to_numpy()
+        elif pd.api.types.is_bool_dtype(values):
+            compact[column] = values.to_numpy()
+        else:
+            compact[column] = pd.Categorical(values)
+
+    if time_column not in data.columns:
+        # Exports without the clock keep their row order
+        return pd.DataFrame(compact, index=pd.RangeIndex(len(data)), copy=False)
+
+    times = pd.to_numeric(data[time_column], errors='coerce').to_numpy()
+    if np.isfinite(times).all() and np.array_equal(times, np.round(times)):
+        times = times.astype('int64')
+    order = np.argsort(times, kind='stable')
+    index = pd.Index(times[order], name=time_column)
+    return pd.DataFrame({column: values[order] for column, values in compact.items()}, index=index, copy=False)
+
+
+class CompactTable:
+    # Combined session data kept by a frame once analysed, in compact_frame() form. Columns are read through
+    # table[column] (a Series view) or frame(columns); nothing is materialised cell by cell.
+    def __init__(self, data: pd.DataFrame, time_column: str, label_column: Optional[str] = None):
+        self.data = compact_frame(data, time_column, label_column)
+        self.time_column = time_column
+        self.label_column = label_column
+
+    @property
+    def columns(self) -> List[str]:
+        clock = [self.time_column] if self.data.index.name == self.time_column else []
+        return clock + list(self.data.columns)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, column) -> pd.Series:
+        if column == self.data.index.name:
+            return self.data.index.to_series()
+        return self.data[column]
+
+    def frame(self, columns=None) -> pd.DataFrame:
+        # The clock comes back as a column, the rest are the stored arrays, not copies
+        columns = columns or self.columns
+        return pd.DataFrame({column: self[column].array for column in columns}, copy=False)
+
+    def memory_bytes(self):
+        return int(self.data.memory_usage(deep=True).sum())
+
+    def __str__(self):
+        # Used where the frames' data is printed, e.g. the combined PDF report
+        summary = f"{len(self)} rows x {len(self.columns)} columns"
+        if self.label_column in self.data.columns:
+            summary += f", {self.data[self.label_column].nunique()} distinct {self.label_column}"
+        if len(self) and self.data.index.name == self.time_column:
+            summary += f", {self.time_column} {self.data.index[0]} to {self.data.index[-1]}"
+        return summary
@@ -0,0 +1,203 @@
+# mod/engine/comparison.py
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from scipy.stats import ttest_rel, wilcoxon
+from sklearn import svm
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import classification_report, accuracy_score
+from sklearn.impute import SimpleImputer
+
+from mod.engine.survey import score_test
+
+CATEGORY_LABELS = {
+    'confidence': 'Confidence',
+    'nervousness': 'Nervousness',
+    'wtc': 'WtC',
+}
+
+
+# Resamples are drawn in fixed-size blocks, each with its own child seed, so results do not depend on n_jobs
+RESAMPLE_BLOCK = 1000
+
+
+def calculate_cohens_d(pre_scores, post_scores):
+    diff = post_scores - pre_scores
+    return diff.mean() / diff.std(ddof=1)
+
+
+def resampled_statistics(pre, post):
+    # Cohen's d and percentage change of each row of (resamples x respondents) matrices, NaN-aware like pandas
+    diff = post - pre
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cohen_d = np.nanmean(diff, axis=1) / np.nanstd(diff, axis=1, ddof=1)
+        pre_mean = np.nanmean(pre, axis=1)
+        percentage_change = (np.nanmean(post, axis=1) - pre_mean) / pre_mean * 100
+    return cohen_d, percentage_change
+
+
+def bootstrap_block(pre, post, size, seed):
+    # Respondents are resampled as pairs: one index matrix gathers both tests
+    index = np.random.default_rng(seed).integers(0, len(pre), size=(size, len(pre)))
+    return resampled_statistics(pre[index], post[index])
+
+
+def permutation_block(pre, post, size, seed):
+    # Under the null hypothesis the pre and post answers of a respondent are exchangeable
+    swap = np.random.default_rng(seed).random((size, len(pre))) < 0.5
+    return resampled_statistics(np.where(swap, post, pre), np.where(swap, pre, post))
+
+
+@dataclass
+class CategoryComparison:
+    pre_score: float
+    post_score: float
+    percentage_change: float
+    cohen_d: float
+    wilcoxon: Any
+    ttest: Any
+    cohen_d_ci: Optional[Tuple[float, float]] = None
+    percentage_change_ci: Optional[Tuple[float, float]] = None
+    cohen_d_permutation_p: Optional[float] = None
+    percentage_change_permutation_p: Optional[float] = None
+
+    def to_dict(self):
+        return {
+            'pre_score': self.pre_score,
+            'post_score': self.post_score,
+            'percentage_change': self.percentage_change,
+            'cohen_d': self.cohen_d,
+            'wilcoxon': self.wilcoxon,
+            'ttest': self.ttest,
+            'cohen_d_ci': self.cohen_d_ci,
+            'percentage_change_ci': self.percentage_change_ci,
+            'cohen_d_permutation_p': self.cohen_d_permutation_p,
+            'percentage_change_permutation_p': self.percentage_change_permutation_p
+        }
+
+
+@dataclass
+class ComparisonResult:
+    categories: Dict[str, CategoryComparison] = field(default_factory=dict)
+    svm_accuracy: Optional[float] = None
+    svm_report: Optional[str] = None
+    n_resamples: int = 0
+    seed: Optional[int] = None
+    confidence_level: float = 0.95
+
+    def to_dict(self):
+        return {category: comparison.to_dict() for category, comparison in self.categories.items()}
+
+    def report_summary(self):
+        summary = {}
+        for category, comparison in self.categories.items():
+            label = CATEGORY_LABELS.get(category, category)
+            summary[f"{label} Pre / Post"] = (comparison.pre_score, comparison.post_score)
+            summary[f"{label} Percentage Change"] = comparison.percentage_change
+            summary[f"{label} Cohen's d"] = comparison.cohen_d
+            if comparison.cohen_d_ci is not None:
+                summary[f"{label} Cohen's d {self.confidence_level:.0%} CI"] = comparison.cohen_d_ci
+        summary['SVM Accuracy'] = self.svm_accuracy
+        return summary
+
+
+class ComparisonAnalyzer:
+    # n_resamples bootstrap and sign-flip permutation resamples per category; 0 skips the resampling
+    def __init__(self, n_resamples=10_000, seed=42, confidence_level=0.95, n_jobs=-1):
+        self.n_resamples = n_resamples
+        self.seed = seed
+        self.confidence_level = confidence_level
+        self.n_jobs = n_jobs
+
+    def resample(self, block, pre, post, seed_sequence):
+        sizes = [min(RESAMPLE_BLOCK, self.n_resamples - start) for start in range(0, self.n_resamples, RESAMPLE_BLOCK)]
+        # NumPy releases the GIL on these array operations, threads avoid copying the data to processes
+        blocks = Parallel(n_jobs=self.n_jobs, prefer="threads")(
+            delayed(block)(pre, post, size, seed) for size, seed in zip(sizes, seed_sequence.spawn(len(sizes))))
+        return np.concatenate([cohen_d for cohen_d, _ in blocks]), np.concatenate([change for _, change in blocks])
+
+    def interval(self, samples):
+        alpha = (1 - self.confidence_level) / 2
+        low, high = np.nanquantile(samples, [alpha, 1 - alpha])
+        return float(low), float(high)
+
+    def permutation_p(self, samples, observed):
+        # Two-sided, counting the observed statistic as one of the permutations
+        samples = samples[~np.isnan(samples)]
+        return float((np.sum(np.abs(samples) >= abs(observed)) + 1) / (len(samples) + 1))
+
+    def compare_category(self, pre_scores: pd.DataFrame, post_scores: pd.DataFrame,
+                         seed_sequence=None) -> CategoryComparison:
+        # Per-respondent average over the questions of the category
+        pre_means = pre_scores.mean(axis=1)
+        post_means = post_scores.mean(axis=1)
+
+        pre_score = pre_means.mean()
+        post_score = post_means.mean()
+        comparison = CategoryComparison(
+            pre_score=pre_score,
+            post_score=post_score,
+            percentage_change=((post_score - pre_score) / pre_score) * 100,
+            cohen_d=calculate_cohens_d(pre_means, post_means),
+            wilcoxon=wilcoxon(pre_means, post_means),
+            ttest=ttest_rel(pre_means, post_means)
+        )
+
+        if self.n_resamples:
+            # Respondents paired by row, as in the point estimates
+            pairs = pd.concat([pre_means, post_means], axis=1)
+            pre = pairs.iloc[:, 0].to_numpy(dtype='float64')
+            post = pairs.iloc[:, 1].to_numpy(dtype='float64')
+            bootstrap_seeds, permutation_seeds = (seed_sequence or np.random.SeedSequence(self.seed)).spawn(2)
+
+            cohen_d, change = self.resample(bootstrap_block, pre, post, bootstrap_seeds)
+            comparison.cohen_d_ci = self.interval(cohen_d)
+            comparison.percentage_change_ci = self.interval(change)
+
+            cohen_d, change = self.resample(permutation_block, pre, post, permutation_seeds)
+            comparison.cohen_d_permutation_p = self.permutation_p(cohen_d, comparison.cohen_d)
+            comparison.percentage_change_permutation_p = self.permutation_p(change, comparison.percentage_change)
+        return comparison
+
+    def svm(self, pre_scores, post_scores):
+        # Combine pre-test and post-test data with labels
+        pre = pd.concat([pre_scores[category].mean(axis=1) for category in CATEGORY_LABELS], axis=1)
+        pre['label'] = 'pre'
+        post = pd.concat([post_scores[category].mean(axis=1) for category in CATEGORY_LABELS], axis=1)
+        post['label'] = 'post'
+
+        combined_data = pd.concat([pre, post], axis=0)
+        combined_data.columns = list(CATEGORY_LABELS) + ['label']
+
+        # Handle missing values
+        X = SimpleImputer(strategy='mean').fit_transform(combined_data[list(CATEGORY_LABELS)])
+        y = combined_data['label']
+
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+
+        model = svm.SVC(kernel='linear')
+        model.fit(X_train, y_train)
+
+        y_pred = model.predict(X_test)
+        return accuracy_score(y_test, y_pred), classification_report(y_test, y_pred)
+
+    def analyze(self, pre_test_data: pd.DataFrame, post_test_data: pd.DataFrame, progress=None) -> ComparisonResult:
+        # progress(fraction, message), if given, is called before each step with the share of the work done
+        progress = progress or (lambda fraction, message: None)
+        steps = len(CATEGORY_LABELS) + 1
+        pre_scores = score_test(pre_test_data)
+        post_scores = score_test(post_test_data)
+
+        result = ComparisonResult(n_resamples=self.n_resamples, seed=self.seed,
+                                  confidence_level=self.confidence_level)
+        category_seeds = np.random.SeedSequence(self.seed).spawn(len(CATEGORY_LABELS))
+        for index, (category, seed_sequence) in enumerate(zip(CATEGORY_LABELS, category_seeds)):
+            progress(index / steps, f"Comparing {CATEGORY_LABELS[category]}")
+            result.categories[category] = self.compare_category(pre_scores[category], post_scores[category],
+                                                                seed_sequence)
+        progress((steps - 1) / steps, "Training SVM")
+        result.svm_accuracy, result.svm_report = self.svm(pre_scores, post_scores)
+        return result
@@ -0,0 +1,127 @@
+# mod/engine/describe.py
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+from scipy.stats import t
+
+# Columns of the describe_columns() table. skewness/kurtosis are the biased (scipy) estimates, the *_unbiased ones
+# match pandas' Series.skew()/kurt().
+STATISTICS = [
+    'count', 'sum', 'mean', 'std', 'variance', 'min', 'max', 'range', 'median', 'q1', 'q3', 'iqr', 'p10', 'p90',
+    'skewness', 'kurtosis', 'skewness_unbiased', 'kurtosis_unbiased', 'cv', 'mode', 'mad', 'hmean', 'gmean',
+    'ci_low', 'ci_high',
+]
+PERCENTILES = {'p10': 0.10, 'q1': 0.25, 'median': 0.50, 'q3': 0.75, 'p90': 0.90}
+
+
+def value_matrix(columns: Dict[str, object]) -> np.ndarray:
+    # One float64 row per variable, NaN-padded to the longest one so pooled series (e.g. left and right pupil
+    # diameters together) share the matrix with single columns. At least one column wide, empty rows are all NaN
+    arrays = [pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+              for values in columns.values()]
+    matrix = np.full((len(arrays), max([1] + [len(values) for values in arrays])), np.nan)
+    for row, values in enumerate(arrays):
+        matrix[row, :len(values)] = values
+    return matrix
+
+
+def sorted_percentiles(ordered: np.ndarray, counts: np.ndarray, q):
+    # Linear interpolation between the closest ranks, as Series.quantile(); NaNs are sorted last
+    position = q * np.maximum(counts - 1, 0)
+    low = np.floor(position).astype('int64')
+    high = np.minimum(low + 1, np.maximum(counts - 1, 0))
+    low_values = np.take_along_axis(ordered, low[:, None], axis=1)[:, 0]
+    high_values = np.take_along_axis(ordered, high[:, None], axis=1)[:, 0]
+    return np.where(counts > 0, low_values + (high_values - low_values) * (position - low), np.nan)
+
+
+def sorted_runs(ordered: np.ndarray, counts: np.ndarray):
+    # Runs of equal values in the first counts[i] entries of each sorted row, all rows at once: every run gets an
+    # id and bincount sizes them. Returns the row, value and length of each run, in row then value order.
+    rows = np.repeat(np.arange(len(ordered)), counts)
+    values = ordered[np.arange(ordered.shape[1]) < counts[:, None]]
+    starts = np.ones(len(values), dtype=bool)
+    starts[1:] = (values[1:] != values[:-1]) | (rows[1:] != rows[:-1])
+    lengths = np.bincount(np.cumsum(starts) - 1, minlength=int(starts.sum()))
+    return rows[starts], values[starts], lengths
+
+
+def sorted_modes(ordered: np.ndarray, counts: np.ndarray):
+    # Most frequent value of each row, the smallest on ties
+    modes = np.full(len(ordered), np.nan)
+    run_rows, run_values, lengths = sorted_runs(ordered, counts)
+    if not len(run_rows):
+        return modes
+    # Stable: within a row the longest run comes first, ties keep ascending value order
+    order = np.lexsort((-lengths, run_rows))
+    first = order[np.r_[True, run_rows[order][1:] != run_rows[order][:-1]]]
+    modes[run_rows[first]] = run_values[first]
+    return modes
+
+
+def describe_columns(columns: Dict[str, object], confidence=0.95) -> pd.DataFrame:
+    # Summary statistics of every variable in one pass over a single matrix: one sort per row for the median,
+    # quartiles, deciles and mode, one set of centred power sums for the moments. columns maps names to values
+    # (Series, arrays); NaNs are skipped. Returns one row per name with the STATISTICS columns; statistics a
+    # variable has too few values for are NaN, as are the harmonic and geometric means without positive values.
+    names = list(columns)
+    matrix = value_matrix(columns)
+    valid = ~np.isnan(matrix)
+    counts = valid.sum(axis=1)
+    n = counts.astype('float64')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total = np.where(valid, matrix, 0.0).sum(axis=1)
+        mean = np.where(counts > 0, total / n, np.nan)
+        centred = np.where(valid, matrix - mean[:, None], 0.0)
+        squared = centred * centred
+        m2 = squared.sum(axis=1)
+        m3 = (squared * centred).sum(axis=1)
+        m4 = (squared * squared).sum(axis=1)
+        mad = np.abs(centred).sum(axis=1) / n
+
+        variance = np.where(counts > 1, m2 / (n - 1), np.nan)
+        std = np.sqrt(variance)
+        skewness = (m3 / n) / (m2 / n) ** 1.5
+        kurtosis = (m4 / n) / (m2 / n) ** 2 - 3
+        # pandas reports 0 for constant series, scipy NaN
+        skewness_unbiased = np.where(m2 > 0, skewness * np.sqrt(n * (n - 1)) / (n - 2), 0.0)
+        kurtosis_unbiased = np.where(m2 > 0, ((n + 1) * kurtosis + 6) * (n - 1) / ((n - 2) * (n - 3)), 0.0)
+        skewness_unbiased = np.where(counts > 2, skewness_unbiased, np.nan)
+        kurtosis_unbiased = np.where(counts > 3, kurtosis_unbiased, np.nan)
+        skewness = np.where(m2 > 0, skewness, np.nan)
+        kurtosis = np.where(m2 > 0, kurtosis, np.nan)
+
+        positive = valid & (matrix > 0)
+        positives = positive.sum(axis=1)
+        hmean = np.where(positives > 0, positives / np.where(positive, 1.0 / matrix, 0.0).sum(axis=1), np.nan)
+        gmean = np.where(positives > 0, np.exp(np.where(positive, np.log(matrix), 0.0).sum(axis=1) / positives), np.nan)
+
+        margin = std / np.sqrt(n) * t.ppf((1 + confidence) / 2., n - 1)
+
+    ordered = np.sort(matrix, axis=1)
+    table = pd.DataFrame({
+        'count': counts,
+        'sum': total,
+        'mean': mean,
+        'std': std,
+        'variance': variance,
+        'min': ordered[:, 0],
+        'max': ordered[np.arange(len(names)), np.maximum(counts - 1, 0)],
+        **{name: sorted_percentiles(ordered, counts, q) for name, q in PERCENTILES.items()},
+        'skewness': skewness,
+        'kurtosis': kurtosis,
+        'skewness_unbiased': skewness_unbiased,
+        'kurtosis_unbiased': kurtosis_unbiased,
+        'mode': sorted_modes(ordered, counts),
+        'mad': mad,
+        'hmean': hmean,
+        'gmean': gmean,
+        'ci_low': mean - margin,
+        'ci_high': mean + margin,
+    }, index=pd.Index(names, name='column'))
+    table['range'] = table['max'] - table['min']
+    table['iqr'] = table['q3'] - table['q1']
+    table['cv'] = np.where(table['mean'] != 0, table['std'] / table['mean'], 0.0)
+    return table[STATISTICS]
@@ -0,0 +1,46 @@
+# mod/engine/dialogflow.py
+from dataclasses import dataclass
+
+import pandas as pd
+
+from mod.engine.summary import top_counts
+
+
+@dataclass
+class DialogFlowResult:
+    file_count: int
+    utterance_counts: pd.Series
+    category_counts: pd.Series
+    strategy_counts: pd.Series
+    confidence_stats: pd.Series
+
+    def report_summary(self, top=10):
+        # Only the most frequent utterances, categories and strategies
+        return {
+            'Number of Files Uploaded': self.file_count,
+            'Utterances': top_counts(self.utterance_counts, top),
+            'Categories': top_counts(self.category_counts, top),
+            'Strategies': top_counts(self.strategy_counts, top),
+            'Average Confidence': self.confidence_stats.get('mean'),
+            'Confidence Std Dev': self.confidence_stats.get('std'),
+        }
+
+    def to_dict(self):
+        return {
+            'utterance_counts': self.utterance_counts.to_dict(),
+            'category_counts': self.category_counts.to_dict(),
+            'strategy_counts': self.strategy_counts.to_dict(),
+            'confidence_stats': self.confidence_stats.to_dict()
+        }
+
+
+class DialogFlowAnalyzer:
+    def analyze(self, data: pd.DataFrame, file_count: int = 1) -> DialogFlowResult:
+        # Analyze the data based on 'Utterance', 'Category', 'Confidence', and 'Strategy'
+        return DialogFlowResult(
+            file_count=file_count,
+            utterance_counts=data['Utterance'].value_counts(),
+            category_counts=data['Category'].value_counts(),
+            strategy_counts=data['Strategy'].value_counts(),
+            confidence_stats=data['Confidence'].describe()
+        )
@@ -0,0 +1,126 @@
+# mod/engine/duration.py
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import pandas as pd
+
+# Epoch milliseconds column of each modality
+CLOCK_COLUMNS = {
+    'heart_rate': 'etimestamp',
+    'tobii': 'etimestamp',
+    'face_emotion': 'timestamp',
+    'dialogflow': 'etimestamp',
+}
+
+DURATION_MODALITIES = ['heart_rate', 'tobii', 'dialogflow', 'face_emotion']
+
+# Besides its clock, only these columns are read from each export
+ID_COLUMNS = {
+    'heart_rate': ['student id', 'participant input'],
+    'dialogflow': ['strategy'],
+}
+
+# As in the Duration Calculator dialog, Etimestamp clocks are read in Japan time and OpenFace timestamps as they are
+LOCAL_TIMEZONE = 'Asia/Tokyo'
+LOCALIZED_MODALITIES = {'heart_rate', 'tobii', 'dialogflow'}
+# The same rule on the epoch clock: OpenFace's local timestamps run ahead of UTC by the zone's offset, which the
+# aligner takes off
+LOCAL_OFFSET_MS = int(pd.Timestamp(0, tz=LOCAL_TIMEZONE).utcoffset().total_seconds() * 1000)
+CLOCK_OFFSETS_MS = {modality: -LOCAL_OFFSET_MS for modality in CLOCK_COLUMNS if modality not in LOCALIZED_MODALITIES}
+
+
+def duration_columns(modality):
+    return [CLOCK_COLUMNS[modality]] + ID_COLUMNS.get(modality, [])
+
+
+def local_times(modality, clock: pd.Series) -> pd.Series:
+    times = pd.to_datetime(pd.to_numeric(clock, errors='coerce'), unit='ms', errors='coerce')
+    if modality in LOCALIZED_MODALITIES:
+        times = times.dt.tz_localize('UTC').dt.tz_convert(LOCAL_TIMEZONE).dt.tz_localize(None)
+    return times
+
+
+def duration_text(duration_ms):
+    duration = pd.to_timedelta(duration_ms, unit='ms')
+    return (f"{duration.components.hours} hours, {duration.components.minutes} minutes, "
+            f"{duration.components.seconds} seconds, {duration.components.milliseconds} milliseconds")
+
+
+@dataclass
+class FileSpan:
+    file: str
+    modality: str
+    start: pd.Timestamp
+    end: pd.Timestamp
+    ids: Dict[str, object] = field(default_factory=dict)
+
+
+def file_span(file_path, modality, data: pd.DataFrame) -> FileSpan:
+    # data holds the file's duration_columns(), with lowercase names
+    column = CLOCK_COLUMNS[modality]
+    if column not in data.columns:
+        raise ValueError(f"{os.path.basename(file_path)} is missing the '{column}' column.")
+    times = local_times(modality, data[column]).dropna()
+    if times.empty:
+        raise ValueError(f"{os.path.basename(file_path)} has no valid '{column}' values.")
+    ids = {name: data[name].dropna().iloc[0] for name in ID_COLUMNS.get(modality, [])
+           if name in data.columns and data[name].notna().any()}
+    return FileSpan(file_path, modality, times.min(), times.max(), ids)
+
+
+@dataclass
+class SessionDuration:
+    session: str
+    student_id: object
+    participant_name: object
+    strategy: object
+    start: pd.Timestamp
+    end: pd.Timestamp
+    file_count: int
+
+    @property
+    def start_epoch(self):
+        return int(self.start.timestamp() * 1000)
+
+    @property
+    def end_epoch(self):
+        return int(self.end.timestamp() * 1000)
+
+    @property
+    def duration_ms(self):
+        return self.end_epoch - self.start_epoch
+
+    def to_row(self):
+        # Same columns as the Duration Calculator dialog's CSV, plus where the files came from
+        return {
+            'Session': self.session,
+            'Student ID': self.student_id,
+            'Participant Name': self.participant_name,
+            'Used Strategy': self.strategy,
+            'Start Time in Epoch': self.start_epoch,
+            'Start Time in Human': self.start.strftime('%Y-%m-%d %H:%M:%S.%f'),
+            'End Time in Epoch': self.end_epoch,
+            'End Time in Human': self.end.strftime('%Y-%m-%d %H:%M:%S.%f'),
+            'Duration in Epoch (ms)': self.duration_ms,
+            'Duration in Human': duration_text(self.duration_ms),
+            'Files': self.file_count,
+        }
+
+
+def session_duration(session, spans: List[FileSpan]) -> SessionDuration:
+    # The experiment runs from the latest start to the earliest end over the modalities; the files of one modality
+    # together cover their first start to their last end
+    missing = [modality for modality in DURATION_MODALITIES if not any(span.modality == modality for span in spans)]
+    if missing:
+        raise ValueError(f"No {', '.join(missing)} files.")
+    start = max(min(span.start for span in spans if span.modality == modality) for modality in DURATION_MODALITIES)
+    end = min(max(span.end for span in spans if span.modality == modality) for modality in DURATION_MODALITIES)
+
+    ids = {}
+    for span in spans:
+        for name, value in span.ids.items():
+            ids.setdefault(name, value)
+    return SessionDuration(session=session, student_id=ids.get('student id', 'Unknown'),
+                           participant_name=ids.get('participant input', 'Unknown'),
+                           strategy=ids.get('strategy', 'Unknown'), start=start, end=end, file_count=len(spans))
@@ -0,0 +1,147 @@
+# mod/engine/face_emotion.py
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from mod.engine.classification import CrossValidatedClassifier, IncrementalClassifier
+from mod.engine.grouped import ALL, SOURCE_COLUMN, grouped_statistics
+from mod.engine.schema import TableSchema
+
+SVM_FEATURES = ['au12_r', 'au14_r', 'au15_r', 'pose_tx', 'pose_ty', 'pose_tz']
+
+# Of OpenFace's 700+ columns only the AU intensities, head translation and what identifies a row are loaded
+SCHEMA = TableSchema('face_emotion', {
+    'timestamp': None,
+    'face_id': None,
+    'pose_tx': 'float32',
+    'pose_ty': 'float32',
+    'pose_tz': 'float32',
+}, patterns={('au', '_r'): 'float32'})
+
+
+def au_column_names(columns) -> List[str]:
+    return [col for col in columns if col.startswith('au') and col.endswith('_r')]
+
+
+def au_columns(data: pd.DataFrame) -> List[str]:
+    return au_column_names(data.columns)
+
+
+@dataclass
+class FaceEmotionResult:
+    file_count: int
+    au_columns: List[str]
+    au_results: List[dict] = field(default_factory=list)
+    svm_report: dict = field(default_factory=dict)
+    svm_report_text: str = ""
+    # Per file (OpenFace exports name no participant), see grouped_statistics; None for streamed uploads
+    group_statistics: Optional[pd.DataFrame] = None
+
+    @property
+    def svm_performed(self):
+        return bool(self.svm_report)
+
+    def report_summary(self):
+        # One average per AU over the uploaded files, instead of every file's rows
+        averages = pd.DataFrame(self.au_results).groupby('AU', sort=False)['Average'].mean() if self.au_results else {}
+        summary = {'Number of Files Uploaded': self.file_count}
+        summary.update({f"Average {au}": average for au, average in averages.items()})
+        summary['SVM Classification'] = self.svm_report_text if self.svm_performed else "Not performed"
+        return summary
+
+
+class AUStatistics:
+    # Per-file mean and variance of each AU column, merged chunk by chunk with the pairwise update of Chan et al.
+    def __init__(self):
+        self.files = {}
+
+    def update(self, file, data: pd.DataFrame):
+        # Chunks arrive as float32 (see SCHEMA); the moments are accumulated in float64
+        data = data.astype('float64')
+        n_b = data.count()
+        mean_b = data.mean().fillna(0.0)
+        m2_b = ((data - mean_b) ** 2).sum()
+        if file not in self.files:
+            self.files[file] = (n_b, mean_b, m2_b)
+            return
+
+        n_a, mean_a, m2_a = self.files[file]
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        weight = (n_b / n.replace(0, 1))
+        self.files[file] = (n, mean_a + delta * weight, m2_a + m2_b + delta ** 2 * n_a * weight)
+
+    def results(self) -> List[dict]:
+        # Same rows as FaceEmotionAnalyzer.file_statistics
+        au_results = []
+        for n, mean, m2 in self.files.values():
+            variance = m2 / (n - 1).where(n > 1)
+            for au in mean.index:
+                average = mean[au] if n[au] else np.nan
+                au_results.append({"AU": au.upper(), "Average": average, "Variance": variance[au],
+                                   "Std Dev": np.sqrt(variance[au])})
+        return au_results
+
+
+class FaceEmotionAnalyzer:
+    label_column = 'face_id'
+    schema = SCHEMA
+
+    def __init__(self, classifier=None):
+        self.classifier = classifier or CrossValidatedClassifier()
+
+    def file_statistics(self, group_statistics: pd.DataFrame, aus: List[str]) -> List[dict]:
+        # One row per AU and uploaded file, in upload order, read off the per-file rows of grouped_statistics
+        files = group_statistics[group_statistics.index.get_level_values(SOURCE_COLUMN) != ALL]
+        rows = pd.concat({au: files[au] for au in aus}, names=['AU'])
+        rows = rows.iloc[np.argsort(np.tile(np.arange(len(files)), len(aus)), kind='stable')]
+        rows = rows[rows['count'] > 0].reset_index('AU')
+        rows['AU'] = rows['AU'].str.upper()
+        rows = rows.rename(columns={'mean': 'Average', 'var': 'Variance', 'std': 'Std Dev'})
+        return rows[['AU', 'Average', 'Variance', 'Std Dev']].to_dict('records')
+
+    def svm(self, data: pd.DataFrame):
+        # Mean and std of the cross-validated metrics, as a dict and as text
+        result = self.classifier.evaluate(data, SVM_FEATURES, self.label_column)
+        if result is None:
+            return {}, ""
+        return result.summary(), result.to_text()
+
+    def analyze_streaming(self, read_chunks, columns: List[str], file_count: int, epochs=1) -> FaceEmotionResult:
+        # For uploads too large to load together. read_chunks(columns) streams (file, chunk) pairs over the files
+        # and is called once per pass: statistics and scaling, `epochs` SGD passes, then the held-out evaluation.
+        aus = au_column_names(columns)
+        svm_columns = SVM_FEATURES + [self.label_column]
+        statistics = AUStatistics()
+        classifier = IncrementalClassifier(SVM_FEATURES, self.label_column)
+        for file, chunk in read_chunks(list(dict.fromkeys(aus + svm_columns))):
+            statistics.update(file, chunk[aus])
+            classifier.observe(chunk)
+
+        result = FaceEmotionResult(file_count=file_count, au_columns=aus, au_results=statistics.results())
+        if classifier.can_train():
+            for _ in range(epochs):
+                for _, chunk in read_chunks(svm_columns):
+                    classifier.learn(chunk)
+            for _, chunk in read_chunks(svm_columns):
+                classifier.score(chunk)
+            holdout = classifier.result()
+            if holdout is not None:
+                result.svm_report, result.svm_report_text = holdout.report(), holdout.to_text()
+        return result
+
+    def analyze(self, data: pd.DataFrame, file_count: int, progress=None) -> FaceEmotionResult:
+        # data comes from LoadedFiles.tagged(): all AU statistics are one groupby over its files. progress(fraction,
+        # message), if given, is called before each step with the share of the work done.
+        progress = progress or (lambda fraction, message: None)
+        progress(0.0, "Calculating AU statistics")
+        aus = au_columns(data)
+        group_statistics = grouped_statistics(data, aus)
+        result = FaceEmotionResult(file_count=file_count, au_columns=aus, group_statistics=group_statistics,
+                                   au_results=self.file_statistics(group_statistics, aus))
+        if data[self.label_column].nunique() > 1:
+            progress(1 / 3, "Training SVM")
+            result.svm_report, result.svm_report_text = self.svm(data)
+        return result
@@ -0,0 +1,89 @@
+# mod/engine/grouped.py
+import os
+from typing import List
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+SOURCE_COLUMN = 'source_file'
+PARTICIPANT_COLUMN = 'participant'
+# Key of the per-participant (all of their files) and global rows
+ALL = 'All'
+STATISTICS = ['count', 'mean', 'std', 'var', 'min', 'max']
+
+# Column naming the participant in each modality's exports; files without one are keyed by their file name
+PARTICIPANT_COLUMNS = {
+    'heart_rate': 'student id',
+    'tobii': 'participant_name',
+}
+
+
+def source_names(files) -> List[str]:
+    # File names, or full paths when two uploads share a name
+    names = [os.path.basename(file) for file in files]
+    return names if len(set(names)) == len(names) else list(files)
+
+
+def participant_labels(data: pd.DataFrame, participant_column, default) -> pd.Categorical:
+    if participant_column not in data.columns:
+        return pd.Categorical.from_codes(np.zeros(len(data), dtype='int8'), [default])
+    labels = data[participant_column]
+    return pd.Categorical(labels.astype(str).where(labels.notna(), default))
+
+
+def tag_sources(frames: List[pd.DataFrame], files, participant_column=None) -> pd.DataFrame:
+    # The files' rows stacked as LoadedFiles.combined() does, each tagged with categorical source_file and
+    # participant columns. Participants come from participant_column; a file without it, or rows with no value in
+    # it, are keyed by the file's name without extension.
+    names = source_names(files)
+    lengths = [len(frame) for frame in frames]
+    sources = pd.Categorical.from_codes(np.repeat(np.arange(len(frames)), lengths), names)
+    participants = union_categoricals(
+        [participant_labels(frame, participant_column, os.path.splitext(os.path.basename(file))[0])
+         for frame, file in zip(frames, files)])
+    tagged = pd.concat(frames, copy=False)
+    tagged[SOURCE_COLUMN] = sources
+    tagged[PARTICIPANT_COLUMN] = participants
+    return tagged
+
+
+def merge_groups(count, mean, m2, minimum, maximum, keys) -> pd.DataFrame:
+    # Combines per-file moments into those of the files sharing a key (pairwise update of Chan et al.)
+    total = count.groupby(keys).sum()
+    union_mean = (count * mean).fillna(0).groupby(keys).sum() / total.where(total > 0)
+    spread = m2.fillna(0) + (count * (mean - union_mean.reindex(keys).to_numpy()) ** 2).fillna(0)
+    variance = spread.groupby(keys).sum() / (total - 1).where(total > 1)
+    return pd.concat({'count': total, 'mean': union_mean, 'std': np.sqrt(variance), 'var': variance,
+                      'min': minimum.groupby(keys).min(), 'max': maximum.groupby(keys).max()}, axis=1)
+
+
+def grouped_statistics(data: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    # Participant x metric table from one groupby-agg pass over tag_sources() data. Rows are indexed by
+    # (participant, source_file): each file of a participant, then (participant, ALL) over all their files, and
+    # (ALL, ALL) over every row last. Columns are (column, statistic) for the STATISTICS.
+    per_file = data.groupby([PARTICIPANT_COLUMN, SOURCE_COLUMN], observed=True, sort=False)[columns] \
+        .agg(['count', 'mean', 'var', 'min', 'max'])
+    # float32 readings are summarised in float64, like the merged rows
+    per_file = per_file.astype({key: 'float64' for key in per_file.columns if key[1] != 'count'}).swaplevel(axis=1)
+    per_file = per_file[per_file['count'].sum(axis=1) > 0]
+    participants = per_file.index.get_level_values(0).astype(str).to_numpy()
+    per_file.index = pd.MultiIndex.from_arrays([participants, per_file.index.get_level_values(1).astype(str)])
+
+    # Participants and the whole upload from the per-file moments, not from the rows again
+    count, mean, variance = per_file['count'], per_file['mean'], per_file['var']
+    moments = (count, mean, variance * (count - 1), per_file['min'], per_file['max'])
+    files = pd.concat({'count': count, 'mean': mean, 'std': np.sqrt(variance), 'var': variance,
+                       'min': per_file['min'], 'max': per_file['max']}, axis=1)
+    totals = merge_groups(*moments, participants)
+    totals.index = pd.MultiIndex.from_arrays([totals.index, [ALL] * len(totals)])
+    overall = merge_groups(*moments, np.full(len(per_file), ALL))
+    overall.index = pd.MultiIndex.from_tuples([(ALL, ALL)])
+    table = pd.concat([files, totals, overall])
+
+    # Each participant's files then their total, participants in order of first appearance
+    rank = pd.Index(list(pd.unique(participants)) + [ALL]).get_indexer(table.index.get_level_values(0))
+    is_total = table.index.get_level_values(1) == ALL
+    table = table.iloc[np.lexsort((is_total, rank))]
+    table.index = table.index.set_names([PARTICIPANT_COLUMN, SOURCE_COLUMN])
+    return table.swaplevel(axis=1)[[(column, statistic) for column in columns for statistic in STATISTICS]]
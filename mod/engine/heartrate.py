@@ -0,0 +1,247 @@
+# mod/engine/heartrate.py
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from mod.engine.grouped import PARTICIPANT_COLUMNS, SOURCE_COLUMN, grouped_statistics
+from mod.engine.schema import TableSchema
+
+
+@dataclass
+class HeartRateResult:
+    file_count: int
+    average: float
+    std_dev: float
+    max_val: float
+    min_val: float
+    median_val: float
+    q1: float
+    q3: float
+    range_val: float
+    iqr: float
+    total_duration: int
+    count: int
+    variance: float
+    skewness: float
+    kurtosis: float
+    mode: Optional[float]
+    confidence_interval: Tuple[float, float]
+    # Per participant and file, see grouped_statistics; None for streamed uploads
+    group_statistics: Optional[pd.DataFrame] = None
+
+    def summary(self):
+        return {
+            'Number of Files Uploaded': self.file_count,
+            'Average Heart Rate': self.average,
+            'Standard Deviation': self.std_dev,
+            'Maximum Heart Rate': self.max_val,
+            'Minimum Heart Rate': self.min_val,
+            'Median Heart Rate': self.median_val,
+            '1st Quartile (Q1)': self.q1,
+            '3rd Quartile (Q3)': self.q3,
+            'Range': self.range_val,
+            'Interquartile Range (IQR)': self.iqr,
+            'Total Duration (records)': self.total_duration,
+            'Count of Records': self.count,
+            'Variance': self.variance,
+            'Skewness': self.skewness,
+            'Kurtosis': self.kurtosis,
+            'Mode': self.mode,
+            '95% Confidence Interval': self.confidence_interval
+        }
+
+
+class HeartRateAccumulator:
+    # One-pass statistics over heart rate chunks with bounded memory. Moments are merged chunk by chunk with the
+    # pairwise Welford/Pébay update and match pandas up to float rounding. Quantiles and the mode come from a
+    # counting histogram: exact while there are at most max_distinct distinct readings (bpm exports have a few
+    # hundred), after which readings are binned to `resolution` and quantiles are within resolution / 2.
+    def __init__(self, file_count=1, max_distinct=100_000, resolution=0.01, preview_points=20_000):
+        self.file_count = file_count
+        self.max_distinct = max_distinct
+        self.resolution = resolution
+        self.binned = False
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.min_val = np.inf
+        self.max_val = -np.inf
+        self.counts = pd.Series(dtype='int64')
+
+        # Evenly strided, time ordered sample for plotting; the stride doubles whenever the buffer fills up
+        self.preview_points = preview_points
+        self.preview_stride = 1
+        self.preview = []
+
+    def update(self, values):
+        values = np.asarray(pd.Series(values).dropna(), dtype='float64')
+        if values.size == 0:
+            return
+
+        n_b = values.size
+        mean_b = values.mean()
+        d = values - mean_b
+        m2_b = np.dot(d, d)
+        m3_b = np.dot(d * d, d)
+        m4_b = np.dot(d * d, d * d)
+
+        n_a = self.n
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.m4 += (m4_b + delta ** 4 * n_a * n_b * (n_a ** 2 - n_a * n_b + n_b ** 2) / n ** 3
+                    + 6 * delta ** 2 * (n_a ** 2 * m2_b + n_b ** 2 * self.m2) / n ** 2
+                    + 4 * delta * (n_a * m3_b - n_b * self.m3) / n)
+        self.m3 += (m3_b + delta ** 3 * n_a * n_b * (n_a - n_b) / n ** 2
+                    + 3 * delta * (n_a * m2_b - n_b * self.m2) / n)
+        self.m2 += m2_b + delta ** 2 * n_a * n_b / n
+        self.mean += delta * n_b / n
+        self.n = n
+
+        self.min_val = min(self.min_val, values.min())
+        self.max_val = max(self.max_val, values.max())
+
+        if self.binned:
+            values = np.round(values / self.resolution) * self.resolution
+        chunk_counts = pd.Series(values).value_counts()
+        self.counts = self.counts.add(chunk_counts, fill_value=0).astype('int64')
+        if not self.binned and len(self.counts) > self.max_distinct:
+            self.binned = True
+            binned_index = np.round(self.counts.index.to_numpy() / self.resolution) * self.resolution
+            self.counts = self.counts.groupby(binned_index).sum()
+
+        self.update_preview(values, n_a)
+
+    def update_preview(self, values, offset):
+        # Keep every preview_stride-th reading, counted from the first one
+        start = (-offset) % self.preview_stride
+        self.preview.extend(values[start::self.preview_stride])
+        while len(self.preview) > self.preview_points:
+            self.preview = self.preview[::2]
+            self.preview_stride *= 2
+
+    def preview_series(self):
+        return pd.Series(self.preview, index=np.arange(len(self.preview)) * self.preview_stride, name='hr')
+
+    def histogram(self):
+        counts = self.counts.sort_index()
+        return counts.index.to_numpy(), counts.to_numpy()
+
+    def quantile(self, q):
+        # Same linear interpolation as pandas, on the sorted readings rebuilt from the histogram
+        values, counts = self.histogram()
+        cumulative = np.cumsum(counts)
+        position = (self.n - 1) * q
+        lower = int(np.floor(position))
+        upper = min(lower + 1, self.n - 1)
+        lower_val = values[np.searchsorted(cumulative, lower, side='right')]
+        upper_val = values[np.searchsorted(cumulative, upper, side='right')]
+        return lower_val + (position - lower) * (upper_val - lower_val)
+
+    def result(self) -> HeartRateResult:
+        n = self.n
+        if n == 0:
+            raise ValueError("No heart rate readings found in the uploaded files.")
+        variance = self.m2 / (n - 1) if n > 1 else np.nan
+        std_dev = np.sqrt(variance)
+
+        # Bias-corrected skewness and excess kurtosis, as computed by pandas
+        skewness = np.nan
+        kurtosis = np.nan
+        if n > 2 and self.m2 > 0:
+            skewness = n * np.sqrt(n - 1) / (n - 2) * self.m3 / self.m2 ** 1.5
+        if n > 3 and self.m2 > 0:
+            kurtosis = (n * (n + 1) * (n - 1) * self.m4 / ((n - 2) * (n - 3) * self.m2 ** 2)
+                        - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3)))
+
+        q1 = self.quantile(0.25)
+        q3 = self.quantile(0.75)
+        # Smallest of the most frequent readings, like Series.mode()[0]
+        mode = self.counts[self.counts == self.counts.max()].index.min()
+
+        return HeartRateResult(
+            file_count=self.file_count,
+            average=self.mean,
+            std_dev=std_dev,
+            max_val=self.max_val,
+            min_val=self.min_val,
+            median_val=self.quantile(0.5),
+            q1=q1,
+            q3=q3,
+            range_val=self.max_val - self.min_val,
+            iqr=q3 - q1,
+            total_duration=n,  # Assuming each record represents one unit of time
+            count=n,
+            variance=variance,
+            skewness=skewness,
+            kurtosis=kurtosis,
+            mode=mode,
+            confidence_interval=stats.norm.interval(0.95, loc=self.mean, scale=std_dev / np.sqrt(n))
+        )
+
+
+class HeartRateAnalyzer:
+    heart_rate_column = 'hr'
+    participant_column = PARTICIPANT_COLUMNS['heart_rate']
+    # Columns loaded for the analysis, the per-participant statistics and the session alignment
+    schema = TableSchema('heart_rate', {'etimestamp': None, 'hr': 'float32', participant_column: 'str'})
+
+    def heart_rate_series(self, data: pd.DataFrame) -> pd.Series:
+        if self.heart_rate_column not in data.columns:
+            raise ValueError("Heart rate column not found in the uploaded files.")
+        return data[self.heart_rate_column].dropna()
+
+    def group_statistics(self, data: pd.DataFrame) -> Optional[pd.DataFrame]:
+        # Only for data tagged by LoadedFiles.tagged()
+        if SOURCE_COLUMN not in data.columns:
+            return None
+        return grouped_statistics(data, [self.heart_rate_column])
+
+    def analyze_chunks(self, chunks, file_count: int = 1) -> HeartRateAccumulator:
+        # Streaming counterpart of analyze() for exports that do not fit in memory
+        accumulator = HeartRateAccumulator(file_count=file_count)
+        for chunk in chunks:
+            accumulator.update(chunk)
+        return accumulator
+
+    def analyze(self, data: pd.DataFrame, file_count: int = 1, progress=None) -> HeartRateResult:
+        # progress(fraction, message), if given, is called before each step with the share of the work done
+        progress = progress or (lambda fraction, message: None)
+        progress(0.0, "Calculating statistics")
+        heart_rate_data = self.heart_rate_series(data)
+
+        average = heart_rate_data.mean()
+        std_dev = heart_rate_data.std()
+        max_val = heart_rate_data.max()
+        min_val = heart_rate_data.min()
+        q1 = heart_rate_data.quantile(0.25)
+        q3 = heart_rate_data.quantile(0.75)
+        count = heart_rate_data.count()
+        mode = heart_rate_data.mode()
+
+        progress(0.5, "Calculating per-participant statistics")
+        group_statistics = self.group_statistics(data)
+        return HeartRateResult(
+            file_count=file_count,
+            average=average,
+            std_dev=std_dev,
+            max_val=max_val,
+            min_val=min_val,
+            median_val=heart_rate_data.median(),
+            q1=q1,
+            q3=q3,
+            range_val=max_val - min_val,
+            iqr=q3 - q1,
+            total_duration=len(heart_rate_data),  # Assuming each record represents one unit of time
+            count=count,
+            variance=heart_rate_data.var(),
+            skewness=heart_rate_data.skew(),
+            kurtosis=heart_rate_data.kurtosis(),
+            mode=mode[0] if not mode.empty else None,
+            confidence_interval=stats.norm.interval(0.95, loc=average, scale=std_dev / np.sqrt(count)),
+            group_statistics=group_statistics
+        )
@@ -0,0 +1,181 @@
+# mod/engine/individual.py
+import warnings
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm, rankdata, t
+
+from mod.engine.describe import describe_columns, sorted_runs
+
+# Variables the Individual Analyzer's test blocks describe, by their headers in the exports
+AU_COLUMNS = ['AU01_r', 'AU02_r', 'AU04_r', 'AU05_r', 'AU06_r', 'AU07_r', 'AU09_r', 'AU10_r', 'AU12_r', 'AU14_r',
+              'AU15_r', 'AU17_r', 'AU20_r', 'AU23_r', 'AU25_r', 'AU26_r', 'AU45_r']
+TOBII_GROUPS = {
+    'Pupil Diameter': ['Left_Pupil_Diameter', 'Right_Pupil_Diameter'],
+    'Head Position': ['Head_Position_X', 'Head_Position_Y', 'Head_Position_Z'],
+    'Head Rotation': ['Head_Rotation_X', 'Head_Rotation_Y', 'Head_Rotation_Z'],
+}
+EYE_COLUMNS = ['Left_Eye_X', 'Left_Eye_Y', 'Right_Eye_X', 'Right_Eye_Y']
+
+# describe_columns() statistics compared between the tests, as the blocks label them
+STATISTIC_LABELS = {
+    'mean': 'Average',
+    'std': 'Standard Deviation',
+    'min': 'Minimum',
+    'max': 'Maximum',
+    'median': 'Median',
+    'q1': '1st Quartile (Q1)',
+    'q3': '3rd Quartile (Q3)',
+    'iqr': 'IQR',
+    'range': 'Range',
+    'variance': 'Variance',
+    'skewness': 'Skewness',
+    'kurtosis': 'Kurtosis',
+    'skewness_unbiased': 'Skewness',
+    'kurtosis_unbiased': 'Kurtosis',
+}
+COMPARED_STATISTICS = {
+    'heart_rate': ['mean', 'std', 'min', 'max', 'median', 'q1', 'q3', 'iqr', 'variance', 'skewness_unbiased',
+                   'kurtosis_unbiased'],
+    'tobii': ['mean', 'std', 'min', 'max', 'median', 'range'],
+    'face_emotion': ['mean', 'std', 'min', 'max', 'median', 'iqr', 'skewness', 'kurtosis'],
+}
+TESTS = ['Test 1', 'Test 2']
+
+
+def test_variables(modality, data: pd.DataFrame) -> Dict[str, object]:
+    # describe_columns() input of a test export: Tobii's pupil diameters, head position and rotation are pooled
+    # over their columns
+    if modality == 'heart_rate':
+        return {'HR': data['HR']}
+    if modality == 'tobii':
+        variables = {group: np.concatenate([data[column].to_numpy() for column in columns])
+                     for group, columns in TOBII_GROUPS.items()}
+        variables.update({column: data[column] for column in EYE_COLUMNS})
+        return variables
+    if modality == 'face_emotion':
+        return {au: data[au] for au in AU_COLUMNS}
+    raise ValueError(f"No individual test statistics for {modality}.")
+
+
+def test_metrics(modality, data: pd.DataFrame) -> pd.Series:
+    # The compared statistics of one test export, as a flat "Statistic Variable" series
+    stats = describe_columns(test_variables(modality, data))[COMPARED_STATISTICS[modality]]
+    return pd.Series(stats.to_numpy().ravel(),
+                     index=[f"{STATISTIC_LABELS[statistic]} {variable}"
+                            for variable in stats.index for statistic in stats.columns])
+
+
+# Largest number of differences the signed-rank test gets exact p-values for, as scipy
+EXACT_SIGNED_RANK_MAX = 50
+
+
+@lru_cache(maxsize=None)
+def signed_rank_cdf(n) -> np.ndarray:
+    # P(positive rank sum <= s) for s = 0 .. n(n+1)/2, n untied non-zero differences; counts stay exact in float64
+    counts = np.zeros(n * (n + 1) // 2 + 1)
+    counts[0] = 1
+    for rank in range(1, n + 1):
+        counts[rank:] = counts[rank:] + counts[:-rank].copy()
+    return np.cumsum(counts) / 2.0 ** n
+
+
+def signed_rank_pvalues(differences: np.ndarray) -> np.ndarray:
+    # Two-sided Wilcoxon signed-rank test of each column of a (participants x metrics) matrix, NaNs dropped.
+    # Exact for up to EXACT_SIGNED_RANK_MAX differences without zeros or ties, like scipy.stats.wilcoxon; otherwise
+    # the normal approximation with the tie correction, zero differences dropped.
+    zeros = (differences == 0).sum(axis=0)
+    magnitudes = np.abs(differences).T
+    magnitudes[~(magnitudes > 0)] = np.nan
+    counts = (~np.isnan(magnitudes)).sum(axis=1)
+    # Dropped entries rank after every kept one, so they do not shift the kept ranks
+    ranks = rankdata(np.where(np.isnan(magnitudes), np.inf, magnitudes), axis=1)
+    positive_ranks = np.where(differences.T > 0, ranks, 0.0).sum(axis=1)
+
+    run_rows, _, lengths = sorted_runs(np.sort(magnitudes, axis=1), counts)
+    ties = np.bincount(run_rows, weights=lengths ** 3 - lengths, minlength=len(counts))
+    mean = counts * (counts + 1) / 4
+    variance = counts * (counts + 1) * (2 * counts + 1) / 24 - ties / 48
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (positive_ranks - mean) / np.sqrt(variance)
+    pvalues = np.where(variance > 0, 2 * norm.sf(np.abs(z)), np.nan)
+
+    exact = (counts > 0) & (counts <= EXACT_SIGNED_RANK_MAX) & (zeros == 0) & (ties == 0)
+    for n in np.unique(counts[exact]):
+        columns = exact & (counts == n)
+        cdf = signed_rank_cdf(int(n))
+        rank_sums = positive_ranks[columns].astype('int64')
+        below = cdf[rank_sums]
+        above = 1 - np.where(rank_sums > 0, cdf[rank_sums - 1], 0.0)
+        pvalues[columns] = np.minimum(1.0, 2 * np.minimum(below, above))
+    return pvalues
+
+
+@dataclass
+class CohortComparison:
+    # The compared metrics of every participant's Test 1 and Test 2 exports for one modality, as a
+    # participants x metrics x tests array; NaN where a participant lacks a test or a metric
+    modality: str
+    participants: List[str]
+    metrics: List[str]
+    values: np.ndarray
+
+    @property
+    def differences(self) -> np.ndarray:
+        return self.values[:, :, 1] - self.values[:, :, 0]
+
+    @property
+    def percentage_differences(self) -> np.ndarray:
+        # Test 2 relative to Test 1, signed
+        test1 = self.values[:, :, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(test1 != 0, self.differences / np.abs(test1) * 100, np.nan)
+
+    def summary(self) -> pd.DataFrame:
+        # One row per metric: cohort means and the paired t and Wilcoxon tests along the participant axis, over the
+        # participants with both tests
+        differences = self.differences
+        paired = np.where(np.isnan(differences)[:, :, None], np.nan, self.values)
+        pairs = (~np.isnan(differences)).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+            # Metrics without pairs are NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean_difference = np.nanmean(differences, axis=0)
+            std_difference = np.nanstd(differences, axis=0, ddof=1)
+            t_statistic = mean_difference / (std_difference / np.sqrt(pairs))
+            return pd.DataFrame({
+                'Participants': pairs,
+                'Test 1 Mean': np.nanmean(paired[:, :, 0], axis=0),
+                'Test 2 Mean': np.nanmean(paired[:, :, 1], axis=0),
+                'Mean Difference': mean_difference,
+                'Mean Percentage Difference': np.nanmean(self.percentage_differences, axis=0),
+                't-statistic': t_statistic,
+                't-test p-value': np.where(pairs > 1, 2 * t.sf(np.abs(t_statistic), pairs - 1), np.nan),
+                'Wilcoxon p-value': signed_rank_pvalues(differences),
+                "Cohen's d": mean_difference / std_difference,
+            }, index=pd.Index(self.metrics, name='Metric'))
+
+    def participant_table(self) -> pd.DataFrame:
+        # Long form: one row per participant and metric with both tests and their difference
+        index = pd.MultiIndex.from_product([self.participants, self.metrics], names=['Participant', 'Metric'])
+        return pd.DataFrame({
+            'Test 1': self.values[:, :, 0].ravel(),
+            'Test 2': self.values[:, :, 1].ravel(),
+            'Difference': self.differences.ravel(),
+            'Percentage Difference': self.percentage_differences.ravel(),
+        }, index=index)
+
+
+def compare_cohort(modality, metrics: Dict[str, Dict[int, pd.Series]]) -> CohortComparison:
+    # metrics maps participants to the test_metrics() of their tests 1 and 2; a missing test is left NaN
+    participants = list(metrics)
+    names = list(dict.fromkeys(name for tests in metrics.values() for series in tests.values()
+                               for name in series.index))
+    values = np.full((len(participants), len(names), len(TESTS)), np.nan)
+    for row, participant in enumerate(participants):
+        for test, series in metrics[participant].items():
+            values[row, :, test - 1] = series.reindex(names).to_numpy()
+    return CohortComparison(modality, participants, names, values)
@@ -0,0 +1,39 @@
+# mod/engine/schema.py
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+
+@dataclass
+class TableSchema:
+    # The columns an analysis reads, by lowercase name, with the dtype each is parsed as; None keeps pandas'
+    # inference (epoch timestamps, labels). Columns matching a (prefix, suffix) pattern, e.g. OpenFace's au*_r,
+    # are read as the pattern's dtype.
+    name: str
+    columns: Dict[str, Optional[str]]
+    patterns: Dict[Tuple[str, str], Optional[str]] = field(default_factory=dict)
+
+    def matching_pattern(self, column):
+        for (prefix, suffix), dtype in self.patterns.items():
+            if column.startswith(prefix) and column.endswith(suffix):
+                return (prefix, suffix)
+        return None
+
+    def selects(self, column):
+        return column in self.columns or self.matching_pattern(column) is not None
+
+    def dtype(self, column):
+        if column in self.columns:
+            return self.columns[column]
+        return self.patterns[self.matching_pattern(column)]
+
+    def dtypes(self, names):
+        # Parser dtype argument for the selected names of a file's header, which may not be lowercase
+        dtypes = {name: self.dtype(name.strip().lower()) for name in names if self.selects(name.strip().lower())}
+        return {name: dtype for name, dtype in dtypes.items() if dtype is not None}
+
+    def cache_key(self):
+        # Changes whenever the selection or a dtype does, so projected copies are never served stale
+        digest = hashlib.blake2b(repr((sorted(self.columns.items()), sorted(self.patterns.items()))).encode(),
+                                 digest_size=4)
+        return f"{self.name}-{digest.hexdigest()}"
@@ -0,0 +1,10 @@
+# mod/engine/summary.py
+import pandas as pd
+
+
+def top_counts(counts: pd.Series, top=10):
+    # "value: count" of the `top` most frequent values, and how many others there are
+    text = ", ".join(f"{value}: {count}" for value, count in counts.head(top).items())
+    if len(counts) > top:
+        text += f" (and {len(counts) - top} more)"
+    return text
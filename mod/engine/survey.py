@@ -0,0 +1,93 @@
+# mod/engine/survey.py
+import re
+
+import numpy as np
+import pandas as pd
+
+# Column markers of the WtC questionnaire
+CATEGORY_MARKERS = {
+    'confidence': '自信',
+    'nervousness': '緊張',
+    'wtc': 'やる気',
+}
+
+# Answer fragments and their scores, in matching priority: an answer containing several fragments gets the
+# score of the first one listed
+RATING_SCORES = {
+    'confidence': [
+        ('絶対できない', 0),
+        ('あまりできない', 1),
+        ('場合によりけり', 2),
+        ('多分できる', 3),
+        ('機会があればやってみたい', 4),
+        ('簡単にできる', 5),
+    ],
+    'nervousness': [
+        ('すごく緊張する', 0),
+        ('できれば避けたい', 1),
+        ('かなり緊張する', 2),
+        ('すこしは緊張する', 3),
+        ('緊張しない', 4),
+    ],
+    'wtc': [
+        ('できれば避けたい', 0),
+        ('機会があればやってみたい', 1),
+        ('多分できる', 2),
+        ('簡単にできる', 3),
+    ],
+}
+
+
+def rating_pattern(category):
+    # One lookahead per fragment, tried in order from the start of the answer, so the first capture group that
+    # matched is the highest-priority fragment found anywhere in it
+    lookaheads = '|'.join(f'(?=.*?({re.escape(fragment)}))' for fragment, _ in RATING_SCORES[category])
+    return re.compile(f'^(?:{lookaheads})', re.DOTALL)
+
+
+RATING_PATTERNS = {category: rating_pattern(category) for category in RATING_SCORES}
+SCORE_TABLES = {category: np.array([score for _, score in scores], dtype='float64')
+                for category, scores in RATING_SCORES.items()}
+
+
+def score_answers(answers, category) -> np.ndarray:
+    # Scores an array of distinct answers; anything that is not a recognised text answer scores NaN
+    answers = pd.Series(answers, dtype='object')
+    scores = np.full(len(answers), np.nan)
+    is_text = answers.map(type).eq(str).to_numpy()
+    if is_text.any():
+        matched = answers[is_text].str.extract(RATING_PATTERNS[category]).notna().to_numpy()
+        scores[is_text] = np.where(matched.any(axis=1), SCORE_TABLES[category][matched.argmax(axis=1)], np.nan)
+    return scores
+
+
+def score_ratings(ratings: pd.DataFrame, category) -> pd.DataFrame:
+    # Every distinct answer in the block is scored once, then broadcast back through its factorized code
+    codes, uniques = pd.factorize(ratings.to_numpy(dtype='object').ravel())
+    scores = np.append(score_answers(uniques, category), np.nan)  # code -1 (missing) picks the trailing NaN
+    return pd.DataFrame(scores[codes].reshape(ratings.shape), index=ratings.index, columns=ratings.columns)
+
+
+def category_columns(test_data: pd.DataFrame, category):
+    return [col for col in test_data.columns if CATEGORY_MARKERS[category] in col]
+
+
+def score_category(test_data: pd.DataFrame, category) -> pd.DataFrame:
+    return score_ratings(test_data[category_columns(test_data, category)], category)
+
+
+def score_test(test_data: pd.DataFrame):
+    # Score frames of every category, one row per respondent
+    return {category: score_category(test_data, category) for category in CATEGORY_MARKERS}
+
+
+def respondent_scores_text(test_data: pd.DataFrame, scores, respondent_id):
+    # Mean scores of one respondent as shown by the individual analyzer; None if they did not answer
+    matches = test_data.index[test_data['Respondent ID'].astype(str) == respondent_id]
+    if len(matches) == 0:
+        return None
+    idx = matches[0]
+    return (f"Respondent ID {respondent_id} Scores:\n"
+            f"Confidence: {scores['confidence'].loc[idx].mean():.2f} on 5\n"
+            f"Nervousness: {scores['nervousness'].loc[idx].mean():.2f} on 4\n"
+            f"WtC: {scores['wtc'].loc[idx].mean():.2f} on 3")
@@ -0,0 +1,61 @@
+# mod/engine/systemchoice.py
+from dataclasses import dataclass
+from datetime import datetime, date, time
+
+import pandas as pd
+
+from mod.engine.summary import top_counts
+
+FIRST_STRATEGY_COLUMNS = ('Start times of First test strategy 1', 'End Times of First test strategy 1')
+SECOND_STRATEGY_COLUMNS = ('Start times of Second test  Strategy 2', 'End Times of Second test Strategy 2')
+DEMOGRAPHIC_COLUMNS = ['Gender', 'Education Level', 'Language Proficiency', 'Prefered System']
+
+
+@dataclass
+class SystemChoiceResult:
+    first_strategy_stats: dict
+    second_strategy_stats: dict
+    preferred_system_counts: pd.Series
+    demographics: pd.DataFrame
+    observations: pd.DataFrame
+    feedback: pd.DataFrame
+
+    def report_summary(self):
+        summary = {}
+        for name, stats in (('First Strategy', self.first_strategy_stats), ('Second Strategy', self.second_strategy_stats)):
+            summary.update({f"{name} {key.replace('_', ' ').title()} (min)": value for key, value in stats.items()})
+        summary['Preferred System'] = top_counts(self.preferred_system_counts)
+        return summary
+
+    def to_dict(self):
+        return {
+            'first_strategy_stats': self.first_strategy_stats,
+            'second_strategy_stats': self.second_strategy_stats,
+            'preferred_system_counts': self.preferred_system_counts.to_dict()
+        }
+
+
+class SystemChoiceAnalyzer:
+    def strategy_duration_stats(self, start, end):
+        today = date.today()
+        start = start.apply(lambda t: datetime.combine(today, t) if isinstance(t, time) else t)
+        end = end.apply(lambda t: datetime.combine(today, t) if isinstance(t, time) else t)
+
+        # Interaction times in minutes
+        duration = (end - start).dt.total_seconds() / 60
+        return {
+            'average': duration.mean(),
+            'std_dev': duration.std(),
+            'min': duration.min(),
+            'max': duration.max()
+        }
+
+    def analyze(self, data: pd.DataFrame) -> SystemChoiceResult:
+        return SystemChoiceResult(
+            first_strategy_stats=self.strategy_duration_stats(*(data[col] for col in FIRST_STRATEGY_COLUMNS)),
+            second_strategy_stats=self.strategy_duration_stats(*(data[col] for col in SECOND_STRATEGY_COLUMNS)),
+            preferred_system_counts=data['Prefered System'].value_counts(),
+            demographics=data[DEMOGRAPHIC_COLUMNS].describe(),
+            observations=data.filter(like='Observation'),
+            feedback=data.filter(like='Feedback')
+        )
@@ -0,0 +1,112 @@
+# mod/engine/tobii.py
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+from mod.engine.ancova import ancova
+from mod.engine.classification import CrossValidatedClassifier
+from mod.engine.grouped import PARTICIPANT_COLUMNS, SOURCE_COLUMN, grouped_statistics
+from mod.engine.schema import TableSchema
+
+AVERAGE_COLUMNS = {
+    'left_eye_x_avg': 'left_eye_x',
+    'left_eye_y_avg': 'left_eye_y',
+    'right_eye_x_avg': 'right_eye_x',
+    'right_eye_y_avg': 'right_eye_y',
+    'head_pos_x_avg': 'head_position_x',
+    'head_pos_y_avg': 'head_position_y',
+    'head_pos_z_avg': 'head_position_z',
+}
+SVM_FEATURES = ['left_eye_x', 'left_eye_y', 'right_eye_x', 'right_eye_y', 'head_position_x', 'head_position_y',
+                'head_position_z']
+ANCOVA_DEPENDENTS = SVM_FEATURES
+GROUP_COLUMNS = SVM_FEATURES + ['left_pupil_diameter', 'right_pupil_diameter']
+
+# Columns loaded for the analysis, its graphs and the session alignment; head rotation is never read
+SCHEMA = TableSchema('tobii', {
+    'etimestamp': None,
+    'timestamp': None,
+    'participant_name': None,
+    **{column: 'float32' for column in SVM_FEATURES},
+    'left_pupil_diameter': 'float32',
+    'right_pupil_diameter': 'float32',
+})
+
+
+@dataclass
+class TobiiResult:
+    file_count: int
+    left_eye_x_avg: float
+    left_eye_y_avg: float
+    right_eye_x_avg: float
+    right_eye_y_avg: float
+    head_pos_x_avg: float
+    head_pos_y_avg: float
+    head_pos_z_avg: float
+    ancova_results: Optional[pd.DataFrame] = None
+    svm_report: Optional[str] = None
+    # Per participant and file, see grouped_statistics
+    group_statistics: Optional[pd.DataFrame] = None
+
+    def averages(self):
+        return {name: getattr(self, name) for name in AVERAGE_COLUMNS}
+
+    def summary(self):
+        return {
+            'Number of Files Uploaded': self.file_count,
+            'Average Left Eye X': self.left_eye_x_avg,
+            'Average Left Eye Y': self.left_eye_y_avg,
+            'Average Right Eye X': self.right_eye_x_avg,
+            'Average Right Eye Y': self.right_eye_y_avg,
+            'Average Head Position X': self.head_pos_x_avg,
+            'Average Head Position Y': self.head_pos_y_avg,
+            'Average Head Position Z': self.head_pos_z_avg
+        }
+
+    def report_summary(self):
+        # Bounded by the number of dependents and classes, whatever the number of rows
+        summary = self.summary()
+        if self.ancova_results is not None:
+            summary['ANCOVA Results'] = self.ancova_results.to_string(float_format=lambda value: f"{value:.3g}")
+        if self.svm_report:
+            summary['SVM Cross-Validation'] = self.svm_report
+        return summary
+
+
+class TobiiAnalyzer:
+    label_column = PARTICIPANT_COLUMNS['tobii']
+    ancova_covariate = 'timestamp'
+    schema = SCHEMA
+
+    def __init__(self, classifier=None):
+        self.classifier = classifier or CrossValidatedClassifier()
+
+    def averages(self, data: pd.DataFrame):
+        return {name: data[column].mean() for name, column in AVERAGE_COLUMNS.items()}
+
+    def group_statistics(self, data: pd.DataFrame) -> Optional[pd.DataFrame]:
+        # Only for data tagged by LoadedFiles.tagged()
+        if SOURCE_COLUMN not in data.columns:
+            return None
+        return grouped_statistics(data, [column for column in GROUP_COLUMNS if column in data.columns])
+
+    def ancova(self, data: pd.DataFrame) -> pd.DataFrame:
+        # `axis ~ C(participant_name) + timestamp` for every eye and head axis, Type II sums of squares
+        tables = ancova(data, ANCOVA_DEPENDENTS, self.label_column, self.ancova_covariate)
+        return pd.concat(tables, names=['dependent', 'source'])
+
+    def svm(self, data: pd.DataFrame) -> Optional[str]:
+        result = self.classifier.evaluate(data, SVM_FEATURES, self.label_column)
+        return result.to_text() if result is not None else None
+
+    def analyze(self, data: pd.DataFrame, file_count: int = 1, progress=None) -> TobiiResult:
+        # progress(fraction, message), if given, is called before each step with the share of the work done
+        progress = progress or (lambda fraction, message: None)
+        progress(0.0, "Running ANCOVA")
+        ancova_results = self.ancova(data)
+        progress(0.25, "Training SVM")
+        svm_report = self.svm(data)
+        progress(0.9, "Calculating statistics")
+        return TobiiResult(file_count=file_count, ancova_results=ancova_results, svm_report=svm_report,
+                           group_statistics=self.group_statistics(data), **self.averages(data))
@@ -1,17 +1,15 @@
 #mod/face_emotion.py
 
-import os
-import pandas as pd
 from PyQt5.QtWidgets import QVBoxLayout, QLabel, QFrame, QPushButton, QFileDialog, QScrollArea, QWidget, QHBoxLayout, QMessageBox, QTableWidget, QTableWidgetItem
 from PyQt5.QtCore import Qt
-from datetime import datetime
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from sklearn.model_selection import train_test_split
-from sklearn.svm import SVC
-from sklearn.metrics import classification_report
-from sklearn.preprocessing import StandardScaler
-from matplotlib.backends.backend_pdf import PdfPages
+from mod import plots, report_writers
+from mod.engine.alignment import CLOCK_COLUMNS
+from mod.engine.compact import CompactTable
+from mod.engine.face_emotion import FaceEmotionAnalyzer
+from mod.figure_widgets import LazyFigureCanvas, render_visible
+from mod.loader import iter_table_chunks, load_files, needs_streaming, read_columns
+from mod.workers import TaskProgress, analysis_progress, loading_progress, pass_progress
 
 
 class FaceEmotionFrame(QFrame):
@@ -40,6 +38,9 @@ class FaceEmotionFrame(QFrame):
 
         self.layout.addLayout(button_layout)
 
+        self.task_progress = TaskProgress()
+        self.layout.addWidget(self.task_progress)
+
         self.results_scroll = QScrollArea()
         self.results_scroll.setWidgetResizable(True)
         self.results_container = QWidget()
@@ -48,6 +49,13 @@ class FaceEmotionFrame(QFrame):
         self.results_scroll.setWidget(self.results_container)
         self.layout.addWidget(self.results_scroll)
 
+        # AU distribution graphs are only drawn once scrolled into view
+        scroll_bar = self.results_scroll.verticalScrollBar()
+        scroll_bar.valueChanged.connect(self.render_visible_distributions)
+        scroll_bar.rangeChanged.connect(self.render_visible_distributions)
+        self.distribution_canvases = []
+        self.distribution_figures = {}
+
         self.face_emotion_files = []
         self.au_results = []
         self.svm_report = ""
@@ -59,54 +67,74 @@ class FaceEmotionFrame(QFrame):
         if files:
             self.face_emotion_files = files
             self.process_files()
-            self.report_button.setEnabled(True)  # Enable the report button after files are uploaded
-            self.csv_report_button.setEnabled(True)  # Enable the CSV report button after files are uploaded
 
     def process_files(self):
         self.clear_layout(self.results_layout)  # Clear previous results
-        all_data = []
-        file_stats = []
-        for file in self.face_emotion_files:
-            data = pd.read_csv(file) if file.endswith('.csv') else pd.read_excel(file)
-            print(f"Processing file: {file}")  # Debugging statement
-            print(f"Columns: {data.columns}")  # Debugging statement
-            all_data.append(data)
-
-            # Normalize column names
-            data.columns = data.columns.str.strip().str.lower()
-
-            # Calculate statistics for the current file
-            au_columns = [col for col in data.columns if col.startswith('au') and col.endswith('_r')]
-            au_averages = {col: data[col].mean() for col in au_columns}
-            au_variances = {col: data[col].var() for col in au_columns}
-            au_std_devs = {col: data[col].std() for col in au_columns}
-            file_stats.append((file, au_averages, au_variances, au_std_devs))
-
-        combined_data = pd.concat(all_data)
-        self.display_results(file_stats)
-        unique_classes = combined_data['face_id'].nunique()
-        if unique_classes > 1:
-            self.perform_svm(combined_data)
+        self.distribution_canvases = []
+        self.report_button.setEnabled(False)
+        self.csv_report_button.setEnabled(False)
+        self.results_layout.addWidget(QLabel("Processing files..."))
+        self.task_progress.start(self.analyze_files, list(self.face_emotion_files),
+                                 on_result=self.show_results, on_error=self.display_error)
+
+    @staticmethod
+    def analyze_files(worker, files):
+        # Runs on a worker thread: loading, AU statistics, SVM and figure rendering
+        worker.report_progress(0, "Loading files")
+        analyzer = FaceEmotionAnalyzer()
+        if needs_streaming(files):
+            # Too large to concatenate: statistics and an incrementally trained SVM over three passes on the files
+            next_pass_progress = pass_progress(worker, 3)
+            result = analyzer.analyze_streaming(
+                lambda columns: iter_table_chunks(files, columns, progress=next_pass_progress(), schema=analyzer.schema),
+                read_columns(files[-1]), file_count=len(files))
+            return {'result': result, 'graphs': [], 'combined_data': None}
+
+        loaded = load_files(files, progress=loading_progress(worker, 30), schema=analyzer.schema)
+        combined_data = loaded.tagged()
+        result = analyzer.analyze(combined_data, file_count=len(files), progress=analysis_progress(worker, 30, 30))
+
+        worker.report_progress(60, "Rendering graphs")
+        return {
+            'result': result,
+            'graphs': plots.face_emotion_graphs(combined_data),
+            'combined_data': CompactTable(combined_data, CLOCK_COLUMNS['face_emotion'], analyzer.label_column)
+        }
+
+    def show_results(self, outcome):
+        self.result = outcome['result']
+        self.au_results = self.result.au_results
+        self.svm_report = self.result.svm_report
+
+        self.display_results()
+        if self.result.svm_performed:
+            self.results_layout.addWidget(QLabel(f"SVM Classification:\n{self.result.svm_report_text}"))
         else:
             self.results_layout.addWidget(
                 QLabel(f"SVM Classification could not be performed as there is only one class in 'face_id'."))
-        self.plot_graphs(combined_data)
-        self.plot_data_distribution(combined_data, au_columns)
+        # AU distributions are drawn from the retained compact table
+        self.au_data = outcome['combined_data']
+        self.distribution_figures = {}
+        if self.au_data is not None:
+            self.plot_graphs(outcome['graphs'])
+            self.plot_data_distribution(self.result.au_columns)
+        else:
+            self.graph_figures = []
+            self.results_layout.addWidget(QLabel("The uploaded files were analysed in chunks, too large to plot."))
 
         # Store data for access
         self.data = {
-            'file_stats': file_stats,
-            'combined_data': combined_data.to_dict(),
-            'svm_report': self.svm_report if isinstance(self.svm_report, dict) else {},
+            'combined_data': outcome['combined_data'],
+            'svm_report': self.svm_report,
             'au_results': self.au_results
         }
+        self.report_button.setEnabled(True)  # Enable the report buttons once results are in
+        self.csv_report_button.setEnabled(True)
 
-    def display_results(self, file_stats):
+    def display_results(self):
         self.clear_layout(self.results_layout)
         self.results_layout.addWidget(QLabel(f"Number of Files Uploaded: {len(self.face_emotion_files)}"))
 
-        self.au_results = []  # Store AU results for the report
-
         table = QTableWidget()
         table.setColumnCount(4)
         table.setHorizontalHeaderLabels(["AU", "Average", "Variance", "Standard Deviation"])
@@ -117,18 +145,12 @@ class FaceEmotionFrame(QFrame):
         num_visible_rows = 10  # Minimum number of visible rows
         table.setMinimumHeight(row_height * num_visible_rows + table.horizontalHeader().height())
 
-        row = 0
-        for file, au_averages, au_variances, au_std_devs in file_stats:
-            for au in au_averages.keys():
-                table.insertRow(row)
-                table.setItem(row, 0, QTableWidgetItem(au.upper()))
-                table.setItem(row, 1, QTableWidgetItem(f"{au_averages[au]:.2f}"))
-                table.setItem(row, 2, QTableWidgetItem(f"{au_variances[au]:.2f}"))
-                table.setItem(row, 3, QTableWidgetItem(f"{au_std_devs[au]:.2f}"))
-
-                self.au_results.append(
-                    {"AU": au.upper(), "Average": au_averages[au], "Variance": au_variances[au], "Std Dev": au_std_devs[au]})
-                row += 1
+        for row, result in enumerate(self.au_results):
+            table.insertRow(row)
+            table.setItem(row, 0, QTableWidgetItem(result["AU"]))
+            table.setItem(row, 1, QTableWidgetItem(f"{result['Average']:.2f}"))
+            table.setItem(row, 2, QTableWidgetItem(f"{result['Variance']:.2f}"))
+            table.setItem(row, 3, QTableWidgetItem(f"{result['Std Dev']:.2f}"))
 
         table_scroll = QScrollArea()
         table_scroll.setWidgetResizable(True)
@@ -146,157 +168,59 @@ class FaceEmotionFrame(QFrame):
             if child.widget():
                 child.widget().deleteLater()
 
-    def perform_svm(self, data):
-        features = data[['au12_r', 'au14_r', 'au15_r', 'pose_tx', 'pose_ty', 'pose_tz']]
-        labels = data['face_id']
-
-        features = features.fillna(features.mean())
-        X_train, X_test, y_train, y_test = train_test_split(features, labels, test_size=0.3, random_state=42)
-        scaler = StandardScaler()
-        X_train = scaler.fit_transform(X_train)
-        X_test = scaler.transform(X_test)
-
-        model = SVC(kernel='linear')
-        model.fit(X_train, y_train)
-        y_pred = model.predict(X_test)
-        self.svm_report = classification_report(y_test, y_pred, output_dict=True)
-        self.results_layout.addWidget(QLabel(f"SVM Classification Report:\n{classification_report(y_test, y_pred)}"))
+    def display_error(self, message):
+        self.clear_layout(self.results_layout)
+        self.results_layout.addWidget(QLabel(f"Failed to process the uploaded files:\n{message}"))
 
-    def plot_graphs(self, combined_data):
+    def plot_graphs(self, graphs):
         self.results_layout.addWidget(
             QLabel("The following plots show the changes in Facial Action Units and Head Position over time."))
 
-        fig, ax = plt.subplots(figsize=(10, 6))
-        combined_data.plot(x='timestamp', y=['au12_r', 'au14_r', 'au15_r'], ax=ax)
-        ax.set_title('Facial Action Units Over Time')
-        ax.set_xlabel('Time')
-        ax.set_ylabel('Values')
-
-        canvas = FigureCanvas(fig)
-        canvas.setMinimumSize(800, 600)
-        self.results_layout.addWidget(canvas)
-
-        self.graph_filename1 = "Output/face_emotion_graph1.png"
-        fig.savefig(self.graph_filename1)
-        plt.close(fig)
-
-        fig, ax = plt.subplots(figsize=(10, 6))
-        combined_data.plot(x='timestamp', y=['pose_tx', 'pose_ty', 'pose_tz'], ax=ax)
-        ax.set_title('Head Position Over Time')
-        ax.set_xlabel('Time')
-        ax.set_ylabel('Position')
-
-        canvas = FigureCanvas(fig)
-        canvas.setMinimumSize(800, 600)
-        self.results_layout.addWidget(canvas)
+        for fig in graphs:
+            canvas = FigureCanvas(fig)
+            canvas.setMinimumSize(800, 600)
+            self.results_layout.addWidget(canvas)
 
-        self.graph_filename2 = "Output/face_emotion_graph2.png"
-        fig.savefig(self.graph_filename2)
-        plt.close(fig)
+        self.graph_figures = graphs
 
-    def plot_data_distribution(self, data, au_columns):
+    def plot_data_distribution(self, au_columns):
         self.results_layout.addWidget(
             QLabel("The following histograms and box plots show the distribution of each Action Unit (AU)."))
 
-        self.histogram_filenames = []
-        self.boxplot_filenames = []
-
+        self.distribution_canvases = []
         for au in au_columns:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            data[au].plot(kind='hist', bins=30, ax=ax, alpha=0.7, color='blue')
-            ax.set_title(f'Distribution of {au.upper()}')
-            ax.set_xlabel(f'{au.upper()} Values')
-            ax.set_ylabel('Frequency')
-            canvas = FigureCanvas(fig)
-            canvas.setMinimumSize(800, 600)
+            canvas = LazyFigureCanvas(lambda au=au: self.distribution_figure(au, 'histogram'))
             self.results_layout.addWidget(canvas)
-
-            histogram_filename = f"Output/{au}_histogram.png"
-            fig.savefig(histogram_filename)
-            self.histogram_filenames.append(histogram_filename)
-            plt.close(fig)
+            self.distribution_canvases.append(canvas)
 
             self.results_layout.addWidget(
                 QLabel(f"This histogram shows the frequency distribution of {au.upper()} values."))
 
-            fig, ax = plt.subplots(figsize=(10, 6))
-            data[au].plot(kind='box', ax=ax, vert=False)
-            ax.set_title(f'Box Plot of {au.upper()}')
-            ax.set_xlabel(f'{au.upper()} Values')
-            canvas = FigureCanvas(fig)
-            canvas.setMinimumSize(800, 600)
+            canvas = LazyFigureCanvas(lambda au=au: self.distribution_figure(au, 'boxplot'))
             self.results_layout.addWidget(canvas)
-
-            boxplot_filename = f"Output/{au}_boxplot.png"
-            fig.savefig(boxplot_filename)
-            self.boxplot_filenames.append(boxplot_filename)
-            plt.close(fig)
+            self.distribution_canvases.append(canvas)
 
             self.results_layout.addWidget(
                 QLabel(f"This box plot shows the spread and outliers of {au.upper()} values."))
 
+    def distribution_figure(self, au, kind):
+        # Built on first use, by the scroll area or the PDF report, then reused
+        key = (au, kind)
+        if key not in self.distribution_figures:
+            build = plots.au_histogram if kind == 'histogram' else plots.au_boxplot
+            self.distribution_figures[key] = build(self.au_data, au)
+        return self.distribution_figures[key]
+
+    def render_visible_distributions(self):
+        render_visible(self.distribution_canvases)
+
     def generate_report(self):
         try:
-            output_dir = "generated_reports"
-            os.makedirs(output_dir, exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            pdf_filename = os.path.join(output_dir, f"face_emotion_report_{timestamp}.pdf")
-
-            with PdfPages(pdf_filename) as pdf:
-                # Add results to PDF
-                fig, ax = plt.subplots(figsize=(8, 6))
-                ax.axis('off')
-                table_data = [
-                    ["AU", "Average", "Variance", "Standard Deviation"]
-                ]
-                table_data += [[result["AU"], result["Average"], result["Variance"], result["Std Dev"]] for result in self.au_results]
-                ax.table(cellText=table_data, cellLoc='center', loc='center')
-                pdf.savefig(fig)
-                plt.close(fig)
-
-                # Add SVM report to PDF
-                if hasattr(self, 'svm_report') and isinstance(self.svm_report, dict):
-                    fig, ax = plt.subplots(figsize=(8, 6))
-                    ax.axis('off')
-                    text = self.classification_report_from_dict(self.svm_report)
-                    ax.text(0.5, 0.5, text, transform=ax.transAxes, ha='center', va='center', wrap=True)
-                    pdf.savefig(fig)
-                    plt.close(fig)
-
-                # Add graphs to PDF
-                if hasattr(self, 'graph_filename1'):
-                    fig, ax = plt.subplots(figsize=(8, 6))
-                    img = plt.imread(self.graph_filename1)
-                    ax.imshow(img)
-                    ax.axis('off')
-                    pdf.savefig(fig)
-                    plt.close(fig)
-
-                if hasattr(self, 'graph_filename2'):
-                    fig, ax = plt.subplots(figsize=(8, 6))
-                    img = plt.imread(self.graph_filename2)
-                    ax.imshow(img)
-                    ax.axis('off')
-                    pdf.savefig(fig)
-                    plt.close(fig)
-
-                # Add histograms to PDF
-                for filename in self.histogram_filenames:
-                    fig, ax = plt.subplots(figsize=(8, 6))
-                    img = plt.imread(filename)
-                    ax.imshow(img)
-                    ax.axis('off')
-                    pdf.savefig(fig)
-                    plt.close(fig)
-
-                # Add boxplots to PDF
-                for filename in self.boxplot_filenames:
-                    fig, ax = plt.subplots(figsize=(8, 6))
-                    img = plt.imread(filename)
-                    ax.imshow(img)
-                    ax.axis('off')
-                    pdf.savefig(fig)
-                    plt.close(fig)
+            figures = list(self.graph_figures)
+            if self.au_data is not None:
+                figures += [self.distribution_figure(au, 'histogram') for au in self.result.au_columns]
+                figures += [self.distribution_figure(au, 'boxplot') for au in self.result.au_columns]
+            pdf_filename = report_writers.write_face_emotion_pdf(self.au_results, self.svm_report, figures)
 
             QMessageBox.information(self, "Report Generated", f"PDF report generated successfully:\n{pdf_filename}")
 
@@ -304,39 +228,11 @@ class FaceEmotionFrame(QFrame):
             QMessageBox.critical(self, "Error", f"Failed to generate PDF report:\n{str(e)}")
 
     def classification_report_from_dict(self, report_dict):
-        lines = []
-        for label, metrics in report_dict.items():
-            if isinstance(metrics, dict):
-                lines.append(f"Label: {label}")
-                for metric, value in metrics.items():
-                    lines.append(f"  {metric}: {value:.2f}")
-            else:
-                lines.append(f"{label}: {metrics:.2f}")
-        return "\n".join(lines)
+        return report_writers.classification_report_text(report_dict)
 
     def generate_csv_report(self):
         try:
-            output_dir = "generated_reports"
-            os.makedirs(output_dir, exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            csv_filename = os.path.join(output_dir, f"face_emotion_report_{timestamp}.csv")
-
-            # Collect results data
-            results_data = {
-                "AU": [result["AU"] for result in self.au_results],
-                "Average": [result["Average"] for result in self.au_results],
-                "Variance": [result["Variance"] for result in self.au_results],
-                "Std Dev": [result["Std Dev"] for result in self.au_results]
-            }
-            results_df = pd.DataFrame(results_data)
-
-            # Save results to CSV
-            results_df.to_csv(csv_filename, index=False)
-
-            # Save SVM report to CSV
-            if hasattr(self, 'svm_report') and isinstance(self.svm_report, dict):
-                svm_df = pd.DataFrame(self.svm_report).transpose()
-                svm_df.to_csv(csv_filename, mode='a', header=True)
+            csv_filename = report_writers.write_face_emotion_csv(self.au_results, self.svm_report)
 
             QMessageBox.information(self, "Report Generated", f"CSV report generated successfully:\n{csv_filename}")
 
@@ -344,4 +240,8 @@ class FaceEmotionFrame(QFrame):
             QMessageBox.critical(self, "Error", f"Failed to generate CSV report:\n{str(e)}")
 
     def get_data(self):
-        return self.data
\ No newline at end of file
+        return self.data
+
+    def report_summary(self):
+        # Bounded summary for the combined report, None until files are analysed
+        return self.result.report_summary() if self.data else None
\ No newline at end of file
@@ -0,0 +1,71 @@
+# mod/figure_widgets.py
+import numpy as np
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QLabel, QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+
+
+class LazyFigureCanvas(QWidget):
+    # Placeholder of a figure's size that only calls build() and draws the figure once ensure_rendered() is called
+    def __init__(self, build, width=800, height=600, parent=None):
+        super().__init__(parent)
+        self.build = build
+        self.canvas = None
+        self.setMinimumSize(width, height)
+
+        self.layout = QVBoxLayout(self)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.placeholder = QLabel("The graph is drawn when scrolled into view")
+        self.placeholder.setAlignment(Qt.AlignCenter)
+        self.layout.addWidget(self.placeholder)
+
+    def is_rendered(self):
+        return self.canvas is not None
+
+    def is_in_view(self):
+        # visibleRegion is clipped by the scroll area's viewport
+        return self.isVisible() and not self.visibleRegion().isEmpty()
+
+    def ensure_rendered(self):
+        if self.canvas is None:
+            self.canvas = FigureCanvas(self.build())
+            self.canvas.setMinimumSize(self.minimumSize())
+            self.layout.replaceWidget(self.placeholder, self.canvas)
+            self.placeholder.deleteLater()
+        return self.canvas
+
+
+def render_visible(canvases):
+    for canvas in canvases:
+        if not canvas.is_rendered() and canvas.is_in_view():
+            canvas.ensure_rendered()
+
+
+def statistics_table(table, row_height=30, visible_rows=10):
+    # A grouped_statistics() table: participant and file, then one column per metric and statistic
+    widget = QTableWidget(len(table), 2 + len(table.columns))
+    widget.setHorizontalHeaderLabels(list(table.index.names) +
+                                     [f"{column} {statistic}" for column, statistic in table.columns])
+    widget.verticalHeader().setVisible(False)
+    widget.setMinimumHeight(row_height * min(visible_rows, len(table) + 1) + widget.horizontalHeader().height())
+    for row, (keys, values) in enumerate(zip(table.index, table.itertuples(index=False))):
+        for col, key in enumerate(keys):
+            widget.setItem(row, col, QTableWidgetItem(str(key)))
+        for col, ((_, statistic), value) in enumerate(zip(table.columns, values), start=2):
+            text = f"{value:.0f}" if statistic == 'count' else f"{value:.2f}"
+            widget.setItem(row, col, QTableWidgetItem(text))
+    return widget
+
+
+def data_table(table, row_height=30, visible_rows=10):
+    # Any table with a single level of columns, its index in the first column(s)
+    widget = QTableWidget(len(table), table.index.nlevels + len(table.columns))
+    widget.setHorizontalHeaderLabels([str(name or "") for name in table.index.names] + [str(c) for c in table.columns])
+    widget.verticalHeader().setVisible(False)
+    widget.setMinimumHeight(row_height * min(visible_rows, len(table) + 1) + widget.horizontalHeader().height())
+    for row, (keys, values) in enumerate(zip(table.index, table.itertuples(index=False))):
+        keys = keys if table.index.nlevels > 1 else (keys,)
+        for col, value in enumerate(list(keys) + list(values)):
+            text = f"{value:.2f}" if isinstance(value, (float, np.floating)) else str(value)
+            widget.setItem(row, col, QTableWidgetItem(text))
+    return widget
@@ -1,14 +1,12 @@
 # mod/heartrate.py
 
-import os
-import pandas as pd
 from PyQt5.QtWidgets import QVBoxLayout, QLabel, QFrame, QPushButton, QFileDialog, QMessageBox, QHBoxLayout, QScrollArea, QWidget
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import numpy as np
-from datetime import datetime
-from scipy import stats
-from matplotlib.backends.backend_pdf import PdfPages
+from mod import plots, report_writers
+from mod.engine.heartrate import HeartRateAnalyzer
+from mod.figure_widgets import statistics_table
+from mod.loader import iter_column_chunks, load_files, needs_streaming
+from mod.workers import TaskProgress, analysis_progress, loading_progress, streaming_progress
 
 class HeartRateFrame(QFrame):
     def __init__(self, parent=None):
@@ -31,6 +29,9 @@ class HeartRateFrame(QFrame):
 
         self.layout.addLayout(button_layout)
 
+        self.task_progress = TaskProgress()
+        self.layout.addWidget(self.task_progress)
+
         # Scrollable area for results
         self.scroll_area = QScrollArea()
         self.scroll_area.setWidgetResizable(True)
@@ -48,104 +49,94 @@ class HeartRateFrame(QFrame):
         if files:
             self.heart_rate_files = files
             self.process_files()
-            self.report_button.setEnabled(True)  # Enable the report button after files are uploaded
 
     def process_files(self):
         self.clear_layout(self.results_layout)  # Clear previous results
-        all_data = []
-        for file in self.heart_rate_files:
-            data = pd.read_csv(file) if file.endswith('.csv') else pd.read_excel(file)
-            print(f"Processing file: {file}")  # Debugging statement
-            print(f"Columns: {data.columns}")  # Debugging statement
-            all_data.append(data)
-
-        combined_data = pd.concat(all_data)
-
-        # Normalize column names
-        combined_data.columns = combined_data.columns.str.strip().str.lower()
-        heart_rate_column = 'hr'
-        if heart_rate_column in combined_data.columns:
-            heart_rate_data = combined_data[heart_rate_column].dropna()
-
-            self.avg = heart_rate_data.mean()
-            self.std_dev = heart_rate_data.std()
-            self.max_val = heart_rate_data.max()
-            self.min_val = heart_rate_data.min()
-            self.median_val = heart_rate_data.median()
-            self.q1 = heart_rate_data.quantile(0.25)
-            self.q3 = heart_rate_data.quantile(0.75)
-            self.range_val = self.max_val - self.min_val
-            self.iqr = self.q3 - self.q1
-            self.total_duration = len(heart_rate_data)  # Assuming each record represents one unit of time
-            self.count = heart_rate_data.count()
-            self.variance = heart_rate_data.var()
-            self.skewness = heart_rate_data.skew()
-            self.kurtosis = heart_rate_data.kurtosis()
-            self.mode = heart_rate_data.mode()[0] if not heart_rate_data.mode().empty else None
-            self.ci_low, self.ci_high = stats.norm.interval(0.95, loc=self.avg,
-                                                            scale=self.std_dev / np.sqrt(self.count))
-
-
-            # Store data for access
-            self.data = {
-                'Number of Files Uploaded': len(self.heart_rate_files),
-                'Average Heart Rate': self.avg,
-                'Standard Deviation': self.std_dev,
-                'Maximum Heart Rate': self.max_val,
-                'Minimum Heart Rate': self.min_val,
-                'Median Heart Rate': self.median_val,
-                '1st Quartile (Q1)': self.q1,
-                '3rd Quartile (Q3)': self.q3,
-                'Range': self.range_val,
-                'Interquartile Range (IQR)': self.iqr,
-                'Total Duration (records)': self.total_duration,
-                'Count of Records': self.count,
-                'Variance': self.variance,
-                'Skewness': self.skewness,
-                'Kurtosis': self.kurtosis,
-                'Mode': self.mode,
-                '95% Confidence Interval': (self.ci_low, self.ci_high)
-            }
-
-
-            self.display_results()
-            self.plot_graph(heart_rate_data)
-            self.plot_histogram(heart_rate_data)
+        self.report_button.setEnabled(False)
+        self.results_layout.addWidget(QLabel("Processing files..."))
+        self.task_progress.start(self.analyze_files, list(self.heart_rate_files),
+                                 on_result=self.show_results, on_error=self.display_error)
+
+    @staticmethod
+    def analyze_files(worker, files):
+        # Runs on a worker thread: loading, statistics and figure rendering
+        analyzer = HeartRateAnalyzer()
+        if needs_streaming(files):
+            # Too large to concatenate, summarised chunk by chunk
+            worker.report_progress(0, "Streaming files")
+            chunks = iter_column_chunks(files, analyzer.heart_rate_column, progress=streaming_progress(worker, 80),
+                                        schema=analyzer.schema)
+            accumulator = analyzer.analyze_chunks(chunks, file_count=len(files))
+            result = accumulator.result()
+
+            worker.report_progress(80, "Rendering graphs")
+            graph = plots.heart_rate_graph(accumulator.preview_series())
+            histogram = plots.heart_rate_histogram(*accumulator.histogram())
         else:
-            self.display_error("Heart rate column not found in the uploaded files.")
+            worker.report_progress(0, "Loading files")
+            loaded = load_files(files, progress=loading_progress(worker, 60), schema=analyzer.schema)
+            combined_data = loaded.tagged(analyzer.participant_column)
+            result = analyzer.analyze(combined_data, file_count=len(files), progress=analysis_progress(worker, 60, 20))
+            heart_rate_data = analyzer.heart_rate_series(combined_data)
+
+            worker.report_progress(80, "Rendering graphs")
+            graph = plots.heart_rate_graph(heart_rate_data)
+            histogram = plots.heart_rate_histogram(heart_rate_data)
+        return {
+            'result': result,
+            'graph': graph,
+            'histogram': histogram
+        }
+
+    def show_results(self, outcome):
+        self.result = outcome['result']
+
+        # Store data for access
+        self.data = self.result.summary()
+
+        self.display_results()
+        self.plot_graph(outcome['graph'])
+        self.plot_histogram(outcome['histogram'])
+        self.report_button.setEnabled(True)  # Enable the report button once results are in
 
     def display_results(self):
         self.clear_layout(self.results_layout)
+        result = self.result
 
         horizontal_layout = QHBoxLayout()
         self.results_layout.addLayout(horizontal_layout)
 
         # Block 1
         block1_layout = QVBoxLayout()
-        block1_layout.addWidget(QLabel(f"Number of Files Uploaded: {len(self.heart_rate_files)}"))
-        block1_layout.addWidget(QLabel(f"Average Heart Rate: {self.avg:.2f}"))
-        block1_layout.addWidget(QLabel(f"Standard Deviation: {self.std_dev:.2f}"))
-        block1_layout.addWidget(QLabel(f"Maximum Heart Rate: {self.max_val:.2f}"))
-        block1_layout.addWidget(QLabel(f"Minimum Heart Rate: {self.min_val:.2f}"))
-        block1_layout.addWidget(QLabel(f"Median Heart Rate: {self.median_val:.2f}"))
-        block1_layout.addWidget(QLabel(f"1st Quartile (Q1): {self.q1:.2f}"))
-        block1_layout.addWidget(QLabel(f"3rd Quartile (Q3): {self.q3:.2f}"))
-        block1_layout.addWidget(QLabel(f"Range: {self.range_val:.2f}"))
+        block1_layout.addWidget(QLabel(f"Number of Files Uploaded: {result.file_count}"))
+        block1_layout.addWidget(QLabel(f"Average Heart Rate: {result.average:.2f}"))
+        block1_layout.addWidget(QLabel(f"Standard Deviation: {result.std_dev:.2f}"))
+        block1_layout.addWidget(QLabel(f"Maximum Heart Rate: {result.max_val:.2f}"))
+        block1_layout.addWidget(QLabel(f"Minimum Heart Rate: {result.min_val:.2f}"))
+        block1_layout.addWidget(QLabel(f"Median Heart Rate: {result.median_val:.2f}"))
+        block1_layout.addWidget(QLabel(f"1st Quartile (Q1): {result.q1:.2f}"))
+        block1_layout.addWidget(QLabel(f"3rd Quartile (Q3): {result.q3:.2f}"))
+        block1_layout.addWidget(QLabel(f"Range: {result.range_val:.2f}"))
 
         # Block 2
+        ci_low, ci_high = result.confidence_interval
         block2_layout = QVBoxLayout()
-        block2_layout.addWidget(QLabel(f"Interquartile Range (IQR): {self.iqr:.2f}"))
-        block2_layout.addWidget(QLabel(f"Total Duration (records): {self.total_duration}"))
-        block2_layout.addWidget(QLabel(f"Count of Records: {self.count}"))
-        block2_layout.addWidget(QLabel(f"Variance: {self.variance:.2f}"))
-        block2_layout.addWidget(QLabel(f"Skewness: {self.skewness:.2f}"))
-        block2_layout.addWidget(QLabel(f"Kurtosis: {self.kurtosis:.2f}"))
-        block2_layout.addWidget(QLabel(f"Mode: {self.mode:.2f}"))
-        block2_layout.addWidget(QLabel(f"95% Confidence Interval: ({self.ci_low:.2f}, {self.ci_high:.2f})"))
+        block2_layout.addWidget(QLabel(f"Interquartile Range (IQR): {result.iqr:.2f}"))
+        block2_layout.addWidget(QLabel(f"Total Duration (records): {result.total_duration}"))
+        block2_layout.addWidget(QLabel(f"Count of Records: {result.count}"))
+        block2_layout.addWidget(QLabel(f"Variance: {result.variance:.2f}"))
+        block2_layout.addWidget(QLabel(f"Skewness: {result.skewness:.2f}"))
+        block2_layout.addWidget(QLabel(f"Kurtosis: {result.kurtosis:.2f}"))
+        block2_layout.addWidget(QLabel(f"Mode: {result.mode:.2f}"))
+        block2_layout.addWidget(QLabel(f"95% Confidence Interval: ({ci_low:.2f}, {ci_high:.2f})"))
 
         horizontal_layout.addLayout(block1_layout)
         horizontal_layout.addLayout(block2_layout)
 
+        if result.group_statistics is not None:
+            self.results_layout.addWidget(QLabel("Heart rate per participant and file:"))
+            self.results_layout.addWidget(statistics_table(result.group_statistics))
+
     def display_error(self, message):
         self.clear_layout(self.results_layout)
         self.results_layout.addWidget(QLabel(message))
@@ -156,108 +147,28 @@ class HeartRateFrame(QFrame):
             if child.widget():
                 child.widget().deleteLater()
 
-    def plot_graph(self, heart_rate_data):
-        # Create the graph
-        fig, ax = plt.subplots()
-        ax.plot(heart_rate_data)
-        ax.set_title('Heart Rate Over Time')
-        ax.set_xlabel('Time')
-        ax.set_ylabel('Heart Rate')
-
-        # Normal heart rate
-        normal_heart_rate = 70
-        ax.axhline(y=normal_heart_rate, color='green', linestyle='--', label='Normal Heart Rate')
-
-        # High abnormal heart rate (tachycardia)
-        high_abnormal_heart_rate = 100
-        ax.axhline(y=high_abnormal_heart_rate, color='red', linestyle='--', label='High Abnormal Heart Rate')
-
-        # Low abnormal heart rate (bradycardia)
-        low_abnormal_heart_rate = 60
-        ax.axhline(y=low_abnormal_heart_rate, color='blue', linestyle='--', label='Low Abnormal Heart Rate')
-
-        # Add the legend to the plot
-        ax.legend()
-
+    def plot_graph(self, fig):
         # Add the graph to the results layout
         canvas = FigureCanvas(fig)
         canvas.setMinimumSize(400, 400)
         self.results_layout.addWidget(canvas)
 
-        # Save the graph filename for PDF export
-        self.graph_filename = "Output/heart_rate_graph.png"
-        fig.savefig(self.graph_filename)
-        plt.close(fig)
-
-    def plot_histogram(self, heart_rate_data):
-        # Create the histogram
-        fig, ax = plt.subplots()
-        ax.hist(heart_rate_data, bins=20, edgecolor='black')
-        ax.set_title('Distribution of Heart Rate')
-        ax.set_xlabel('Heart Rate')
-        ax.set_ylabel('Frequency')
+        # Keep the figure for PDF export
+        self.graph_figure = fig
 
+    def plot_histogram(self, fig):
         # Add the histogram to the results layout
         canvas = FigureCanvas(fig)
         canvas.setMinimumSize(400, 400)
         self.results_layout.addWidget(canvas)
 
-        # Save the histogram filename for PDF export
-        self.histogram_filename = "Output/heart_rate_histogram.png"
-        fig.savefig(self.histogram_filename)
-        plt.close(fig)
+        # Keep the figure for PDF export
+        self.histogram_figure = fig
 
     def generate_report(self):
         try:
-            output_dir = "generated_reports"
-            os.makedirs(output_dir, exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            pdf_filename = os.path.join(output_dir, f"heart_rate_report_{timestamp}.pdf")
-
-            with PdfPages(pdf_filename) as pdf:
-                # Add results to PDF
-                fig, ax = plt.subplots(figsize=(8, 6))
-                ax.axis('off')
-                text = (
-                    f"Number of Files Uploaded: {len(self.heart_rate_files)}\n"
-                    f"Average Heart Rate: {self.avg:.2f}\n"
-                    f"Standard Deviation: {self.std_dev:.2f}\n"
-                    f"Maximum Heart Rate: {self.max_val:.2f}\n"
-                    f"Minimum Heart Rate: {self.min_val:.2f}\n"
-                    f"Median Heart Rate: {self.median_val:.2f}\n"
-                    f"1st Quartile (Q1): {self.q1:.2f}\n"
-                    f"3rd Quartile (Q3): {self.q3:.2f}\n"
-                    f"Range: {self.range_val:.2f}\n"
-                    f"Interquartile Range (IQR): {self.iqr:.2f}\n"
-                    f"Total Duration (records): {self.total_duration}\n"
-                    f"Count of Records: {self.count}\n"
-                    f"Variance: {self.variance:.2f}\n"
-                    f"Skewness: {self.skewness:.2f}\n"
-                    f"Kurtosis: {self.kurtosis:.2f}\n"
-                    f"Mode: {self.mode:.2f}\n"
-                    f"95% Confidence Interval: ({self.ci_low:.2f}, {self.ci_high:.2f})"
-                )
-                ax.text(0.5, 0.5, text, transform=ax.transAxes, ha='center', va='center', wrap=True)
-                pdf.savefig(fig)
-                plt.close(fig)
-
-                # Add graph to PDF
-                if hasattr(self, 'graph_filename'):
-                    fig, ax = plt.subplots(figsize=(8, 6))
-                    img = plt.imread(self.graph_filename)
-                    ax.imshow(img)
-                    ax.axis('off')
-                    pdf.savefig(fig)
-                    plt.close(fig)
-
-                # Add histogram to PDF
-                if hasattr(self, 'histogram_filename'):
-                    fig, ax = plt.subplots(figsize=(8, 6))
-                    img = plt.imread(self.histogram_filename)
-                    ax.imshow(img)
-                    ax.axis('off')
-                    pdf.savefig(fig)
-                    plt.close(fig)
+            figures = [getattr(self, name) for name in ('graph_figure', 'histogram_figure') if hasattr(self, name)]
+            pdf_filename = report_writers.write_heart_rate_pdf(self.data, figures)
 
             # Show a success message
             QMessageBox.information(self, "Report Generated", f"PDF report generated successfully:\n{pdf_filename}")
@@ -268,6 +179,10 @@ class HeartRateFrame(QFrame):
     def get_data(self):
         return self.data
 
+    def report_summary(self):
+        # Bounded summary for the combined report, None until files are analysed
+        return self.result.summary() if self.data else None
+
 """
 Median Heart Rate: The middle value when the heart rates are sorted.
 Quartiles: The values that divide the data into four equal parts.
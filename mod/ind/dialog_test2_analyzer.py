@@ -1,10 +1,10 @@
 # mod/ind/dialog_test2_analyzer.py
 import os
-import pandas as pd
 from PyQt5.QtWidgets import QVBoxLayout, QHBoxLayout, QLabel, QFrame, QPushButton, QFileDialog, QMessageBox
 from PyQt5.QtCore import Qt
 from datetime import datetime
 from scipy.stats import mode
+from mod.loader import cached_read_table
 
 class DialogTest2Block(QFrame):
     def __init__(self, parent=None):
@@ -31,10 +31,7 @@ class DialogTest2Block(QFrame):
             self.process_dialog_test2_data(file_path)
 
     def process_dialog_test2_data(self, file_path):
-        if file_path.endswith('.csv'):
-            dialog_test2_data = pd.read_csv(file_path)
-        else:
-            dialog_test2_data = pd.read_excel(file_path)
+        dialog_test2_data = cached_read_table(file_path)
 
         # Calculate additional statistics
         self.utterance_counts = dialog_test2_data['Utterance'].value_counts()
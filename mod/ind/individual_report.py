@@ -0,0 +1,99 @@
+# mod/ind/individual_report.py
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from mod.lesfonctions import MyFPDF
+from mod.report_writers import REPORTS_DIR
+
+BLOCK_ORDER = [
+    "Pre-Test", "Post-Test", "System Choice",
+    "HR Test 1", "HR Test 2", "HRs Comparison",
+    "Dialog Test 1", "Dialog Test 2", "Dialogs Comparison",
+    "Tobii Test 1", "Tobii Test 2", "Tobiis Comparison",
+    "OpenFace Test 1", "OpenFace Test 2", "OpenFaces Comparison"
+]
+# Only these blocks change with the participant, the others summarise the uploaded session files
+PARTICIPANT_BLOCKS = ("Pre-Test", "Post-Test", "System Choice")
+COMPARISON_HEADERS = ["Metric", "Test 1", "Test 2"]
+
+
+def latin1(text):
+    # FPDF core fonts only encode latin-1
+    try:
+        text.encode('latin-1')
+        return text
+    except UnicodeEncodeError:
+        return text.encode('utf-8').decode('latin-1')
+
+
+def write_individual_pdf(participant_id, sections, output_dir=REPORTS_DIR):
+    # sections are (block name, text) or (block name, comparison table rows) pairs, in report order
+    pdf = MyFPDF()
+    pdf.add_page()
+
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=f"Participant ID {participant_id} Report", ln=True, align='C')
+
+    for block_name, content in sections:
+        pdf.chapter_title(f"{block_name} Data")
+        if isinstance(content, str):
+            pdf.chapter_body(latin1(content))
+        else:
+            pdf.add_comparison_table(COMPARISON_HEADERS, [[latin1(cell) for cell in row] for row in content])
+
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    pdf_filename = os.path.join(output_dir, f"{participant_id}_report_individual_{timestamp}.pdf")
+    pdf.output(pdf_filename)
+    return pdf_filename
+
+
+def select_participants(participant_ids, selection=""):
+    # selection lists IDs and inclusive ranges, e.g. "20240501-20240509, 20240512"; empty keeps every ID
+    terms = [term for term in re.split(r"[,\s]+", selection.strip()) if term]
+    if not terms:
+        return list(participant_ids)
+
+    def selected(participant_id):
+        for term in terms:
+            low, _, high = term.partition('-')
+            if not high:
+                if participant_id == term:
+                    return True
+            elif low.isdigit() and high.isdigit() and participant_id.isdigit():
+                if int(low) <= int(participant_id) <= int(high):
+                    return True
+            elif low <= participant_id <= high:
+                return True
+        return False
+    return [participant_id for participant_id in participant_ids if selected(participant_id)]
+
+
+def write_individual_pdfs(reports, output_dir=REPORTS_DIR, max_workers=None, progress=None):
+    # reports maps participant IDs to their sections. Each PDF is laid out in a spawned worker process;
+    # progress(done, total, pdf_filename) is called as each one is written. Returns the files in reports' order.
+    participant_ids = list(reports)
+    pdf_filenames = {}
+    max_workers = min(max_workers or os.cpu_count() or 1, len(participant_ids))
+    if max_workers <= 1:
+        for participant_id in participant_ids:
+            pdf_filenames[participant_id] = write_individual_pdf(participant_id, reports[participant_id], output_dir)
+            if progress:
+                progress(len(pdf_filenames), len(participant_ids), pdf_filenames[participant_id])
+        return [pdf_filenames[participant_id] for participant_id in participant_ids]
+
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        futures = {executor.submit(write_individual_pdf, participant_id, reports[participant_id], output_dir):
+                   participant_id for participant_id in participant_ids}
+        for future in as_completed(futures):
+            pdf_filenames[futures[future]] = future.result()
+            if progress:
+                progress(len(pdf_filenames), len(participant_ids), pdf_filenames[futures[future]])
+    finally:
+        # Also reached when progress() raises to cancel the batch
+        executor.shutdown(wait=False, cancel_futures=True)
+    return [pdf_filenames[participant_id] for participant_id in participant_ids]
@@ -1,10 +1,11 @@
 # mod/ind/post_ind_analyzer.py
 import os
-import pandas as pd
 from PyQt5.QtWidgets import QVBoxLayout, QHBoxLayout, QLabel, QFrame, QPushButton, QFileDialog, QMessageBox, QComboBox
 from PyQt5.QtCore import Qt
 from datetime import datetime
 from fpdf import FPDF
+from mod.engine.survey import respondent_scores_text, score_test
+from mod.loader import cached_read_table
 
 
 class PostTestBlock(QFrame):
@@ -29,44 +30,6 @@ class PostTestBlock(QFrame):
 
         self.test_data = None
 
-    def revised_map_ratings_to_scores(self, rating, category):
-        if isinstance(rating, str):
-            rating = rating.strip()
-            if category == 'confidence':
-                if '絶対できない' in rating:
-                    return 0
-                elif 'あまりできない' in rating:
-                    return 1
-                elif '場合によりけり' in rating:
-                    return 2
-                elif '多分できる' in rating:
-                    return 3
-                elif '機会があればやってみたい' in rating:
-                    return 4
-                elif '簡単にできる' in rating:
-                    return 5
-            elif category == 'nervousness':
-                if 'すごく緊張する' in rating:
-                    return 0
-                elif 'できれば避けたい' in rating:
-                    return 1
-                elif 'かなり緊張する' in rating:
-                    return 2
-                elif 'すこしは緊張する' in rating:
-                    return 3
-                elif '緊張しない' in rating:
-                    return 4
-            elif category == 'wtc':
-                if 'できれば避けたい' in rating:
-                    return 0
-                elif '機会があればやってみたい' in rating:
-                    return 1
-                elif '多分できる' in rating:
-                    return 2
-                elif '簡単にできる' in rating:
-                    return 3
-        return None
-
     def upload_post_test_file(self):
         options = QFileDialog.Options()
         file_path, _ = QFileDialog.getOpenFileName(self, "Select Post-Test File", "", "CSV Files (*.csv);;Excel Files (*.xlsx)", options=options)
@@ -74,30 +37,17 @@ class PostTestBlock(QFrame):
             self.process_post_test_data(file_path)
 
     def process_post_test_data(self, file_path):
-        if file_path.endswith('.csv'):
-            post_test_wtc_data = pd.read_csv(file_path)
-        else:
-            post_test_wtc_data = pd.read_excel(file_path)
-
-        # Extract relevant columns for confidence, nervousness, and WtC
-        confidence_columns = [col for col in post_test_wtc_data.columns if '自信' in col]
-        nervousness_columns = [col for col in post_test_wtc_data.columns if '緊張' in col]
-        wtc_columns = [col for col in post_test_wtc_data.columns if 'やる気' in col]
-
-        # Extracting relevant columns
-        confidence_data = post_test_wtc_data[confidence_columns]
-        nervousness_data = post_test_wtc_data[nervousness_columns]
-        wtc_data = post_test_wtc_data[wtc_columns]
-
-        # Apply the updated mapping function to convert post-test WtC ratings to scores
-        post_confidence_scores_updated = confidence_data.applymap(
-            lambda x: self.revised_map_ratings_to_scores(x, 'confidence'))
-        post_nervousness_scores_updated = nervousness_data.applymap(
-            lambda x: self.revised_map_ratings_to_scores(x, 'nervousness'))
-        post_wtc_scores_updated = wtc_data.applymap(lambda x: self.revised_map_ratings_to_scores(x, 'wtc'))
+        post_test_wtc_data = cached_read_table(file_path)
+
+        # Score the confidence, nervousness and WtC answers of every respondent
+        scores = score_test(post_test_wtc_data)
+        post_confidence_scores_updated = scores['confidence']
+        post_nervousness_scores_updated = scores['nervousness']
+        post_wtc_scores_updated = scores['wtc']
 
         # Store the processed data
         self.test_data = post_test_wtc_data
+        self.scores = scores
         self.post_confidence_scores_updated = post_confidence_scores_updated
         self.post_nervousness_scores_updated = post_nervousness_scores_updated
         self.post_wtc_scores_updated = post_wtc_scores_updated
@@ -110,20 +60,7 @@ class PostTestBlock(QFrame):
     def display_selected_scores(self):
         respondent_id = self.combo_box.currentText()
         if respondent_id and self.test_data is not None:
-            idx = self.test_data[self.test_data['Respondent ID'].astype(str) == respondent_id].index[0]
-            participant_confidence = self.post_confidence_scores_updated.loc[idx].mean()
-            participant_nervousness = self.post_nervousness_scores_updated.loc[idx].mean()
-            participant_wtc = self.post_wtc_scores_updated.loc[idx].mean()
-
-            max_score_confidence = 5
-            max_score_nervousness = 4
-            max_score_wtc = 3
-
-            participant_text = (f"Respondent ID {respondent_id} Scores:\n"
-                                f"Confidence: {participant_confidence:.2f} on {max_score_confidence}\n"
-                                f"Nervousness: {participant_nervousness:.2f} on {max_score_nervousness}\n"
-                                f"WtC: {participant_wtc:.2f} on {max_score_wtc}")
-            self.display_participant_scores(participant_text)
+            self.display_participant_scores(respondent_scores_text(self.test_data, self.scores, respondent_id))
 
     def display_participant_scores(self, text):
         # Remove previous scores if any
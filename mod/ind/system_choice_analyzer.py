@@ -1,8 +1,49 @@
 # mod/ind/system_choice_analyzer.py
-import pandas as pd
 from PyQt5.QtWidgets import QVBoxLayout, QHBoxLayout, QLabel, QFrame, QPushButton, QFileDialog, QMessageBox, QComboBox
 from PyQt5.QtCore import Qt
 from datetime import datetime, time
+from mod.loader import cached_read_table
+
+
+def convert_to_time(time_value):
+    if isinstance(time_value, time):
+        return time_value
+    if isinstance(time_value, str):
+        return datetime.strptime(time_value, '%H:%M:%S').time()
+    return time_value
+
+
+def calculate_duration(start_time, end_time):
+    # Convert time to datetime for the same date to perform subtraction
+    if isinstance(start_time, time):
+        start_time = datetime.combine(datetime.min, start_time)
+    if isinstance(end_time, time):
+        end_time = datetime.combine(datetime.min, end_time)
+    return end_time - start_time
+
+
+def participant_info_text(data, participant_id):
+    # Strategies, test durations and background of one participant; None if the file has no row for them
+    rows = data[data['Participant ID'].astype(str) == participant_id]
+    if rows.empty:
+        return None
+    participant_data = rows.iloc[0]
+
+    duration_first_test = calculate_duration(convert_to_time(participant_data['Start times of First test strategy 1']),
+                                             convert_to_time(participant_data['End Times of First test strategy 1']))
+    duration_second_test = calculate_duration(convert_to_time(participant_data['Start times of Second test  Strategy 2']),
+                                              convert_to_time(participant_data['End Times of Second test Strategy 2']))
+
+    return (f"Participant ID: {participant_id}\n"
+            f"First test strategy used: {participant_data['First test strategy 1']}\n"
+            f"Duration of first test: {duration_first_test}\n"
+            f"Second test strategy used: {participant_data['Second test Strategiy 2']}\n"
+            f"Duration of second test: {duration_second_test}\n"
+            f"Wear Glasses: {participant_data['Wear Glassees']}\n"
+            f"Education Level: {participant_data['Education Level']}\n"
+            f"Language Proficiency: {participant_data['Language Proficiency']}\n"
+            f"Preferred System: {participant_data['Prefered System']}")
+
 
 class SystemChoiceBlock(QFrame):
     def __init__(self, parent=None):
@@ -33,10 +74,8 @@ class SystemChoiceBlock(QFrame):
             self.process_system_choice_data(file_path)
 
     def process_system_choice_data(self, file_path):
-        if file_path.endswith('.xlsx'):
-            data = pd.read_excel(file_path)
-        elif file_path.endswith('.csv'):
-            data = pd.read_csv(file_path)
+        if file_path.endswith(('.xlsx', '.csv')):
+            data = cached_read_table(file_path)
         else:
             QMessageBox.critical(self, "Error", "Unsupported file format.")
             return
@@ -49,54 +88,12 @@ class SystemChoiceBlock(QFrame):
     def display_selected_info(self):
         participant_id = self.combo_box.currentText()
         if participant_id and self.test_data is not None:
-            participant_data = self.test_data[self.test_data['Participant ID'].astype(str) == participant_id].iloc[0]
-
-            first_test_strategy = participant_data['First test strategy 1']
-            second_test_strategy = participant_data['Second test Strategiy 2']
-            wear_glasses = participant_data['Wear Glassees']
-            education_level = participant_data['Education Level']
-            language_proficiency = participant_data['Language Proficiency']
-            preferred_system = participant_data['Prefered System']
-
-            start_time_first_test = self.convert_to_time(participant_data['Start times of First test strategy 1'])
-            end_time_first_test = self.convert_to_time(participant_data['End Times of First test strategy 1'])
-            duration_first_test = self.calculate_duration(start_time_first_test, end_time_first_test)
-
-            start_time_second_test = self.convert_to_time(participant_data['Start times of Second test  Strategy 2'])
-            end_time_second_test = self.convert_to_time(participant_data['End Times of Second test Strategy 2'])
-            duration_second_test = self.calculate_duration(start_time_second_test, end_time_second_test)
-
-            info_text = (f"Participant ID: {participant_id}\n"
-                         f"First test strategy used: {first_test_strategy}\n"
-                         f"Duration of first test: {duration_first_test}\n"
-                         f"Second test strategy used: {second_test_strategy}\n"
-                         f"Duration of second test: {duration_second_test}\n"
-                         f"Wear Glasses: {wear_glasses}\n"
-                         f"Education Level: {education_level}\n"
-                         f"Language Proficiency: {language_proficiency}\n"
-                         f"Preferred System: {preferred_system}")
-
+            info_text = participant_info_text(self.test_data, participant_id)
             self.display_participant_info(info_text)
 
             # Store the processed data for report generation
             self.participant_text = info_text
 
-    def convert_to_time(self, time_value):
-        if isinstance(time_value, time):
-            return time_value
-        if isinstance(time_value, str):
-            return datetime.strptime(time_value, '%H:%M:%S').time()
-        return time_value
-
-    def calculate_duration(self, start_time, end_time):
-        # Convert time to datetime for the same date to perform subtraction
-        if isinstance(start_time, time):
-            start_time = datetime.combine(datetime.min, start_time)
-        if isinstance(end_time, time):
-            end_time = datetime.combine(datetime.min, end_time)
-        duration = end_time - start_time
-        return duration
-
     def display_participant_info(self, text):
         # Remove previous info if any
         if hasattr(self, 'participant_label'):
@@ -1,8 +1,11 @@
 import os
-import pandas as pd
 from PyQt5.QtWidgets import QVBoxLayout, QHBoxLayout, QLabel, QFrame, QPushButton, QFileDialog, QMessageBox
 from PyQt5.QtCore import Qt
 from datetime import datetime
+from mod.engine.describe import describe_columns
+from mod.engine.individual import test_variables
+from mod.ind.tobii_test1 import tobii_summary_text
+from mod.loader import cached_read_table
 
 
 class TobiiTest2Block(QFrame):
@@ -31,81 +34,11 @@ class TobiiTest2Block(QFrame):
             self.process_tobii_test2_data(file_path)
 
     def process_tobii_test2_data(self, file_path):
-        if file_path.endswith('.csv'):
-            tobii_test2_data = pd.read_csv(file_path)
-        else:
-            tobii_test2_data = pd.read_excel(file_path)
+        tobii_test2_data = cached_read_table(file_path)
 
-        # Extract relevant columns and calculate statistics
-        pupil_diameter_data = pd.concat(
-            [tobii_test2_data['Left_Pupil_Diameter'], tobii_test2_data['Right_Pupil_Diameter']])
-        head_position_data = pd.concat([tobii_test2_data['Head_Position_X'], tobii_test2_data['Head_Position_Y'],
-                                        tobii_test2_data['Head_Position_Z']])
-        head_rotation_data = pd.concat([tobii_test2_data['Head_Rotation_X'], tobii_test2_data['Head_Rotation_Y'],
-                                        tobii_test2_data['Head_Rotation_Z']])
-        left_eye_data = pd.concat([tobii_test2_data['Left_Eye_X'], tobii_test2_data['Left_Eye_Y']])
-        right_eye_data = pd.concat([tobii_test2_data['Right_Eye_X'], tobii_test2_data['Right_Eye_Y']])
-
-        # Pupil Diameter Statistics
-        self.avg_pupil_diameter = pupil_diameter_data.mean()
-        self.std_dev_pupil_diameter = pupil_diameter_data.std()
-        self.max_pupil_diameter = pupil_diameter_data.max()
-        self.min_pupil_diameter = pupil_diameter_data.min()
-        self.median_pupil_diameter = pupil_diameter_data.median()
-        self.range_pupil_diameter = self.max_pupil_diameter - self.min_pupil_diameter
-
-        # Head Position Statistics
-        self.avg_head_position = head_position_data.mean()
-        self.std_dev_head_position = head_position_data.std()
-        self.max_head_position = head_position_data.max()
-        self.min_head_position = head_position_data.min()
-        self.range_head_position = self.max_head_position - self.min_head_position
-
-        # Head Rotation Statistics
-        self.avg_head_rotation = head_rotation_data.mean()
-        self.std_dev_head_rotation = head_rotation_data.std()
-        self.max_head_rotation = head_rotation_data.max()
-        self.min_head_rotation = head_rotation_data.min()
-        self.range_head_rotation = self.max_head_rotation - self.min_head_rotation
-
-        # Eye Gaze Coordinates Statistics
-        self.avg_left_eye_x = tobii_test2_data['Left_Eye_X'].mean()
-        self.avg_left_eye_y = tobii_test2_data['Left_Eye_Y'].mean()
-        self.std_dev_left_eye_x = tobii_test2_data['Left_Eye_X'].std()
-        self.std_dev_left_eye_y = tobii_test2_data['Left_Eye_Y'].std()
-
-        self.avg_right_eye_x = tobii_test2_data['Right_Eye_X'].mean()
-        self.avg_right_eye_y = tobii_test2_data['Right_Eye_Y'].mean()
-        self.std_dev_right_eye_x = tobii_test2_data['Right_Eye_X'].std()
-        self.std_dev_right_eye_y = tobii_test2_data['Right_Eye_Y'].std()
-
-        # Create summary text
-        self.test_data = (
-            f"Average Pupil Diameter: {self.avg_pupil_diameter:.2f}\n"
-            f"Standard Deviation of Pupil Diameter: {self.std_dev_pupil_diameter:.2f}\n"
-            f"Maximum Pupil Diameter: {self.max_pupil_diameter:.2f}\n"
-            f"Minimum Pupil Diameter: {self.min_pupil_diameter:.2f}\n"
-            f"Median Pupil Diameter: {self.median_pupil_diameter:.2f}\n"
-            f"Range of Pupil Diameter: {self.range_pupil_diameter:.2f}\n"
-            f"Average Head Position: {self.avg_head_position:.2f}\n"
-            f"Standard Deviation of Head Position: {self.std_dev_head_position:.2f}\n"
-            f"Maximum Head Position: {self.max_head_position:.2f}\n"
-            f"Minimum Head Position: {self.min_head_position:.2f}\n"
-            f"Range of Head Position: {self.range_head_position:.2f}\n"
-            f"Average Head Rotation: {self.avg_head_rotation:.2f}\n"
-            f"Standard Deviation of Head Rotation: {self.std_dev_head_rotation:.2f}\n"
-            f"Maximum Head Rotation: {self.max_head_rotation:.2f}\n"
-            f"Minimum Head Rotation: {self.min_head_rotation:.2f}\n"
-            f"Range of Head Rotation: {self.range_head_rotation:.2f}\n"
-            f"Average Left Eye X Coordinate: {self.avg_left_eye_x:.2f}\n"
-            f"Average Left Eye Y Coordinate: {self.avg_left_eye_y:.2f}\n"
-            f"Standard Deviation of Left Eye X Coordinate: {self.std_dev_left_eye_x:.2f}\n"
-            f"Standard Deviation of Left Eye Y Coordinate: {self.std_dev_left_eye_y:.2f}\n"
-            f"Average Right Eye X Coordinate: {self.avg_right_eye_x:.2f}\n"
-            f"Average Right Eye Y Coordinate: {self.avg_right_eye_y:.2f}\n"
-            f"Standard Deviation of Right Eye X Coordinate: {self.std_dev_right_eye_x:.2f}\n"
-            f"Standard Deviation of Right Eye Y Coordinate: {self.std_dev_right_eye_y:.2f}"
-        )
+        # Pupil diameters, head position and rotation are pooled over their columns, see test_variables
+        self.stats = describe_columns(test_variables('tobii', tobii_test2_data))
+        self.test_data = tobii_summary_text(self.stats)
 
         # Display the summary text
         self.display_tobii_test2_summary(self.test_data)
@@ -1,10 +1,11 @@
 # mod/ind_analyzer_window.py
 import os
-from datetime import datetime
 from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import QDialog, QGridLayout, QScrollArea, QPushButton, QVBoxLayout, QLabel, QSizePolicy, QMessageBox
-from fpdf import FPDF
-from fpdf import FPDF, HTMLMixin
+from PyQt5.QtWidgets import QDialog, QGridLayout, QScrollArea, QPushButton, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, \
+    QSizePolicy, QMessageBox, QFileDialog, QWidget
+
+from mod.batch import run_cohort, session_directories
+from mod.figure_widgets import data_table
 
 from mod.ind.dialog_test1_analyzer import DialogTest1Block
 from mod.ind.dialog_test2_analyzer import DialogTest2Block
@@ -14,14 +15,18 @@ from mod.ind.openface_test2_analyzer import OpenFaceTest2Block
 from mod.ind.openfaces_comparison_analyzer import OpenFacesComparisonBlock
 from mod.ind.pre_ind_analyzer import PreTestBlock
 from mod.ind.post_ind_analyzer import PostTestBlock
-from mod.ind.system_choice_analyzer import SystemChoiceBlock
-from mod.lesfonctions import create_standard_block, MyFPDF
+from mod.ind.individual_report import BLOCK_ORDER, PARTICIPANT_BLOCKS, select_participants, write_individual_pdf, \
+    write_individual_pdfs
+from mod.ind.system_choice_analyzer import SystemChoiceBlock, participant_info_text
+from mod.engine.survey import respondent_scores_text
+from mod.lesfonctions import create_standard_block
 from mod.ind.heartrate_test1 import HeartRateTest1Block
 from mod.ind.heartrate_test2 import HeartRateTest2Block
 from mod.ind.hrs_comparison_analyzer import HRsComparisonBlock
 from mod.ind.tobii_test1 import TobiiTest1Block
 from mod.ind.tobii_test2 import TobiiTest2Block
 from mod.ind.tobiis_comparison_analyzer import TobiisComparisonBlock
+from mod.workers import TaskProgress, loading_progress
 
 class IndividualAnalyzerWindow(QDialog):
     def __init__(self, parent=None):
@@ -97,6 +102,24 @@ class IndividualAnalyzerWindow(QDialog):
         self.generate_report_button.clicked.connect(self.generate_individual_report)
         self.main_layout.addWidget(self.generate_report_button)
 
+        # Batch mode: one report per participant ID of the feedback file, or per ID of the selection
+        batch_layout = QHBoxLayout()
+        self.participant_filter = QLineEdit()
+        self.participant_filter.setPlaceholderText("All participants, or IDs and ranges, e.g. 20240501-20240509, 20240512")
+        batch_layout.addWidget(self.participant_filter)
+        self.batch_report_button = QPushButton("Generate Reports for Participants")
+        self.batch_report_button.clicked.connect(self.generate_batch_reports)
+        batch_layout.addWidget(self.batch_report_button)
+        self.main_layout.addLayout(batch_layout)
+
+        # Test 1 against Test 2 of every participant's session directory, in one table per modality
+        self.cohort_button = QPushButton("Compare Test 1 and Test 2 across Participants")
+        self.cohort_button.clicked.connect(self.compare_cohort)
+        self.main_layout.addWidget(self.cohort_button)
+
+        self.task_progress = TaskProgress()
+        self.main_layout.addWidget(self.task_progress)
+
         # Create the footnote label
         footnote = QLabel("Aguida Multimodal Analyzer (Offline Data) by Aboul Hassane CISSE - Knowledge Information System Lab<br>version 2024.05")
         footnote.setAlignment(Qt.AlignCenter)
@@ -105,101 +128,122 @@ class IndividualAnalyzerWindow(QDialog):
 
         self.setLayout(self.main_layout)
 
+    def widget_section(self, block_name):
+        # Content of a block as currently displayed
+        block_instance = self.blocks_instances[block_name]
+        if block_name in PARTICIPANT_BLOCKS:
+            return block_instance.participant_label.text() if block_instance.participant_label else ""
+        if hasattr(block_instance, 'table_widget'):
+            # Comparison table, without its percentage column
+            table = block_instance.table_widget
+            return [[table.item(row, col).text() for col in range(3) if table.item(row, col)]
+                    for row in range(table.rowCount())]
+        return block_instance.test_data if block_instance.test_data else ""
+
+    def participant_section(self, block_name, participant_id):
+        # Same text the block shows once participant_id is selected, computed from its loaded data
+        block_instance = self.blocks_instances[block_name]
+        if block_instance.test_data is None:
+            return ""
+        if block_name == "System Choice":
+            text = participant_info_text(block_instance.test_data, participant_id)
+        else:
+            text = respondent_scores_text(block_instance.test_data, block_instance.scores, participant_id)
+        return text or f"No {block_name} data for participant {participant_id}"
+
     def generate_individual_report(self):
         try:
             # Get the participant ID from the SystemChoiceBlock
-            participant_id = None
-            for block_instance in self.blocks_instances.values():
-                if isinstance(block_instance, SystemChoiceBlock):
-                    combo_box = block_instance.combo_box
-                    if combo_box.count() > 0:
-                        participant_id = combo_box.currentText()
-                        break
+            combo_box = self.blocks_instances["System Choice"].combo_box
+            participant_id = combo_box.currentText() if combo_box.count() > 0 else None
 
             if not participant_id:
                 QMessageBox.warning(self, 'Input Error', 'You must select a participant ID.')
                 return
 
-            pdf = MyFPDF()
-            pdf.add_page()
-
-            # Set title
-            pdf.set_font("Arial", size=12)
-            pdf.cell(200, 10, txt=f"Participant ID {participant_id} Report", ln=True, align='C')
-            # pdf.cell(200, 10, txt="Aguida Multimodal Analyzer", ln=True, align='C')
-
-            # Specify the order of blocks
-            block_order = [
-                "Pre-Test", "Post-Test", "System Choice",
-                "HR Test 1", "HR Test 2", "HRs Comparison",
-                "Dialog Test 1", "Dialog Test 2", "Dialogs Comparison",
-                "Tobii Test 1", "Tobii Test 2", "Tobiis Comparison",
-                "OpenFace Test 1", "OpenFace Test 2", "OpenFaces Comparison"
-            ]
-
-            # Collect and add data from each relevant block in the specified order
-            for block_name in block_order:
-                block_instance = self.blocks_instances.get(block_name)
-                if block_instance:
-                    pdf.chapter_title(f"{block_name} Data")
-                    if isinstance(block_instance, PreTestBlock) or isinstance(block_instance,
-                                                                              PostTestBlock) or isinstance(
-                            block_instance, SystemChoiceBlock):
-                        participant_label = block_instance.participant_label.text() if block_instance.participant_label else ""
-                        try:
-                            participant_label.encode('latin-1')
-                            pdf.chapter_body(participant_label)
-                        except UnicodeEncodeError:
-                            participant_label = participant_label.encode('utf-8').decode('latin-1')
-                            pdf.chapter_body(participant_label)
-                    elif isinstance(block_instance, HeartRateTest1Block) or isinstance(block_instance,
-                                                                                       HeartRateTest2Block) or isinstance(
-                            block_instance, TobiiTest1Block) or isinstance(block_instance,
-                                                                           TobiiTest2Block) or isinstance(
-                            block_instance, OpenFaceTest1Block) or isinstance(block_instance,
-                                                                              OpenFaceTest2Block) or isinstance(
-                            block_instance, DialogTest1Block) or isinstance(block_instance, DialogTest2Block):
-                        summary_text = block_instance.test_data if block_instance.test_data else ""
-                        try:
-                            summary_text.encode('latin-1')
-                            pdf.chapter_body(summary_text)
-                        except UnicodeEncodeError:
-                            summary_text = summary_text.encode('utf-8').decode('latin-1')
-                            pdf.chapter_body(summary_text)
-                    elif isinstance(block_instance, HRsComparisonBlock) or isinstance(block_instance,
-                                                                                      TobiisComparisonBlock) or isinstance(
-                            block_instance, OpenFacesComparisonBlock) or isinstance(block_instance,
-                                                                                    DialogsComparisonBlock):
-                        # Collect table data
-                        row_count = block_instance.table_widget.rowCount()
-                        headers = ["Metric", "Test 1", "Test 2"]
-                        table_data = []
-                        for row in range(row_count):
-                            table_row = []
-                            for col in range(3):
-                                item = block_instance.table_widget.item(row, col)
-                                if item:
-                                    cell_text = item.text()
-                                    try:
-                                        cell_text.encode('latin-1')
-                                        table_row.append(cell_text)
-                                    except UnicodeEncodeError:
-                                        cell_text = cell_text.encode('utf-8').decode('latin-1')
-                                        table_row.append(cell_text)
-                            table_data.append(table_row)
-                        pdf.add_comparison_table(headers, table_data)
-
-            # Ensure the generated_reports directory exists
-            pdf_dir = "generated_reports"
-            os.makedirs(pdf_dir, exist_ok=True)
-
-            # Create a unique filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            pdf_filename = os.path.join(pdf_dir, f"{participant_id}_report_individual_{timestamp}.pdf")
-            pdf.output(pdf_filename)
+            sections = [(block_name, self.widget_section(block_name)) for block_name in BLOCK_ORDER]
+            pdf_filename = write_individual_pdf(participant_id, sections)
 
             # Show success message
             QMessageBox.information(self, "Report Generated", f"PDF report generated successfully:\n{pdf_filename}")
 
         except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to generate PDF report:\n{str(e)}")
\ No newline at end of file
+            QMessageBox.critical(self, "Error", f"Failed to generate PDF report:\n{str(e)}")
+
+    def generate_batch_reports(self):
+        try:
+            system_choice_data = self.blocks_instances["System Choice"].test_data
+            if system_choice_data is None:
+                QMessageBox.warning(self, 'Input Error', 'Upload the feedback file to list the participant IDs.')
+                return
+            participant_ids = select_participants(system_choice_data['Participant ID'].astype(str).unique(),
+                                                  self.participant_filter.text())
+            if not participant_ids:
+                QMessageBox.warning(self, 'Input Error', 'No participant ID matches the selection.')
+                return
+
+            # The session blocks are read once here; participant blocks are computed from their data per ID
+            shared = {block_name: self.widget_section(block_name)
+                      for block_name in BLOCK_ORDER if block_name not in PARTICIPANT_BLOCKS}
+            reports = {participant_id: [(block_name, self.participant_section(block_name, participant_id)
+                                         if block_name in PARTICIPANT_BLOCKS else shared[block_name])
+                                        for block_name in BLOCK_ORDER]
+                       for participant_id in participant_ids}
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to prepare the reports:\n{str(e)}")
+            return
+
+        self.batch_report_button.setEnabled(False)
+        self.task_progress.start(self.write_batch_reports, reports, on_result=self.show_batch_reports,
+                                 on_error=self.show_batch_error,
+                                 on_finished=lambda: self.batch_report_button.setEnabled(True))
+
+    @staticmethod
+    def write_batch_reports(worker, reports):
+        # Runs on a worker thread, the PDFs themselves are laid out in worker processes
+        def progress(done, total, pdf_filename):
+            worker.report_progress(100 * done / total, f"Wrote {os.path.basename(pdf_filename)} ({done}/{total})")
+        return write_individual_pdfs(reports, progress=progress)
+
+    def show_batch_reports(self, pdf_filenames):
+        QMessageBox.information(self, "Reports Generated",
+                                f"{len(pdf_filenames)} PDF reports generated in {os.path.dirname(pdf_filenames[0])}")
+
+    def show_batch_error(self, message):
+        QMessageBox.critical(self, "Error", f"Failed to generate the PDF reports:\n{message}")
+
+    def compare_cohort(self):
+        directory = QFileDialog.getExistingDirectory(self, "Select the Participants' Session Directories")
+        if not directory:
+            return
+        self.cohort_button.setEnabled(False)
+        self.task_progress.start(self.cohort_comparisons, directory, on_result=self.show_cohort,
+                                 on_error=self.show_cohort_error,
+                                 on_finished=lambda: self.cohort_button.setEnabled(True))
+
+    @staticmethod
+    def cohort_comparisons(worker, directory):
+        # Runs on a worker thread
+        return run_cohort(session_directories(directory), progress=loading_progress(worker, 100))
+
+    def show_cohort(self, outcome):
+        csv_filenames, comparisons = outcome
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Test 1 and Test 2 across Participants")
+        dialog.setMinimumSize(1200, 800)
+        content = QWidget()
+        content_layout = QVBoxLayout(content)
+        for modality, comparison in comparisons.items():
+            content_layout.addWidget(QLabel(f"{modality.replace('_', ' ').title()}: "
+                                            f"{len(comparison.participants)} participants"))
+            content_layout.addWidget(data_table(comparison.summary(), visible_rows=15))
+        content_layout.addWidget(QLabel(f"Saved to {os.path.dirname(csv_filenames[0])}"))
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setWidget(content)
+        layout = QVBoxLayout(dialog)
+        layout.addWidget(scroll_area)
+        dialog.show()
+
+    def show_cohort_error(self, message):
+        QMessageBox.critical(self, "Error", f"Failed to compare the participants' tests:\n{message}")
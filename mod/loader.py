@@ -0,0 +1,175 @@
+# mod/loader.py
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import List
+
+import pandas as pd
+
+from mod.cache import TableCache
+from mod.engine.grouped import tag_sources
+
+# Heart rate exports past this size are summarised chunk by chunk instead of concatenated in memory
+STREAMING_MIN_BYTES = 512 * 1024 * 1024
+STREAMING_CHUNK_ROWS = 1_000_000
+
+# Starting worker processes costs about a second, only worth it for XLSX or large uploads
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+
+def read_table(file_path, nrows=None, usecols=None, dtype=None):
+    if file_path.endswith('.csv'):
+        return pd.read_csv(file_path, nrows=nrows, usecols=usecols, dtype=dtype)
+    return pd.read_excel(file_path, nrows=nrows, usecols=usecols, dtype=dtype)
+
+
+def normalize_column_names(data):
+    data.columns = data.columns.str.strip().str.lower()
+    return data
+
+
+@dataclass
+class FileTiming:
+    file: str
+    seconds: float
+    rows: int
+
+
+@dataclass
+class LoadedFiles:
+    # Frames are kept in upload order whatever order the pool finished them in
+    frames: List[pd.DataFrame] = field(default_factory=list)
+    timings: List[FileTiming] = field(default_factory=list)
+
+    @property
+    def total_seconds(self):
+        return sum(timing.seconds for timing in self.timings)
+
+    def combined(self):
+        return pd.concat(self.frames, copy=False)
+
+    def tagged(self, participant_column=None):
+        # combined() with the source_file and participant of every row, for grouped_statistics
+        return tag_sources(self.frames, [timing.file for timing in self.timings], participant_column)
+
+
+def read_projected(file_path, schema):
+    # Parses only the schema's columns, straight into its dtypes, and returns them with lowercase names
+    header = read_table(file_path, nrows=0).columns
+    selected = [name for name in header if schema.selects(name.strip().lower())]
+    return normalize_column_names(read_table(file_path, usecols=selected, dtype=schema.dtypes(selected)))
+
+
+def parse_table(file_path, normalize_columns=False, schema=None):
+    if schema is not None:
+        return read_projected(file_path, schema)
+    data = read_table(file_path)
+    return normalize_column_names(data) if normalize_columns else data
+
+
+def cache_variant(normalize_columns=False, schema=None):
+    if schema is not None:
+        return schema.cache_key()
+    return "lower" if normalize_columns else None
+
+
+def cached_read_table(file_path, normalize_columns=False, cache=None, schema=None):
+    # Served from the binary table cache when the file has been parsed before
+    cache = cache or TableCache()
+    return cache.read(file_path, lambda path: parse_table(path, normalize_columns, schema),
+                      variant=cache_variant(normalize_columns, schema))
+
+
+def timed_read(file_path, normalize_columns=False, use_cache=True, schema=None):
+    start = time.perf_counter()
+    if use_cache:
+        data = cached_read_table(file_path, normalize_columns, schema=schema)
+    else:
+        data = parse_table(file_path, normalize_columns, schema)
+    return data, FileTiming(file_path, time.perf_counter() - start, len(data))
+
+
+def worth_parallel(files):
+    if len(files) <= 1:
+        return False
+    return any(file.endswith('.xlsx') for file in files) or sum(map(os.path.getsize, files)) >= PARALLEL_MIN_BYTES
+
+
+def load_files(files, normalize_columns=False, max_workers=None, progress=None, use_cache=True, schema=None):
+    # Parses the files concurrently in worker processes; progress(done, total, timing) is called as each one lands.
+    # With a schema only its columns are parsed, in its dtypes, and their names are lowercased.
+    files = list(files)
+    loaded = LoadedFiles([None] * len(files), [None] * len(files))
+
+    def collect(index, data, timing):
+        loaded.frames[index] = data
+        loaded.timings[index] = timing
+        print(f"Loaded {timing.file} in {timing.seconds:.2f}s ({timing.rows} rows)")
+        if progress:
+            progress(sum(frame is not None for frame in loaded.frames), len(files), timing)
+
+    if not worth_parallel(files):
+        for index, file in enumerate(files):
+            collect(index, *timed_read(file, normalize_columns, use_cache, schema))
+        return loaded
+
+    # Spawned rather than forked, the GUI calls this from a Qt worker thread
+    max_workers = min(max_workers or os.cpu_count() or 1, len(files))
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        futures = {executor.submit(timed_read, file, normalize_columns, use_cache, schema): index
+                   for index, file in enumerate(files)}
+        for future in as_completed(futures):
+            collect(futures[future], *future.result())
+    finally:
+        # Also reached when progress() raises to cancel the load
+        executor.shutdown(wait=False, cancel_futures=True)
+    return loaded
+
+
+def needs_streaming(files):
+    return sum(map(os.path.getsize, files)) >= STREAMING_MIN_BYTES
+
+
+def read_selected_columns(file_path, columns):
+    # Parses only the named columns, matched case-insensitively, and returns them with lowercase names
+    wanted = set(columns)
+    return normalize_column_names(read_table(file_path, usecols=lambda name: name.strip().lower() in wanted))
+
+
+def read_columns(file_path):
+    return list(normalize_column_names(read_table(file_path, nrows=0)).columns)
+
+
+def iter_table_chunks(files, columns, chunksize=STREAMING_CHUNK_ROWS, progress=None, schema=None):
+    # Yields (file, chunk) with only `columns` of the files, in bounded chunks; columns are matched on normalized
+    # (lowercase) names and returned normalized. XLSX files cannot be read incrementally, only the selected
+    # columns of them are loaded at once. A schema gives the dtypes the columns are parsed as.
+    columns = set(columns)
+
+    def matches(name):
+        return name.strip().lower() in columns
+
+    for index, file in enumerate(files):
+        dtype = None
+        if schema is not None:
+            dtype = schema.dtypes([name for name in read_table(file, nrows=0).columns if matches(name)])
+        if file.endswith('.csv'):
+            chunks = pd.read_csv(file, usecols=matches, chunksize=chunksize, dtype=dtype)
+        else:
+            chunks = [pd.read_excel(file, usecols=matches, dtype=dtype)]
+        for chunk in chunks:
+            missing = columns - set(normalize_column_names(chunk).columns)
+            if missing:
+                raise ValueError(f"Column '{sorted(missing)[0]}' not found in {file}.")
+            yield file, chunk
+        if progress:
+            progress(index + 1, len(files), file)
+
+
+def iter_column_chunks(files, column, chunksize=STREAMING_CHUNK_ROWS, progress=None, schema=None):
+    # Yields one column of the files in bounded chunks
+    for _, chunk in iter_table_chunks(files, [column], chunksize, progress, schema):
+        yield chunk[column]
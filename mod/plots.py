@@ -0,0 +1,184 @@
+# mod/plots.py
+import numpy as np
+from matplotlib.figure import Figure
+
+# Figures are built without pyplot so they can be drawn on a Qt canvas or saved headless
+
+
+def new_figure(figsize=None):
+    fig = Figure(figsize=figsize)
+    return fig, fig.subplots()
+
+
+def min_max_indices(values, buckets):
+    # Positions of the minimum and maximum of each of `buckets` equal runs of samples, plus both ends.
+    # Drawn in order they trace the same envelope as the full series, peaks included.
+    n = len(values)
+    if n <= 2 * buckets:
+        return np.arange(n)
+    size = -(-n // buckets)
+    padded = np.full(size * buckets, np.nan)
+    padded[:n] = values
+    rows = padded.reshape(buckets, size)
+    starts = np.arange(buckets) * size
+    low = np.where(np.isnan(rows), np.inf, rows).argmin(axis=1)
+    high = np.where(np.isnan(rows), -np.inf, rows).argmax(axis=1)
+    occupied = ~np.isnan(rows).all(axis=1)
+    return np.unique(np.concatenate([(starts + low)[occupied], (starts + high)[occupied], [0, n - 1]]))
+
+
+def plot_decimated(ax, x, y, **kwargs):
+    # Long series are cut down to about two points per horizontal pixel of the figure before drawing
+    x = np.asarray(x)
+    y = np.asarray(y, dtype='float64')
+    buckets = max(int(ax.figure.get_figwidth() * ax.figure.dpi), 1)
+    index = min_max_indices(y, buckets)
+    return ax.plot(x[index], y[index], **kwargs)
+
+
+def heart_rate_graph(heart_rate_data):
+    fig, ax = new_figure()
+    plot_decimated(ax, heart_rate_data.index, heart_rate_data)
+    ax.set_title('Heart Rate Over Time')
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Heart Rate')
+
+    # Normal, high abnormal (tachycardia) and low abnormal (bradycardia) heart rate
+    ax.axhline(y=70, color='green', linestyle='--', label='Normal Heart Rate')
+    ax.axhline(y=100, color='red', linestyle='--', label='High Abnormal Heart Rate')
+    ax.axhline(y=60, color='blue', linestyle='--', label='Low Abnormal Heart Rate')
+    ax.legend()
+    return fig
+
+
+def heart_rate_histogram(heart_rate_data, weights=None):
+    # weights turns heart_rate_data into the distinct readings of a counting histogram
+    fig, ax = new_figure()
+    ax.hist(heart_rate_data, bins=20, weights=weights, edgecolor='black')
+    ax.set_title('Distribution of Heart Rate')
+    ax.set_xlabel('Heart Rate')
+    ax.set_ylabel('Frequency')
+    return fig
+
+
+def time_series(data, columns, title, ylabel, figsize):
+    fig, ax = new_figure(figsize)
+    for column in columns:
+        plot_decimated(ax, data['timestamp'], data[column], label=column)
+    ax.legend()
+    ax.set_title(title)
+    ax.set_xlabel('Time')
+    ax.set_ylabel(ylabel)
+    return fig
+
+
+def signal_window_graph(window, title, ylabel, figsize=(10, 4)):
+    # A SessionSignals.window() slice, every channel against epoch time
+    fig, ax = new_figure(figsize)
+    times = window['time_ms'].to_numpy().astype('datetime64[ms]')
+    for column in window.columns.drop('time_ms'):
+        plot_decimated(ax, times, window[column], label=column)
+    ax.legend()
+    ax.set_title(title)
+    ax.set_xlabel('Time')
+    ax.set_ylabel(ylabel)
+    return fig
+
+
+def tobii_graphs(combined_data):
+    return [
+        time_series(combined_data, ['left_eye_x', 'right_eye_x', 'head_position_x'],
+                    'Eye and Head Position Over Time', 'Position', (8, 4)),
+        time_series(combined_data, ['left_pupil_diameter', 'right_pupil_diameter'],
+                    'Pupil Diameter Over Time', 'Pupil Diameter', (8, 4)),
+    ]
+
+
+def face_emotion_graphs(combined_data):
+    return [
+        time_series(combined_data, ['au12_r', 'au14_r', 'au15_r'], 'Facial Action Units Over Time', 'Values', (10, 6)),
+        time_series(combined_data, ['pose_tx', 'pose_ty', 'pose_tz'], 'Head Position Over Time', 'Position', (10, 6)),
+    ]
+
+
+def au_histogram(data, au):
+    fig, ax = new_figure((10, 6))
+    data[au].plot(kind='hist', bins=30, ax=ax, alpha=0.7, color='blue')
+    ax.set_title(f'Distribution of {au.upper()}')
+    ax.set_xlabel(f'{au.upper()} Values')
+    ax.set_ylabel('Frequency')
+    return fig
+
+
+def au_boxplot(data, au):
+    fig, ax = new_figure((10, 6))
+    data[au].plot(kind='box', ax=ax, vert=False)
+    ax.set_title(f'Box Plot of {au.upper()}')
+    ax.set_xlabel(f'{au.upper()} Values')
+    return fig
+
+
+def dialogflow_graphs(utterance_counts, category_counts, strategy_counts, confidence_stats):
+    fig = Figure(figsize=(10, 10))
+    axs = fig.subplots(2, 2)
+
+    utterance_counts.plot(kind='bar', ax=axs[0, 0], color='skyblue')
+    axs[0, 0].set_title('Utterance Counts')
+    axs[0, 0].set_xlabel('Utterance')
+    axs[0, 0].set_ylabel('Count')
+
+    category_counts.plot(kind='bar', ax=axs[0, 1], color='lightgreen')
+    axs[0, 1].set_title('Category Counts')
+    axs[0, 1].set_xlabel('Category')
+    axs[0, 1].set_ylabel('Count')
+
+    strategy_counts.plot(kind='bar', ax=axs[1, 0], color='salmon')
+    axs[1, 0].set_title('Strategy Counts')
+    axs[1, 0].set_xlabel('Strategy')
+    axs[1, 0].set_ylabel('Count')
+
+    confidence_stats.plot(kind='box', ax=axs[1, 1])
+    axs[1, 1].set_title('Confidence Statistics')
+    axs[1, 1].set_ylabel('Confidence')
+
+    fig.tight_layout()
+    return fig
+
+
+def strategy_durations_graph(first_strategy_stats, second_strategy_stats):
+    categories = ['Average', 'Standard Deviation', 'Min', 'Max']
+    keys = ['average', 'std_dev', 'min', 'max']
+    x = range(len(categories))
+
+    fig, ax = new_figure((6, 4))
+    ax.bar(x, [first_strategy_stats[k] for k in keys], width=0.4, label='First Strategy', align='center')
+    ax.bar(x, [second_strategy_stats[k] for k in keys], width=0.4, label='Second Strategy', align='edge')
+    ax.set_xticks(list(x), categories)
+    ax.set_xlabel('Statistics')
+    ax.set_ylabel('Duration (minutes)')
+    ax.set_title('Interaction Times for Test Strategies')
+    ax.legend()
+    return fig
+
+
+def preferred_system_graph(preferred_system_counts):
+    fig, ax = new_figure((6, 4))
+    ax.bar(preferred_system_counts.index, preferred_system_counts.values, color=['blue', 'orange', 'green'])
+    ax.set_xlabel('Systems')
+    ax.set_ylabel('Counts')
+    ax.set_title('Preferred Systems Count')
+    return fig
+
+
+def comparison_graph(pre_scores, post_scores, categories=('Confidence', 'Nervousness', 'WtC')):
+    x = range(len(categories))
+
+    fig, ax = new_figure((5, 3))
+    ax.bar(x, pre_scores, width=0.4, label='Pre-Test', align='center')
+    ax.bar(x, post_scores, width=0.4, label='Post-Test', align='edge')
+    ax.set_xticks(list(x), categories)
+    ax.set_xlabel('Categories')
+    ax.set_ylabel('Scores')
+    ax.set_title('Comparison of Pre-Test and Post-Test Scores')
+    ax.legend()
+    return fig
@@ -1,12 +1,13 @@
 # mod/posttest.py
 import os
-import pandas as pd
 import matplotlib.pyplot as plt
 from PyQt5.QtWidgets import QVBoxLayout, QHBoxLayout, QLabel, QFrame, QPushButton, QFileDialog, QMessageBox
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtCore import Qt
 from datetime import datetime
 from fpdf import FPDF
+from mod.engine.survey import score_test
+from mod.loader import cached_read_table
 
 class PostTestFrame(QFrame):
     def __init__(self, parent=None):
@@ -31,44 +32,6 @@ class PostTestFrame(QFrame):
 
         self.test_data = None
 
-    def revised_map_ratings_to_scores(self, rating, category):
-        if isinstance(rating, str):
-            rating = rating.strip()
-            if category == 'confidence':
-                if '絶対できない' in rating:
-                    return 0
-                elif 'あまりできない' in rating:
-                    return 1
-                elif '場合によりけり' in rating:
-                    return 2
-                elif '多分できる' in rating:
-                    return 3
-                elif '機会があればやってみたい' in rating:
-                    return 4
-                elif '簡単にできる' in rating:
-                    return 5
-            elif category == 'nervousness':
-                if 'すごく緊張する' in rating:
-                    return 0
-                elif 'できれば避けたい' in rating:
-                    return 1
-                elif 'かなり緊張する' in rating:
-                    return 2
-                elif 'すこしは緊張する' in rating:
-                    return 3
-                elif '緊張しない' in rating:
-                    return 4
-            elif category == 'wtc':
-                if 'できれば避けたい' in rating:
-                    return 0
-                elif '機会があればやってみたい' in rating:
-                    return 1
-                elif '多分できる' in rating:
-                    return 2
-                elif '簡単にできる' in rating:
-                    return 3
-        return None
-
     def upload_post_test_file(self):
         options = QFileDialog.Options()
         file_path, _ = QFileDialog.getOpenFileName(self, "Select Post-Test File", "", "CSV Files (*.csv);;Excel Files (*.xlsx)", options=options)
@@ -77,27 +40,13 @@ class PostTestFrame(QFrame):
             self.generate_pdf_button_post.setEnabled(True)  # Initially disabled
 
     def process_post_test_data(self, file_path):
-        if file_path.endswith('.csv'):
-            post_test_wtc_data = pd.read_csv(file_path)
-        else:
-            post_test_wtc_data = pd.read_excel(file_path)
-
-        # Extract relevant columns for confidence, nervousness, and WtC
-        confidence_columns = [col for col in post_test_wtc_data.columns if '自信' in col]
-        nervousness_columns = [col for col in post_test_wtc_data.columns if '緊張' in col]
-        wtc_columns = [col for col in post_test_wtc_data.columns if 'やる気' in col]
-
-        # Extracting relevant columns
-        confidence_data = post_test_wtc_data[confidence_columns]
-        nervousness_data = post_test_wtc_data[nervousness_columns]
-        wtc_data = post_test_wtc_data[wtc_columns]
-
-        # Apply the updated mapping function to convert post-test WtC ratings to scores
-        post_confidence_scores_updated = confidence_data.applymap(
-            lambda x: self.revised_map_ratings_to_scores(x, 'confidence'))
-        post_nervousness_scores_updated = nervousness_data.applymap(
-            lambda x: self.revised_map_ratings_to_scores(x, 'nervousness'))
-        post_wtc_scores_updated = wtc_data.applymap(lambda x: self.revised_map_ratings_to_scores(x, 'wtc'))
+        post_test_wtc_data = cached_read_table(file_path)
+
+        # Score the confidence, nervousness and WtC answers of every respondent
+        scores = score_test(post_test_wtc_data)
+        post_confidence_scores_updated = scores['confidence']
+        post_nervousness_scores_updated = scores['nervousness']
+        post_wtc_scores_updated = scores['wtc']
 
         # Calculate average scores for each category in the post-test
         self.average_post_confidence_score_updated = post_confidence_scores_updated.mean(axis=1).mean()
@@ -196,4 +145,10 @@ class PostTestFrame(QFrame):
         return self.test_data
 
     def get_data(self):
-        return self.data
\ No newline at end of file
+        return self.data
+
+    def report_summary(self):
+        # Bounded summary for the combined report, None until files are analysed
+        if not self.data:
+            return None
+        return {'Confidence': self.data['confidence'], 'Nervousness': self.data['nervousness'], 'WtC': self.data['wtc']}
\ No newline at end of file
@@ -0,0 +1,219 @@
+# mod/report_writers.py
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+
+REPORTS_DIR = "generated_reports"
+DURATION_DIR = "generated_duration"
+
+
+def report_filename(prefix, extension, output_dir=REPORTS_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    return os.path.join(output_dir, f"{prefix}_{timestamp}.{extension}")
+
+
+def format_value(value):
+    # Floats with two decimals, tuples of floats in parentheses
+    if isinstance(value, tuple):
+        return "(" + ", ".join(f"{v:.2f}" for v in value) + ")"
+    if isinstance(value, (float, np.floating)):
+        return f"{value:.2f}"
+    if value is None:
+        return "N/A"
+    return str(value)
+
+
+def format_summary(summary):
+    # One "Label: value" line per entry
+    return "\n".join(f"{label}: {format_value(value)}" for label, value in summary.items())
+
+
+def add_text_page(pdf, text):
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.axis('off')
+    ax.text(0.5, 0.5, text, transform=ax.transAxes, ha='center', va='center', wrap=True)
+    pdf.savefig(fig)
+    plt.close(fig)
+
+
+def add_table_page(pdf, table_data):
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.axis('off')
+    ax.table(cellText=table_data, cellLoc='center', loc='center')
+    pdf.savefig(fig)
+    plt.close(fig)
+
+
+def add_figure_pages(pdf, figures):
+    # The figures are written as vector pages, as drawn for display
+    for fig in figures:
+        pdf.savefig(fig)
+
+
+def write_heart_rate_pdf(summary, figures, output_dir=REPORTS_DIR):
+    pdf_filename = report_filename("heart_rate_report", "pdf", output_dir)
+    with PdfPages(pdf_filename) as pdf:
+        add_text_page(pdf, format_summary(summary))
+        add_figure_pages(pdf, figures)
+    return pdf_filename
+
+
+def write_tobii_pdf(summary, ancova_results, svm_report, figures, output_dir=REPORTS_DIR):
+    pdf_filename = report_filename("tobii_report", "pdf", output_dir)
+    with PdfPages(pdf_filename) as pdf:
+        add_text_page(pdf, format_summary(summary))
+        add_figure_pages(pdf, figures)
+        if ancova_results is not None:
+            add_text_page(pdf, f"ANCOVA Results:\n{ancova_results}")
+        if svm_report is not None:
+            add_text_page(pdf, f"SVM Cross-Validation:\n{svm_report}")
+    return pdf_filename
+
+
+def classification_report_text(report_dict):
+    lines = []
+    for label, metrics in report_dict.items():
+        if isinstance(metrics, dict):
+            lines.append(f"Label: {label}")
+            for metric, value in metrics.items():
+                lines.append(f"  {metric}: {value:.2f}")
+        else:
+            lines.append(f"{label}: {metrics:.2f}")
+    return "\n".join(lines)
+
+
+def write_face_emotion_pdf(au_results, svm_report, figures, output_dir=REPORTS_DIR):
+    pdf_filename = report_filename("face_emotion_report", "pdf", output_dir)
+    with PdfPages(pdf_filename) as pdf:
+        table_data = [["AU", "Average", "Variance", "Standard Deviation"]]
+        table_data += [[result["AU"], result["Average"], result["Variance"], result["Std Dev"]] for result in au_results]
+        add_table_page(pdf, table_data)
+        if isinstance(svm_report, dict):
+            add_text_page(pdf, classification_report_text(svm_report))
+        add_figure_pages(pdf, figures)
+    return pdf_filename
+
+
+def write_face_emotion_csv(au_results, svm_report, output_dir=REPORTS_DIR):
+    csv_filename = report_filename("face_emotion_report", "csv", output_dir)
+    results_df = pd.DataFrame({
+        "AU": [result["AU"] for result in au_results],
+        "Average": [result["Average"] for result in au_results],
+        "Variance": [result["Variance"] for result in au_results],
+        "Std Dev": [result["Std Dev"] for result in au_results]
+    })
+    results_df.to_csv(csv_filename, index=False)
+    if isinstance(svm_report, dict):
+        svm_df = pd.DataFrame(svm_report).transpose()
+        svm_df.to_csv(csv_filename, mode='a', header=True)
+    return csv_filename
+
+
+def write_dialogflow_pdf(utterance_counts, category_counts, strategy_counts, confidence_stats, figures,
+                         output_dir=REPORTS_DIR):
+    pdf_filename = report_filename("dialogflow_report", "pdf", output_dir)
+    with PdfPages(pdf_filename) as pdf:
+        table_data = [["Type", "Count"]]
+        table_data += [["Utterance: " + str(k), v] for k, v in utterance_counts.items()]
+        table_data += [["Category: " + str(k), v] for k, v in category_counts.items()]
+        table_data += [["Strategy: " + str(k), v] for k, v in strategy_counts.items()]
+        table_data += [["Confidence", str(confidence_stats)]]
+        add_table_page(pdf, table_data)
+        add_figure_pages(pdf, figures)
+    return pdf_filename
+
+
+def write_dialogflow_csv(utterance_counts, category_counts, strategy_counts, confidence_stats, output_dir=REPORTS_DIR):
+    csv_filename = report_filename("dialogflow_report", "csv", output_dir)
+    results_df = pd.DataFrame({
+        "Type": ["Utterance"] * len(utterance_counts) + ["Category"] * len(category_counts) + ["Strategy"] * len(strategy_counts),
+        "Value": list(utterance_counts.index) + list(category_counts.index) + list(strategy_counts.index),
+        "Count": list(utterance_counts.values) + list(category_counts.values) + list(strategy_counts.values)
+    })
+    results_df.to_csv(csv_filename, index=False)
+    confidence_stats_df = pd.DataFrame(list(confidence_stats.to_dict().items()), columns=['Metric', 'Value'])
+    confidence_stats_df.to_csv(csv_filename, mode='a', index=False)
+    return csv_filename
+
+
+def system_choice_stats_table(first_strategy_stats, second_strategy_stats):
+    return [
+        ["Statistic", "First Strategy", "Second Strategy"],
+        ["Average", f"{first_strategy_stats['average']:.2f}", f"{second_strategy_stats['average']:.2f}"],
+        ["Standard Deviation", f"{first_strategy_stats['std_dev']:.2f}", f"{second_strategy_stats['std_dev']:.2f}"],
+        ["Min", f"{first_strategy_stats['min']:.2f}", f"{second_strategy_stats['min']:.2f}"],
+        ["Max", f"{first_strategy_stats['max']:.2f}", f"{second_strategy_stats['max']:.2f}"]
+    ]
+
+
+def system_choice_demographics(system_choice_data):
+    return system_choice_data[['Gender', 'Education Level', 'Language Proficiency', 'Prefered System']].describe()
+
+
+def write_system_choice_pdf(first_strategy_stats, second_strategy_stats, system_choice_data, figures,
+                            output_dir=REPORTS_DIR):
+    pdf_filename = report_filename("system_choice_report", "pdf", output_dir)
+    with PdfPages(pdf_filename) as pdf:
+        add_table_page(pdf, system_choice_stats_table(first_strategy_stats, second_strategy_stats))
+
+        demographics_text = "Demographic Information:\n\n" + system_choice_demographics(system_choice_data).to_string()
+        observations = system_choice_data.filter(like='Observation').to_string(index=False)
+        feedback = system_choice_data.filter(like='Feedback').to_string(index=False)
+        add_text_page(pdf, demographics_text + "\n\nObservations:\n" + observations + "\n\nFeedback:\n" + feedback)
+
+        add_figure_pages(pdf, figures)
+    return pdf_filename
+
+
+def write_system_choice_csv(first_strategy_stats, second_strategy_stats, system_choice_data, output_dir=REPORTS_DIR):
+    csv_filename = report_filename("system_choice_report", "csv", output_dir)
+    stats_df = pd.DataFrame({
+        "Statistic": ["Average", "Standard Deviation", "Min", "Max"],
+        "First Strategy": [first_strategy_stats['average'], first_strategy_stats['std_dev'], first_strategy_stats['min'], first_strategy_stats['max']],
+        "Second Strategy": [second_strategy_stats['average'], second_strategy_stats['std_dev'], second_strategy_stats['min'], second_strategy_stats['max']]
+    })
+    stats_df.to_csv(csv_filename, index=False)
+
+    with open(csv_filename, 'a') as f:
+        f.write("\nDemographic Information:\n")
+        system_choice_demographics(system_choice_data).to_csv(f, mode='a')
+        f.write("\nObservations:\n")
+        system_choice_data.filter(like='Observation').to_csv(f, mode='a', index=False)
+        f.write("\nFeedback:\n")
+        system_choice_data.filter(like='Feedback').to_csv(f, mode='a', index=False)
+    return csv_filename
+
+
+def write_multimodal_csv(utterances, output_dir=REPORTS_DIR):
+    csv_filename = report_filename("multimodal_utterances_report", "csv", output_dir)
+    utterances.to_csv(csv_filename, index_label="Utterance Index")
+    return csv_filename
+
+
+def write_group_statistics_csv(group_statistics, modality, output_dir=REPORTS_DIR):
+    # grouped_statistics() table, one "metric statistic" column each
+    csv_filename = report_filename(f"{modality}_participant_statistics", "csv", output_dir)
+    table = group_statistics.copy()
+    table.columns = [f"{column} {statistic}" for column, statistic in table.columns]
+    table.to_csv(csv_filename)
+    return csv_filename
+
+
+def write_cohort_csv(comparison, output_dir=REPORTS_DIR):
+    # CohortComparison of one modality: the metric summary, and every participant's tests
+    summary_filename = report_filename(f"{comparison.modality}_cohort_comparison", "csv", output_dir)
+    comparison.summary().to_csv(summary_filename)
+    participants_filename = report_filename(f"{comparison.modality}_cohort_participants", "csv", output_dir)
+    comparison.participant_table().to_csv(participants_filename)
+    return [summary_filename, participants_filename]
+
+
+def write_duration_csv(durations, output_dir=DURATION_DIR):
+    csv_filename = report_filename("durations", "csv", output_dir)
+    durations.to_csv(csv_filename, index=False)
+    return csv_filename
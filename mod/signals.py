@@ -0,0 +1,126 @@
+# mod/signals.py
+import hashlib
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from mod.cache import TableCache
+
+SIGNALS_DIR = os.path.join("warehouse", "signals")
+MANIFEST = "channels.json"
+TIME_FILE = "time_ms.npy"
+
+
+def channel_file(channel):
+    return re.sub(r"[^\w.-]", "_", channel) + ".npy"
+
+
+def write_signals(directory, values: pd.DataFrame):
+    # values: a time_ms column sorted ascending, then one column per channel. Each is saved as its own .npy file,
+    # the manifest last, in a temporary directory moved into place so readers never see a partial session.
+    tmp_directory = f"{directory}.{os.getpid()}.tmp"
+    os.makedirs(tmp_directory, exist_ok=True)
+    np.save(os.path.join(tmp_directory, TIME_FILE), values['time_ms'].to_numpy(dtype='int64'))
+    channels = {}
+    for channel in values.columns.drop('time_ms'):
+        data = values[channel].to_numpy()
+        if data.dtype.kind not in 'iufb':
+            data = pd.to_numeric(values[channel], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        channels[channel] = channel_file(channel)
+        np.save(os.path.join(tmp_directory, channels[channel]), data)
+    with open(os.path.join(tmp_directory, MANIFEST), 'w') as f:
+        json.dump({'rows': len(values), 'channels': channels}, f)
+    try:
+        os.replace(tmp_directory, directory)
+    except OSError:  # Written by another process meanwhile
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+
+
+class SessionSignals:
+    # One stored session, every channel memory-mapped: only the pages of the windows read are loaded
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as f:
+            self.channel_files = json.load(f)['channels']
+        self.time_ms = np.load(os.path.join(directory, TIME_FILE), mmap_mode='r')
+        self.arrays = {}
+
+    @property
+    def channels(self):
+        return list(self.channel_files)
+
+    def __len__(self):
+        return len(self.time_ms)
+
+    def channel(self, name) -> np.ndarray:
+        if name not in self.channel_files:
+            raise ValueError(f"No channel {name} in {self.directory}.")
+        if name not in self.arrays:
+            self.arrays[name] = np.load(os.path.join(self.directory, self.channel_files[name]), mmap_mode='r')
+        return self.arrays[name]
+
+    def span(self):
+        return (int(self.time_ms[0]), int(self.time_ms[-1])) if len(self) else (None, None)
+
+    def bounds(self, start_ms, end_ms):
+        # Positions of the samples with start_ms <= time < end_ms; None leaves a side open
+        low = 0 if start_ms is None else int(np.searchsorted(self.time_ms, start_ms, side='left'))
+        high = len(self) if end_ms is None else int(np.searchsorted(self.time_ms, end_ms, side='left'))
+        return low, max(low, high)
+
+    def window(self, start_ms=None, end_ms=None, channels=None) -> pd.DataFrame:
+        low, high = self.bounds(start_ms, end_ms)
+        return pd.DataFrame({'time_ms': np.array(self.time_ms[low:high]),
+                             **{name: np.array(self.channel(name)[low:high]) for name in channels or self.channels}})
+
+    def window_means(self, starts_ms, ends_ms, channels=None) -> pd.DataFrame:
+        # Mean of each channel over every [start, end) window, e.g. the utterances of a session, from cumulative
+        # sums over the span the windows cover only; NaN readings are skipped
+        starts_ms = np.asarray(starts_ms, dtype='int64')
+        ends_ms = np.asarray(ends_ms, dtype='int64')
+        low = np.searchsorted(self.time_ms, starts_ms, side='left')
+        high = np.maximum(low, np.searchsorted(self.time_ms, ends_ms, side='left'))
+        first, last = (int(low.min()), int(high.max())) if len(low) else (0, 0)
+        means = {'samples': high - low}
+        for name in channels or self.channels:
+            values = np.asarray(self.channel(name)[first:last], dtype='float64')
+            valid = ~np.isnan(values)
+            sums = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+            counts = np.concatenate([[0], np.cumsum(valid)])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                means[name] = (sums[high - first] - sums[low - first]) / (counts[high - first] - counts[low - first])
+        return pd.DataFrame(means)
+
+
+class SignalStore:
+    # Sessions' samples as per-channel arrays, one directory per session keyed by the content hashes of its files
+    # and the modality, like TableCache's derived tables: changed files are stored anew, never served stale.
+    # variant names how the samples were selected, e.g. the warehouse's reading columns.
+    def __init__(self, store_dir=SIGNALS_DIR, cache=None, variant=""):
+        self.store_dir = store_dir
+        self.cache = cache or TableCache()
+        self.variant = variant
+
+    def session_dir(self, files, modality):
+        digest = hashlib.blake2b(f"{modality}{self.variant}".encode(), digest_size=20)
+        for file in files:
+            digest.update(self.cache.content_hash(file).encode())
+        return os.path.join(self.store_dir, f"{digest.hexdigest()}-{modality}")
+
+    def contains(self, files, modality):
+        return os.path.exists(os.path.join(self.session_dir(files, modality), MANIFEST))
+
+    def write(self, files, modality, values: pd.DataFrame):
+        if not self.contains(files, modality):
+            os.makedirs(self.store_dir, exist_ok=True)
+            write_signals(self.session_dir(files, modality), values)
+        return self.open(files, modality)
+
+    def open(self, files, modality) -> SessionSignals:
+        if not self.contains(files, modality):
+            raise ValueError(f"No {modality} signals stored for {', '.join(files)}.")
+        return SessionSignals(self.session_dir(files, modality))
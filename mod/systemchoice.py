@@ -1,12 +1,10 @@
-import os
-import pandas as pd
 from PyQt5.QtWidgets import QVBoxLayout, QLabel, QFileDialog, QFrame, QPushButton, QHBoxLayout, QMessageBox, \
     QScrollArea, QWidget
-from PyQt5.QtGui import QPixmap
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from PyQt5.QtCore import Qt
-from datetime import datetime, date, time
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
+from mod import plots, report_writers
+from mod.engine.systemchoice import SystemChoiceAnalyzer
+from mod.loader import cached_read_table
 
 
 class SystemChoiceFrame(QFrame):
@@ -53,57 +51,17 @@ class SystemChoiceFrame(QFrame):
             self.csv_report_button.setEnabled(True)  # Enable the CSV report button after a file is uploaded
 
     def process_system_choice_data(self, file_path):
-        if file_path.endswith('.csv'):
-            system_choice_data = pd.read_csv(file_path)
-        else:
-            system_choice_data = pd.read_excel(file_path)
+        system_choice_data = cached_read_table(file_path)
 
-        # Extract relevant data
-        today = date.today()
-
-        first_strategy_start = system_choice_data['Start times of First test strategy 1'].apply(
-            lambda t: datetime.combine(today, t) if isinstance(t, time) else t
-        )
-        first_strategy_end = system_choice_data['End Times of First test strategy 1'].apply(
-            lambda t: datetime.combine(today, t) if isinstance(t, time) else t
-        )
-        second_strategy_start = system_choice_data['Start times of Second test  Strategy 2'].apply(
-            lambda t: datetime.combine(today, t) if isinstance(t, time) else t
-        )
-        second_strategy_end = system_choice_data['End Times of Second test Strategy 2'].apply(
-            lambda t: datetime.combine(today, t) if isinstance(t, time) else t
-        )
-
-        # Calculate interaction times in minutes
-        first_strategy_duration = (first_strategy_end - first_strategy_start).dt.total_seconds() / 60
-        second_strategy_duration = (second_strategy_end - second_strategy_start).dt.total_seconds() / 60
-
-        # Calculate statistics
-        self.first_strategy_stats = {
-            'average': first_strategy_duration.mean(),
-            'std_dev': first_strategy_duration.std(),
-            'min': first_strategy_duration.min(),
-            'max': first_strategy_duration.max()
-        }
-
-        self.second_strategy_stats = {
-            'average': second_strategy_duration.mean(),
-            'std_dev': second_strategy_duration.std(),
-            'min': second_strategy_duration.min(),
-            'max': second_strategy_duration.max()
-        }
-
-        # Count preferred systems
-        self.preferred_system_counts = system_choice_data['Prefered System'].value_counts()
+        self.result = SystemChoiceAnalyzer().analyze(system_choice_data)
+        self.first_strategy_stats = self.result.first_strategy_stats
+        self.second_strategy_stats = self.result.second_strategy_stats
+        self.preferred_system_counts = self.result.preferred_system_counts
 
         self.system_choice_data = system_choice_data  # Store data for report generation
 
         # Store data for access
-        self.data = {
-            'first_strategy_stats': self.first_strategy_stats,
-            'second_strategy_stats': self.second_strategy_stats,
-            'preferred_system_counts': self.preferred_system_counts.to_dict()
-        }
+        self.data = self.result.to_dict()
 
         self.display_results()
 
@@ -137,21 +95,15 @@ class SystemChoiceFrame(QFrame):
         # Block 2: Displaying demographic and observation/feedback data
         data_layout = QVBoxLayout()
 
-        # Extract demographic information
-        demographics = self.system_choice_data[
-            ['Gender', 'Education Level', 'Language Proficiency', 'Prefered System']].describe()
-
         # Display demographic information
-        demographics_text = "Demographic Information:\n\n" + demographics.to_string()
+        demographics_text = "Demographic Information:\n\n" + self.result.demographics.to_string()
         demographics_label = QLabel(demographics_text)
         demographics_label.setWordWrap(True)
         data_layout.addWidget(demographics_label)
 
         # Extract and display observations and feedback
-        observations = self.system_choice_data.filter(like='Observation')
-        feedback = self.system_choice_data.filter(like='Feedback')
-        obs_text = "Observations:\n" + observations.to_string(index=False)
-        feedback_text = "Feedback:\n" + feedback.to_string(index=False)
+        obs_text = "Observations:\n" + self.result.observations.to_string(index=False)
+        feedback_text = "Feedback:\n" + self.result.feedback.to_string(index=False)
         combined_text = obs_text + "\n\n" + feedback_text
         combined_label = QLabel(combined_text)
         combined_label.setWordWrap(True)
@@ -166,67 +118,18 @@ class SystemChoiceFrame(QFrame):
         self.display_preferred_system_graph()
 
     def display_graph(self):
-        categories = ['Average', 'Standard Deviation', 'Min', 'Max']
-        first_strategy_values = [self.first_strategy_stats['average'], self.first_strategy_stats['std_dev'],
-                                 self.first_strategy_stats['min'], self.first_strategy_stats['max']]
-        second_strategy_values = [self.second_strategy_stats['average'], self.second_strategy_stats['std_dev'],
-                                  self.second_strategy_stats['min'], self.second_strategy_stats['max']]
-
-        x = range(len(categories))
-
-        plt.figure(figsize=(6, 4))
-        plt.bar(x, first_strategy_values, width=0.4, label='First Strategy', align='center')
-        plt.bar(x, second_strategy_values, width=0.4, label='Second Strategy', align='edge')
-        plt.xticks(x, categories)
-        plt.xlabel('Statistics')
-        plt.ylabel('Duration (minutes)')
-        plt.title('Interaction Times for Test Strategies')
-        plt.legend()
-
-        # Ensure the Output directory exists
-        output_dir = "Output"
-        os.makedirs(output_dir, exist_ok=True)
-
-        # Create a unique filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        self.graph_filename = os.path.join(output_dir, f"system_choice_data_{timestamp}.png")
-        plt.savefig(self.graph_filename)
-        plt.close()
-
-        # Display the graph in the frame
-        pixmap = QPixmap(self.graph_filename)
-        graph_label = QLabel()
-        graph_label.setPixmap(pixmap)
-        graph_label.setAlignment(Qt.AlignCenter)
-        self.results_layout.addWidget(graph_label)
-
+        self.graph_figure = self.show_graph(
+            plots.strategy_durations_graph(self.first_strategy_stats, self.second_strategy_stats))
 
     def display_preferred_system_graph(self):
-        systems = self.preferred_system_counts.index
-        counts = self.preferred_system_counts.values
-
-        plt.figure(figsize=(6, 4))
-        plt.bar(systems, counts, color=['blue', 'orange', 'green'])
-        plt.xlabel('Systems')
-        plt.ylabel('Counts')
-        plt.title('Preferred Systems Count')
-
-        # Ensure the Output directory exists
-        output_dir = "Output"
-        os.makedirs(output_dir, exist_ok=True)
-
-        # Create a unique filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        self.preferred_system_graph_filename = os.path.join(output_dir, f"preferred_system_count_{timestamp}.png")
-        plt.savefig(self.preferred_system_graph_filename)
-        plt.close()
-
-        # Display the graph in the frame
-        pixmap = QPixmap(self.preferred_system_graph_filename)
-        graph_label = QLabel()
-        graph_label.setPixmap(pixmap)
-        graph_label.setAlignment(Qt.AlignCenter)
-        self.results_layout.addWidget(graph_label)
+        self.preferred_system_figure = self.show_graph(plots.preferred_system_graph(self.preferred_system_counts))
+
+    def show_graph(self, fig):
+        # Display the graph in the frame at its natural size, the figure is kept for the PDF report
+        canvas = FigureCanvas(fig)
+        canvas.setFixedSize(*canvas.get_width_height())
+        self.results_layout.addWidget(canvas, alignment=Qt.AlignCenter)
+        return fig
 
     def clear_layout(self, layout):
         while layout.count():
@@ -236,54 +139,9 @@ class SystemChoiceFrame(QFrame):
 
     def generate_report(self):
         try:
-            output_dir = "generated_reports"
-            os.makedirs(output_dir, exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            pdf_filename = os.path.join(output_dir, f"system_choice_report_{timestamp}.pdf")
-
-            with PdfPages(pdf_filename) as pdf:
-                # Add statistics to PDF
-                fig, ax = plt.subplots(figsize=(8, 6))
-                ax.axis('off')
-                table_data = [
-                    ["Statistic", "First Strategy", "Second Strategy"],
-                    ["Average", f"{self.first_strategy_stats['average']:.2f}", f"{self.second_strategy_stats['average']:.2f}"],
-                    ["Standard Deviation", f"{self.first_strategy_stats['std_dev']:.2f}", f"{self.second_strategy_stats['std_dev']:.2f}"],
-                    ["Min", f"{self.first_strategy_stats['min']:.2f}", f"{self.second_strategy_stats['min']:.2f}"],
-                    ["Max", f"{self.first_strategy_stats['max']:.2f}", f"{self.second_strategy_stats['max']:.2f}"]
-                ]
-                ax.table(cellText=table_data, cellLoc='center', loc='center')
-                pdf.savefig(fig)
-                plt.close(fig)
-
-                # Add demographic information and feedback to PDF
-                fig, ax = plt.subplots(figsize=(8, 6))
-                ax.axis('off')
-                demographics_text = "Demographic Information:\n\n" + self.system_choice_data[['Gender', 'Education Level', 'Language Proficiency', 'Prefered System']].describe().to_string()
-                observations = self.system_choice_data.filter(like='Observation').to_string(index=False)
-                feedback = self.system_choice_data.filter(like='Feedback').to_string(index=False)
-                text = demographics_text + "\n\nObservations:\n" + observations + "\n\nFeedback:\n" + feedback
-                ax.text(0.5, 0.5, text, transform=ax.transAxes, ha='center', va='center', wrap=True)
-                pdf.savefig(fig)
-                plt.close(fig)
-
-                # Add graph to PDF
-                if hasattr(self, 'graph_filename'):
-                    fig, ax = plt.subplots(figsize=(8, 6))
-                    img = plt.imread(self.graph_filename)
-                    ax.imshow(img)
-                    ax.axis('off')
-                    pdf.savefig(fig)
-                    plt.close(fig)
-
-                # Add preferred system graph to PDF
-                if hasattr(self, 'preferred_system_graph_filename'):
-                    fig, ax = plt.subplots(figsize=(8, 6))
-                    img = plt.imread(self.preferred_system_graph_filename)
-                    ax.imshow(img)
-                    ax.axis('off')
-                    pdf.savefig(fig)
-                    plt.close(fig)
+            figures = [getattr(self, name) for name in ('graph_figure', 'preferred_system_figure') if hasattr(self, name)]
+            pdf_filename = report_writers.write_system_choice_pdf(self.first_strategy_stats, self.second_strategy_stats,
+                                                                  self.system_choice_data, figures)
 
             QMessageBox.information(self, "Report Generated", f"PDF report generated successfully:\n{pdf_filename}")
 
@@ -292,35 +150,8 @@ class SystemChoiceFrame(QFrame):
 
     def generate_csv_report(self):
         try:
-            output_dir = "generated_reports"
-            os.makedirs(output_dir, exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            csv_filename = os.path.join(output_dir, f"system_choice_report_{timestamp}.csv")
-
-            # Collect statistics data
-            stats_data = {
-                "Statistic": ["Average", "Standard Deviation", "Min", "Max"],
-                "First Strategy": [self.first_strategy_stats['average'], self.first_strategy_stats['std_dev'], self.first_strategy_stats['min'], self.first_strategy_stats['max']],
-                "Second Strategy": [self.second_strategy_stats['average'], self.second_strategy_stats['std_dev'], self.second_strategy_stats['min'], self.second_strategy_stats['max']]
-            }
-            stats_df = pd.DataFrame(stats_data)
-
-            # Collect demographic information and feedback data
-            demographics = self.system_choice_data[['Gender', 'Education Level', 'Language Proficiency', 'Prefered System']].describe()
-            observations = self.system_choice_data.filter(like='Observation')
-            feedback = self.system_choice_data.filter(like='Feedback')
-
-            # Save statistics to CSV
-            stats_df.to_csv(csv_filename, index=False)
-
-            # Append demographic and feedback data to CSV
-            with open(csv_filename, 'a') as f:
-                f.write("\nDemographic Information:\n")
-                demographics.to_csv(f, mode='a')
-                f.write("\nObservations:\n")
-                observations.to_csv(f, mode='a', index=False)
-                f.write("\nFeedback:\n")
-                feedback.to_csv(f, mode='a', index=False)
+            csv_filename = report_writers.write_system_choice_csv(self.first_strategy_stats, self.second_strategy_stats,
+                                                                  self.system_choice_data)
 
             QMessageBox.information(self, "Report Generated", f"CSV report generated successfully:\n{csv_filename}")
 
@@ -329,3 +160,7 @@ class SystemChoiceFrame(QFrame):
 
     def get_data(self):
         return self.data
+
+    def report_summary(self):
+        # Bounded summary for the combined report, None until files are analysed
+        return self.result.report_summary() if self.data else None
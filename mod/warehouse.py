@@ -0,0 +1,246 @@
+# mod/warehouse.py
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from mod.cache import TableCache
+from mod.engine.alignment import SessionAligner, reading_columns, readings_key
+from mod.engine.describe import describe_columns
+from mod.signals import SessionSignals, SignalStore
+
+WAREHOUSE_PATH = os.path.join("warehouse", "sessions.sqlite")
+SAMPLE_MODALITIES = ['heart_rate', 'tobii', 'face_emotion']
+WAREHOUSE_MODALITIES = SAMPLE_MODALITIES + ['dialogflow']
+# The last utterance of a session lasts until its samples stop
+OPEN_END_MS = 2 ** 63 - 1
+
+TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id INTEGER PRIMARY KEY,
+    participant TEXT NOT NULL,
+    test INTEGER NOT NULL,
+    modality TEXT NOT NULL,
+    files TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    rows INTEGER,
+    ingested_at TEXT NOT NULL,
+    UNIQUE (participant, test, modality)
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    session_id INTEGER NOT NULL,
+    participant TEXT NOT NULL,
+    test INTEGER NOT NULL,
+    modality TEXT NOT NULL,
+    variable TEXT NOT NULL,
+    statistic TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (participant, test, modality, variable, statistic)
+);
+CREATE INDEX IF NOT EXISTS summaries_statistic ON summaries (modality, variable, statistic);
+CREATE TABLE IF NOT EXISTS utterances (
+    session_id INTEGER NOT NULL,
+    participant TEXT NOT NULL,
+    test INTEGER NOT NULL,
+    utterance_index INTEGER NOT NULL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER,
+    utterance TEXT,
+    category TEXT,
+    strategy TEXT,
+    confidence REAL
+);
+CREATE INDEX IF NOT EXISTS utterances_time ON utterances (participant, test, start_ms);
+CREATE INDEX IF NOT EXISTS utterances_strategy ON utterances (strategy, participant, test);
+CREATE INDEX IF NOT EXISTS utterances_session ON utterances (session_id);
+"""
+UTTERANCE_COLUMNS = ['utterance', 'category', 'strategy', 'confidence']
+
+
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def sample_table(modality):
+    if modality not in SAMPLE_MODALITIES:
+        raise ValueError(f"No samples are stored for {modality}.")
+    return f"samples_{modality}"
+
+
+def files_hash(files, cache=None):
+    # Content hashes of a session's files, remembered by the table cache against their path, size and mtime, and
+    # the reading selection they were stored with
+    cache = cache or TableCache()
+    return "-".join([cache.content_hash(file) for file in files] + [readings_key()])
+
+
+def sample_values(modality, data: pd.DataFrame) -> pd.DataFrame:
+    # The readings (see reading_columns) on the epoch clock, sorted; rows without a valid timestamp are dropped
+    values = data[reading_columns(data)].copy()
+    values.insert(0, 'time_ms', SessionAligner().clock(modality, data))
+    values = values.dropna(subset=['time_ms']).sort_values('time_ms', kind='stable')
+    values['time_ms'] = values['time_ms'].astype('int64')
+    return values
+
+
+def utterance_values(data: pd.DataFrame) -> pd.DataFrame:
+    # One row per utterance as the aligner reads them, each lasting until the next one
+    stream = SessionAligner().stream('dialogflow', data)
+    stream.columns = [column.replace('dialogflow.', '') for column in stream.columns]
+    utterances = stream.rename(columns={'time_ms': 'start_ms'})
+    utterances['end_ms'] = utterances['start_ms'].shift(-1).astype('Int64')
+    for column in UTTERANCE_COLUMNS:
+        if column not in utterances.columns:
+            utterances[column] = None
+    return utterances[['utterance_index', 'start_ms', 'end_ms'] + UTTERANCE_COLUMNS]
+
+
+def rows_of(frame: pd.DataFrame):
+    # Python scalars with None for missing values, as sqlite3 binds them
+    return frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+
+
+class SessionWarehouse:
+    # Local SQLite store of every ingested session: the raw samples of each sensor modality (one samples_<modality>
+    # table, indexed by participant, test and epoch time), the DialogFlow utterances, and the describe_columns()
+    # summaries of every numeric column. A session is the files of one participant, test and modality; storing it
+    # again replaces it, and unchanged files are recognised by their content hash. The sensor samples are also kept
+    # as memory-mapped per-channel arrays in a SignalStore next to the database, for time-window reads.
+    def __init__(self, path=WAREHOUSE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.signal_store = SignalStore(os.path.join(os.path.dirname(path), "signals"), variant=readings_key())
+        with closing(self.connect()) as connection:
+            connection.executescript(TABLES_SQL)
+
+    def connect(self):
+        return sqlite3.connect(self.path)
+
+    def is_current(self, participant, test, modality, files):
+        with closing(self.connect()) as connection:
+            stored = connection.execute(
+                "SELECT files, content_hash FROM sessions WHERE participant = ? AND test = ? AND modality = ?",
+                (participant, test, modality)).fetchone()
+        if stored is None or stored != ("\n".join(files), files_hash(files)):
+            return False
+        return modality not in SAMPLE_MODALITIES or self.signal_store.contains(files, modality)
+
+    def columns(self, connection, table):
+        return [row[1] for row in connection.execute(f"PRAGMA table_info({quote(table)})")]
+
+    def ensure_sample_table(self, connection, modality, columns):
+        # Created with the first session's readings; columns only later files have are added then
+        table = sample_table(modality)
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {quote(table)} (session_id INTEGER NOT NULL, "
+                           f"participant TEXT NOT NULL, test INTEGER NOT NULL, time_ms INTEGER NOT NULL)")
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {quote(table + '_time')} "
+                           f"ON {quote(table)} (participant, test, time_ms)")
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {quote(table + '_session')} ON {quote(table)} (session_id)")
+        existing = set(self.columns(connection, table))
+        for column in columns:
+            if column not in existing:
+                connection.execute(f"ALTER TABLE {quote(table)} ADD COLUMN {quote(column)} REAL")
+        return table
+
+    def insert(self, connection, table, frame: pd.DataFrame):
+        placeholders = ", ".join("?" * len(frame.columns))
+        connection.executemany(f"INSERT INTO {quote(table)} ({', '.join(map(quote, frame.columns))}) "
+                               f"VALUES ({placeholders})", rows_of(frame))
+
+    def delete(self, connection, participant, test, modality):
+        stored = connection.execute(
+            "SELECT session_id FROM sessions WHERE participant = ? AND test = ? AND modality = ?",
+            (participant, test, modality)).fetchone()
+        if stored is None:
+            return
+        tables = ['summaries', 'utterances'] + [table for table in map(sample_table, SAMPLE_MODALITIES)
+                                               if self.columns(connection, table)]
+        for table in tables + ['sessions']:
+            connection.execute(f"DELETE FROM {quote(table)} WHERE session_id = ?", stored)
+
+    def store(self, participant, test, modality, files, data: pd.DataFrame):
+        # data holds the session's files stacked, with lowercase column names; returns the rows stored
+        if modality == 'dialogflow':
+            values = utterance_values(data)
+            readings = values[['confidence']]
+        else:
+            values = sample_values(modality, data)
+            readings = values.drop(columns='time_ms')
+            self.signal_store.write(files, modality, values)
+        summaries = describe_columns({column: readings[column] for column in readings.columns}).stack()
+
+        with closing(self.connect()) as connection, connection:
+            self.delete(connection, participant, test, modality)
+            session_id = connection.execute(
+                "INSERT INTO sessions (participant, test, modality, files, content_hash, rows, ingested_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (participant, test, modality, "\n".join(files), files_hash(files), len(values),
+                 datetime.now().isoformat(timespec='seconds'))).lastrowid
+            keys = {'session_id': session_id, 'participant': participant, 'test': test}
+            if modality == 'dialogflow':
+                self.insert(connection, 'utterances', values.assign(**keys))
+            else:
+                table = self.ensure_sample_table(connection, modality, readings.columns)
+                self.insert(connection, table, pd.concat([pd.DataFrame(keys, index=values.index), values], axis=1))
+            self.insert(connection, 'summaries', pd.DataFrame({
+                **keys, 'modality': modality,
+                'variable': summaries.index.get_level_values(0), 'statistic': summaries.index.get_level_values(1),
+                'value': summaries.to_numpy()}))
+        return len(values)
+
+    def signals(self, participant, test, modality) -> SessionSignals:
+        stored = self.query("SELECT files FROM sessions WHERE participant = ? AND test = ? AND modality = ?",
+                            (participant, test, modality))
+        if stored.empty:
+            raise ValueError(f"No {modality} session of {participant} test {test} in the warehouse.")
+        return self.signal_store.open(stored['files'].iloc[0].split("\n"), modality)
+
+    def utterance_means(self, participant, test, modality, channels=None) -> pd.DataFrame:
+        # Each utterance of a session with the mean readings while it lasted, read off the signal arrays
+        utterances = self.query("SELECT utterance_index, start_ms, end_ms, utterance, category, strategy "
+                                "FROM utterances WHERE participant = ? AND test = ? ORDER BY start_ms",
+                                (participant, test))
+        utterances['end_ms'] = utterances['end_ms'].astype('Int64')
+        means = self.signals(participant, test, modality).window_means(
+            utterances['start_ms'], utterances['end_ms'].fillna(OPEN_END_MS).to_numpy(dtype='int64'), channels)
+        return pd.concat([utterances, means], axis=1).set_index('utterance_index')
+
+    def query(self, sql, params=()) -> pd.DataFrame:
+        with closing(self.connect()) as connection:
+            return pd.read_sql_query(sql, connection, params=params)
+
+    def sessions(self) -> pd.DataFrame:
+        return self.query("SELECT participant, test, modality, rows, ingested_at, files FROM sessions "
+                          "ORDER BY participant, test, modality")
+
+    def summary(self, modality, statistic='mean') -> pd.DataFrame:
+        # One row per participant and test, one column per variable
+        table = self.query("SELECT participant, test, variable, value FROM summaries "
+                           "WHERE modality = ? AND statistic = ?", (modality, statistic))
+        return table.pivot(index=['participant', 'test'], columns='variable', values='value')
+
+    def mean_during(self, modality, columns, strategy=None, category=None) -> pd.DataFrame:
+        # Mean of sensor columns over the samples recorded during the utterances of a DialogFlow strategy and/or
+        # category, per participant and test, e.g. mean_during('tobii', ['left_pupil_diameter'], strategy='CS')
+        table = sample_table(modality)
+        with closing(self.connect()) as connection:
+            stored = set(self.columns(connection, table))
+        missing = [column for column in columns if column not in stored]
+        if missing:
+            raise ValueError(f"No {modality} column {', '.join(missing)} in the warehouse.")
+
+        conditions, params = [], []
+        for name, value in (('strategy', strategy), ('category', category)):
+            if value is not None:
+                conditions.append(f"u.{name} = ?")
+                params.append(value)
+        averages = ", ".join(f"AVG(s.{quote(column)}) AS {quote(column)}" for column in columns)
+        return self.query(
+            f"SELECT s.participant, s.test, COUNT(*) AS samples, {averages} "
+            f"FROM utterances u JOIN {quote(table)} s ON s.participant = u.participant AND s.test = u.test "
+            f"AND s.time_ms >= u.start_ms AND s.time_ms < COALESCE(u.end_ms, {OPEN_END_MS}) "
+            f"{'WHERE ' + ' AND '.join(conditions) if conditions else ''} "
+            f"GROUP BY s.participant, s.test ORDER BY s.participant, s.test", params)
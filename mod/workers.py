@@ -0,0 +1,161 @@
+# mod/workers.py
+import os
+import traceback
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QProgressBar, QPushButton
+
+
+class Cancelled(Exception):
+    pass
+
+
+class WorkerSignals(QObject):
+    progress = pyqtSignal(int, str)
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()
+
+
+class Worker(QRunnable):
+    # Runs fn(worker, *args, **kwargs) on a pool thread. fn must not touch widgets; it reports through
+    # worker.report_progress(), which is also where a cancellation request takes effect.
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self._cancelled = False
+
+    @property
+    def is_cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        self._cancelled = True
+
+    def report_progress(self, percent, message=""):
+        if self._cancelled:
+            raise Cancelled()
+        self.signals.progress.emit(int(percent), message)
+
+    def run(self):
+        try:
+            result = self.fn(self, *self.args, **self.kwargs)
+            if self._cancelled:
+                raise Cancelled()
+        except Cancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
+class TaskProgress(QWidget):
+    # Progress bar with a cancel button, driving one background task at a time for a frame
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        layout.addWidget(self.progress_bar)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel)
+        layout.addWidget(self.cancel_button)
+
+        self.worker = None
+        self.running_workers = set()  # Superseded workers stay referenced until their thread is done
+        self.hide()
+
+    def is_running(self):
+        return self.worker is not None
+
+    def start(self, fn, *args, on_result, on_error=None, on_finished=None):
+        # A new task supersedes the running one, whose results are then dropped
+        self.cancel()
+
+        worker = Worker(fn, *args)
+        worker.signals.progress.connect(
+            lambda percent, message: worker is self.worker and self.update_progress(percent, message))
+        worker.signals.result.connect(lambda result: self._deliver(worker, on_result, result))
+        if on_error:
+            worker.signals.error.connect(lambda message: self._deliver(worker, on_error, message))
+        worker.signals.finished.connect(lambda: self._finish(worker, on_finished))
+        self.worker = worker
+        self.running_workers.add(worker)
+
+        self.update_progress(0, "Starting")
+        self.show()
+        QThreadPool.globalInstance().start(worker)
+        return worker
+
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+            self.hide()
+
+    def update_progress(self, percent, message):
+        self.progress_bar.setValue(percent)
+        self.progress_bar.setFormat(f"{message} %p%" if message else "%p%")
+
+    def _deliver(self, worker, callback, value):
+        # Only the current task may post back to the frame
+        if worker is self.worker and not worker.is_cancelled:
+            callback(value)
+
+    def _finish(self, worker, on_finished):
+        self.running_workers.discard(worker)
+        if worker is self.worker:
+            self.worker = None
+            self.hide()
+            if on_finished:
+                on_finished()
+
+
+def pass_progress(worker, passes):
+    # For analyses that stream the same files several times: returns a function giving the iter_table_chunks
+    # progress callback of the next pass, each pass taking an equal part of the progress bar
+    started = []
+
+    def next_pass():
+        index = len(started)
+        started.append(index)
+
+        def progress(done, total, file):
+            worker.report_progress(100 * (index + done / total) / passes,
+                                   f"Pass {index + 1}/{passes}: read {os.path.basename(file)} ({done}/{total})")
+        return progress
+    return next_pass
+
+
+def streaming_progress(worker, share):
+    # Same as loading_progress for iter_column_chunks and iter_table_chunks, which report once a file has been read
+    def progress(done, total, file):
+        worker.report_progress(share * done / total, f"Read {os.path.basename(file)} ({done}/{total})")
+    return progress
+
+
+def loading_progress(worker, share):
+    # Maps load_files progress onto the first `share` percent of a worker's progress bar
+    def progress(done, total, timing):
+        worker.report_progress(share * done / total,
+                               f"Loaded {os.path.basename(timing.file)} in {timing.seconds:.1f}s ({done}/{total})")
+    return progress
+
+
+def analysis_progress(worker, start, share):
+    # Maps an analyzer's progress(fraction, message) onto `share` percent of a worker's progress bar from `start`
+    def progress(fraction, message):
+        worker.report_progress(start + share * fraction, message)
+    return progress